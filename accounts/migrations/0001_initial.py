@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('avatar', models.ImageField(blank=True, null=True, upload_to='avatars/', verbose_name='Аватар')),
+                ('bio', models.TextField(blank=True, max_length=500, verbose_name='О себе')),
+                ('location', models.CharField(blank=True, max_length=100, verbose_name='Местоположение')),
+                ('website', models.URLField(blank=True, verbose_name='Веб-сайт')),
+                ('game_character_name', models.CharField(blank=True, max_length=100, verbose_name='Имя игрового персонажа')),
+                ('game_level', models.PositiveIntegerField(default=1, verbose_name='Уровень персонажа')),
+                ('game_class', models.CharField(blank=True, max_length=50, verbose_name='Класс персонажа')),
+                ('guild_name', models.CharField(blank=True, max_length=100, verbose_name='Название гильдии')),
+                ('email_notifications', models.BooleanField(default=True, verbose_name='Email уведомления')),
+                ('newsletter_subscription', models.BooleanField(default=True, verbose_name='Подписка на новости')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль пользователя',
+                'verbose_name_plural': 'Профили пользователей',
+            },
+        ),
+    ]
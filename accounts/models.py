@@ -9,6 +9,8 @@ class UserProfile(models.Model):
     """Модель профиля пользователя"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile', verbose_name='Пользователь')
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True, verbose_name='Аватар')
+    # Миниатюры и WebP-варианты аватара, строятся задачей generate_image_variants_task
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Варианты аватара')
     bio = models.TextField(max_length=500, blank=True, verbose_name='О себе')
     location = models.CharField(max_length=100, blank=True, verbose_name='Местоположение')
     website = models.URLField(blank=True, verbose_name='Веб-сайт')
@@ -54,6 +56,15 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 
+@receiver(post_save, sender=UserProfile)
+def schedule_avatar_variants(sender, instance, **kwargs):
+    """Построить варианты аватара в фоне после загрузки нового файла"""
+    from bulletin_board.images import schedule_variants, variants_outdated
+    
+    if variants_outdated(instance):
+        schedule_variants(instance)
+
+
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     """Сохранить профиль пользователя при сохранении пользователя"""
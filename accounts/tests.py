@@ -1,3 +1,39 @@
 from django.test import TestCase
+from django.urls import reverse
+
+from bulletin_board.testing import ViewPerformanceTestCase
 
 # Create your tests here.
+
+class AccountViewPerformanceTests(ViewPerformanceTestCase):
+    """Бюджеты запросов для страниц профиля и настроек"""
+
+    def test_profile(self):
+        url = reverse('accounts:profile')
+        self.assertViewPerformance('accounts:profile', url, 0, status=302)
+        self.assertViewPerformance('accounts:profile', url, 8, user=self.owner, status=200)
+
+    def test_profile_edit(self):
+        url = reverse('accounts:profile_edit')
+        self.assertViewPerformance('accounts:profile_edit', url, 0, status=302)
+        self.assertViewPerformance('accounts:profile_edit', url, 5, user=self.owner, status=200)
+
+    def test_public_profile(self):
+        url = reverse('accounts:public_profile', kwargs={'pk': self.data['others'][0].pk})
+        self.assertViewPerformance('accounts:public_profile', url, 7, status=200)
+        self.assertViewPerformance('accounts:public_profile', url, 9, user=self.owner, status=200)
+
+    def test_settings(self):
+        url = reverse('accounts:settings')
+        self.assertViewPerformance('accounts:settings', url, 0, status=302)
+        self.assertViewPerformance('accounts:settings', url, 4, user=self.owner, status=200)
+
+    def test_password_change(self):
+        url = reverse('accounts:password_change')
+        self.assertViewPerformance('accounts:password_change', url, 0, status=302)
+        self.assertViewPerformance('accounts:password_change', url, 3, user=self.owner, status=200)
+
+    def test_dashboard(self):
+        url = reverse('accounts:dashboard')
+        self.assertViewPerformance('accounts:dashboard', url, 0, status=302)
+        self.assertViewPerformance('accounts:dashboard', url, 11, user=self.owner, status=200)
@@ -7,9 +7,11 @@ from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.views.generic import TemplateView, UpdateView, DetailView
 from django.db.models import Count
+from mmorpg_board.routers import ReplicaReadMixin
 from .models import UserProfile
 from .forms import UserProfileForm, UserUpdateForm
 from bulletin_board.models import Post, Response
+from notifications.cache import get_unread_count
 
 # Create your views here.
 
@@ -26,13 +28,13 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context['active_posts_count'] = Post.objects.filter(author=user, status='active').count()
         context['responses_count'] = Response.objects.filter(author=user).count()
         context['responses_to_posts_count'] = Response.objects.filter(post__author=user).count()
-        context['unread_notifications'] = user.notifications.filter(is_read=False).count()
+        context['unread_notifications'] = get_unread_count(user.pk)
         
         # Последние объявления
-        context['recent_posts'] = Post.objects.filter(author=user).order_by('-created_at')[:5]
+        context['recent_posts'] = Post.objects.filter(author=user).select_related('author').order_by('-created_at')[:5]
         
         # Последние отклики
-        context['recent_responses'] = Response.objects.filter(author=user).select_related('post').order_by('-created_at')[:5]
+        context['recent_responses'] = Response.objects.filter(author=user).select_related('author', 'post').order_by('-created_at')[:5]
         
         # Отклики на объявления пользователя
         context['recent_responses_to_posts'] = Response.objects.filter(
@@ -61,12 +63,12 @@ class ProfileView(LoginRequiredMixin, DetailView):
         context['joined_date'] = user.date_joined
         
         # Последние активности
-        context['recent_posts'] = Post.objects.filter(author=user).order_by('-created_at')[:3]
+        context['recent_posts'] = Post.objects.filter(author=user).select_related('author').order_by('-created_at')[:3]
         
         return context
 
 
-class PublicProfileView(DetailView):
+class PublicProfileView(ReplicaReadMixin, DetailView):
     """Публичный профиль пользователя"""
     model = UserProfile
     template_name = 'accounts/public_profile.html'
@@ -89,7 +91,7 @@ class PublicProfileView(DetailView):
         context['recent_posts'] = Post.objects.filter(
             author=user, 
             status='active'
-        ).order_by('-created_at')[:5]
+        ).select_related('author').order_by('-created_at')[:5]
         
         return context
 
@@ -31,9 +31,10 @@ class PostAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'category', 'status', 'responses_count', 'created_at']
     list_filter = ['status', 'category', 'created_at', 'author']
     search_fields = ['title', 'content', 'author__username']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'pending_responses_count', 'accepted_responses_count']
     list_editable = ['status']
     list_per_page = 20
+    list_select_related = ['author', 'category']
     
     fieldsets = [
         ('Основная информация', {
@@ -42,6 +43,10 @@ class PostAdmin(admin.ModelAdmin):
         ('Содержание', {
             'fields': ['content', 'image']
         }),
+        ('Отклики', {
+            'fields': ['pending_responses_count', 'accepted_responses_count'],
+            'classes': ['collapse']
+        }),
         ('Временные метки', {
             'fields': ['created_at', 'updated_at'],
             'classes': ['collapse']
@@ -49,10 +54,14 @@ class PostAdmin(admin.ModelAdmin):
     ]
     
     def responses_count(self, obj):
-        count = obj.responses.count()
-        if count > 0:
+        pending = obj.pending_responses_count
+        accepted = obj.accepted_responses_count
+        if pending or accepted:
             url = reverse('admin:bulletin_board_response_changelist')
-            return format_html('<a href="{}?post__id__exact={}">{} откликов</a>', url, obj.id, count)
+            return format_html(
+                '<a href="{}?post__id__exact={}">{} ожидают / {} принято</a>',
+                url, obj.id, pending, accepted
+            )
         return '0 откликов'
     responses_count.short_description = 'Количество откликов'
     
@@ -96,10 +105,10 @@ class ResponseAdmin(admin.ModelAdmin):
 
 @admin.register(Newsletter)
 class NewsletterAdmin(admin.ModelAdmin):
-    list_display = ['title', 'recipients_count', 'is_sent', 'created_at', 'sent_at']
-    list_filter = ['is_sent', 'created_at', 'sent_at']
+    list_display = ['title', 'recipients_count', 'status', 'progress', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at', 'sent_at']
     search_fields = ['title', 'content']
-    readonly_fields = ['created_at', 'sent_at', 'is_sent']
+    readonly_fields = ['created_at', 'sent_at', 'is_sent', 'status', 'queued_count', 'sent_count', 'failed_count']
     filter_horizontal = ['recipients']
     
     fieldsets = [
@@ -111,7 +120,7 @@ class NewsletterAdmin(admin.ModelAdmin):
             'description': 'Если не выбрать получателей, рассылка будет отправлена всем пользователям с активной подпиской'
         }),
         ('Статус отправки', {
-            'fields': ['is_sent', 'sent_at'],
+            'fields': ['status', 'queued_count', 'sent_count', 'failed_count', 'is_sent', 'sent_at'],
             'classes': ['collapse']
         }),
         ('Временные метки', {
@@ -124,12 +133,18 @@ class NewsletterAdmin(admin.ModelAdmin):
         return obj.get_recipients_count()
     recipients_count.short_description = 'Количество получателей'
     
+    def progress(self, obj):
+        if obj.status == 'draft':
+            return '—'
+        return f'{obj.sent_count + obj.failed_count} из {obj.queued_count} (ошибок: {obj.failed_count})'
+    progress.short_description = 'Ход отправки'
+    
     actions = ['send_newsletter']
     
     def send_newsletter(self, request, queryset):
         sent_count = 0
         for newsletter in queryset:
-            if not newsletter.is_sent:
+            if newsletter.status == 'draft':
                 newsletter.send_newsletter()
                 sent_count += 1
         
@@ -137,8 +152,8 @@ class NewsletterAdmin(admin.ModelAdmin):
     send_newsletter.short_description = 'Отправить выбранные рассылки'
     
     def has_delete_permission(self, request, obj=None):
-        # Запрещаем удаление отправленных рассылок
-        if obj and obj.is_sent:
+        # Запрещаем удаление отправленных и отправляемых рассылок
+        if obj and obj.status != 'draft':
             return False
         return super().has_delete_permission(request, obj)
 
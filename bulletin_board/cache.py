@@ -0,0 +1,148 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from mmorpg_board.routers import primary_reads
+
+# Кеш страниц списков объявлений для анонимных посетителей.
+#
+# Ключ страницы включает номер «поколения» (общего для главной страницы и
+# отдельного для каждой категории). При изменении объявления или отклика
+# номер поколения увеличивается, и все старые ключи просто перестают
+# использоваться - инвалидация за O(1) без перебора ключей.
+
+GLOBAL_SCOPE = 'all'
+STATS_HITS_KEY = 'board:page_cache:hits'
+STATS_MISSES_KEY = 'board:page_cache:misses'
+
+
+def _generation_key(scope):
+    return f'board:generation:{scope}'
+
+
+def _initial_generation():
+    # Если ключ поколения вытеснен из кеша, новое значение не должно совпасть
+    # ни с одним из прежних, иначе снова станут видны устаревшие страницы
+    return time.time_ns()
+
+
+def get_generation(scope):
+    """Текущий номер поколения для области кеша (GLOBAL_SCOPE или id категории)"""
+    key = _generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*scopes):
+    """Инвалидировать все закешированные страницы указанных областей"""
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), timeout=None)
+
+
+def bump_for_category(category_id):
+    """Инвалидировать главную страницу и страницу категории"""
+    if category_id is None:
+        bump_generation(GLOBAL_SCOPE)
+    else:
+        bump_generation(GLOBAL_SCOPE, category_id)
+
+
+def page_cache_key(prefix, scope, full_path):
+    """Ключ закешированной страницы для текущего поколения области"""
+    path_hash = hashlib.md5(full_path.encode('utf-8')).hexdigest()
+    return f'board:page:{prefix}:{scope}:{get_generation(scope)}:{path_hash}'
+
+
+def get_page_cache_timeout():
+    return getattr(settings, 'LISTING_CACHE_TIMEOUT', 300)
+
+
+def record_hit():
+    _increment(STATS_HITS_KEY)
+
+
+def record_miss():
+    _increment(STATS_MISSES_KEY)
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_stats():
+    """Счетчики попаданий и промахов кеша страниц"""
+    values = cache.get_many([STATS_HITS_KEY, STATS_MISSES_KEY])
+    hits = values.get(STATS_HITS_KEY, 0)
+    misses = values.get(STATS_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+class AnonymousPageCacheMixin:
+    """Миксин представления: кеширует готовую страницу для анонимных посетителей
+
+    Страница одинакова для всех анонимов, поэтому отдается из Redis без
+    обращения к базе данных. Область кеша определяет get_page_cache_scope().
+    """
+    page_cache_prefix = None
+
+    def get_page_cache_scope(self):
+        return GLOBAL_SCOPE
+
+    def is_page_cacheable(self, request):
+        return (
+            request.method == 'GET'
+            and not request.user.is_authenticated
+            # Страницы с flash-сообщениями индивидуальны
+            and not len(messages.get_messages(request))
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_cache_key(
+            self.page_cache_prefix or self.__class__.__name__,
+            self.get_page_cache_scope(),
+            request.get_full_path()
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            record_hit()
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        record_miss()
+        # Страница для нового поколения строится по основной базе: реплика может
+        # еще не содержать изменение, из-за которого поколение увеличено, и
+        # устаревшая страница осталась бы в кеше на весь срок хранения
+        with primary_reads():
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+                response.add_post_render_callback(
+                    lambda rendered: cache.set(
+                        key, (rendered.content, rendered['Content-Type']), get_page_cache_timeout()
+                    )
+                )
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
@@ -1,7 +1,7 @@
-from .models import Category
+from . import registry
 
 def categories(request):
     """Добавляет категории в контекст всех шаблонов"""
     return {
-        'categories': Category.objects.all()
+        'categories': registry.get_categories()
     } 
\ No newline at end of file
@@ -4,6 +4,7 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Field, Fieldset, ButtonHolder, Submit
 from crispy_forms.bootstrap import PrependedText, AppendedText
 from .models import Post, Response, Category
+from . import registry
 
 class PostForm(ModelForm):
     """Форма для создания и редактирования объявлений"""
@@ -65,9 +66,10 @@ class PostForm(ModelForm):
         self.fields['content'].required = True
         self.fields['category'].required = True
         
-        # Кастомизируем queryset для категорий
+        # Варианты категорий берем из реестра, без запроса к БД
         self.fields['category'].queryset = Category.objects.all()
         self.fields['category'].empty_label = "Выберите категорию"
+        self.fields['category'].choices = registry.get_category_choices("Выберите категорию")
 
 
 class ResponseForm(ModelForm):
@@ -130,6 +132,8 @@ class SearchForm(forms.Form):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields['category'].choices = registry.get_category_choices("Все категории")
+        
         self.helper = FormHelper()
         self.helper.form_method = 'get'
         self.helper.form_class = 'row g-3'
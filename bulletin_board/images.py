@@ -0,0 +1,135 @@
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+# Уменьшенные копии загруженных изображений.
+#
+# Для каждой ширины строятся два варианта: в исходном формате (JPEG/PNG)
+# и в WebP. Метаданные вариантов сохраняются в JSON-поле модели и
+# используются тегом {% responsive_image %} для srcset.
+
+POST_IMAGE_WIDTHS = (160, 320, 640)
+AVATAR_WIDTHS = (64, 128, 256)
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Модель -> (поле изображения, поле метаданных вариантов, ширины)
+IMAGE_FIELDS = {
+    'bulletin_board.post': ('image', 'image_variants', POST_IMAGE_WIDTHS),
+    'accounts.userprofile': ('avatar', 'avatar_variants', AVATAR_WIDTHS),
+}
+
+
+def build_variants(field_file, widths):
+    """Построить варианты изображения и вернуть их метаданные"""
+    storage = field_file.storage
+    base, _ = os.path.splitext(field_file.name)
+    directory, filename = os.path.split(base)
+
+    with field_file.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    original_width, original_height = image.size
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    fallback_format = 'png' if has_alpha else 'jpeg'
+
+    # Не увеличиваем изображение: ширины больше исходной заменяются исходной
+    target_widths = sorted({min(width, original_width) for width in widths})
+
+    variants = []
+    for width in target_widths:
+        height = max(1, round(original_height * width / original_width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for image_format in ('webp', fallback_format):
+            name = storage.save(
+                os.path.join(directory, 'variants', f'{filename}_{width}.{_extension(image_format)}'),
+                ContentFile(_encode(resized, image_format))
+            )
+            variants.append({
+                'name': name,
+                'width': width,
+                'height': height,
+                'format': image_format,
+            })
+
+    return {
+        'source': field_file.name,
+        'width': original_width,
+        'height': original_height,
+        'variants': variants,
+    }
+
+
+def delete_variants(storage, metadata):
+    """Удалить файлы вариантов, описанные в метаданных"""
+    for variant in (metadata or {}).get('variants', []):
+        storage.delete(variant['name'])
+
+
+def variants_outdated(instance):
+    """Изображение загружено или заменено, а варианты для него еще не построены"""
+    image_field, variants_field, _ = IMAGE_FIELDS[instance._meta.label_lower]
+    image = getattr(instance, image_field)
+    metadata = getattr(instance, variants_field) or {}
+    return (image.name or None) != metadata.get('source')
+
+
+def schedule_variants(instance):
+    """Поставить построение вариантов в очередь после фиксации транзакции"""
+    from bulletin_board.tasks import generate_image_variants_task
+
+    label = instance._meta.label_lower
+    pk = instance.pk
+    transaction.on_commit(lambda: generate_image_variants_task.delay(label, pk))
+
+
+def generate_variants(label, pk):
+    """Построить варианты текущего изображения объекта и сохранить метаданные
+
+    Возвращает True, если метаданные обновлены.
+    """
+    image_field, variants_field, widths = IMAGE_FIELDS[label]
+    model = apps.get_model(label)
+    instance = model.objects.filter(pk=pk).only('pk', image_field, variants_field).first()
+    if instance is None:
+        return False
+
+    image = getattr(instance, image_field)
+    old_metadata = getattr(instance, variants_field) or {}
+    metadata = build_variants(image, widths) if image else {}
+
+    # update() не вызывает save() и сигналы; условие по имени файла не дает
+    # записать варианты устаревшего изображения, если его успели заменить
+    if image:
+        same_image = Q(**{image_field: image.name})
+    else:
+        same_image = Q(**{image_field: ''}) | Q(**{f'{image_field}__isnull': True})
+    updated = model.objects.filter(same_image, pk=pk).update(**{variants_field: metadata})
+    if updated:
+        delete_variants(image.storage, old_metadata)
+    else:
+        delete_variants(image.storage, metadata)
+    return bool(updated)
+
+
+def _extension(image_format):
+    return 'jpg' if image_format == 'jpeg' else image_format
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'jpeg':
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif image_format == 'png':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
@@ -0,0 +1,56 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from bulletin_board.models import Post
+
+
+class Command(BaseCommand):
+    """Сравнение задержки поиска: ILIKE по содержанию против полнотекстового индекса"""
+    help = 'Замерить задержку поиска объявлений (icontains против tsvector + GIN)'
+    
+    DEFAULT_QUERIES = ['танк', 'ищу хила в гильдию', 'продам меч', 'зелье']
+    
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help='Поисковые запросы (по умолчанию набор типовых запросов)')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество повторов каждого запроса')
+        parser.add_argument('--page-size', type=int, default=10, help='Размер страницы результатов')
+    
+    def handle(self, *args, **options):
+        queries = options['queries'] or self.DEFAULT_QUERIES
+        repeat = options['repeat']
+        page_size = options['page_size']
+        
+        total = Post.objects.filter(status='active').count()
+        self.stdout.write(f'Активных объявлений: {total}')
+        
+        for query in queries:
+            legacy = self._measure(lambda: self._legacy_queryset(query), repeat, page_size)
+            fulltext = self._measure(lambda: Post.objects.filter(status='active').search(query), repeat, page_size)
+            
+            self.stdout.write(f'\nЗапрос: "{query}"')
+            self.stdout.write(f'  icontains: {legacy[0]:.1f} мс (найдено {legacy[1]})')
+            self.stdout.write(f'  tsvector:  {fulltext[0]:.1f} мс (найдено {fulltext[1]})')
+            if fulltext[0]:
+                self.stdout.write(self.style.SUCCESS(f'  ускорение: x{legacy[0] / fulltext[0]:.1f}'))
+    
+    def _legacy_queryset(self, query):
+        """Поиск в том виде, в котором он работал до полнотекстового индекса"""
+        return Post.objects.filter(status='active').filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query)
+        ).order_by('-created_at')
+    
+    def _measure(self, make_queryset, repeat, page_size):
+        """Медианное время (мс) получения числа результатов и первой страницы, как в ListView"""
+        timings = []
+        count = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = make_queryset()
+            count = queryset.count()
+            list(queryset[:page_size])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), count
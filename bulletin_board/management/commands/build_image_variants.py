@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from bulletin_board.images import IMAGE_FIELDS, generate_variants
+from bulletin_board.tasks import generate_image_variants_task
+
+
+class Command(BaseCommand):
+    """Построение вариантов для уже загруженных изображений"""
+    help = 'Построить миниатюры и WebP-варианты изображений объявлений и аватаров'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(IMAGE_FIELDS), help='Обработать только указанную модель')
+        parser.add_argument('--force', action='store_true', help='Перестроить варианты даже для обработанных изображений')
+        parser.add_argument('--queue', action='store_true', help='Поставить задачи в очередь Celery вместо обработки на месте')
+    
+    def handle(self, *args, **options):
+        labels = [options['model']] if options['model'] else sorted(IMAGE_FIELDS)
+        
+        for label in labels:
+            image_field, variants_field, _ = IMAGE_FIELDS[label]
+            model = apps.get_model(label)
+            queryset = model.objects.exclude(**{image_field: ''}).exclude(**{f'{image_field}__isnull': True})
+            
+            processed = 0
+            for pk, name, metadata in queryset.values_list('pk', image_field, variants_field).iterator():
+                if not options['force'] and (metadata or {}).get('source') == name:
+                    continue
+                if options['queue']:
+                    generate_image_variants_task.delay(label, pk)
+                else:
+                    generate_variants(label, pk)
+                processed += 1
+            
+            action = 'поставлено в очередь' if options['queue'] else 'обработано'
+            self.stdout.write(self.style.SUCCESS(f'{label}: {action} изображений: {processed}'))
@@ -0,0 +1,112 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from bulletin_board.models import Category, Post, Response
+from bulletin_board.views import MyPostsView, MyResponsesView, PostListView, ResponsesToPostsView
+from notifications.models import Notification
+from notifications.views import NotificationListView
+
+
+class Command(BaseCommand):
+    """Проверка планов запросов основных представлений на последовательное сканирование"""
+    help = 'Выполнить EXPLAIN для типовых запросов представлений и упасть, если какой-то из них сканирует таблицу целиком'
+    
+    # Таблицы, по которым последовательное сканирование считается регрессией
+    WATCHED_TABLES = {
+        Post._meta.db_table,
+        Response._meta.db_table,
+        Notification._meta.db_table,
+    }
+    
+    PAGE_SIZE = 10
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force-index',
+            action='store_true',
+            help='Отключить seq scan в планировщике (SET enable_seqscan = off): '
+                 'проверяет наличие подходящего индекса даже на маленьком наборе данных'
+        )
+    
+    def handle(self, *args, **options):
+        queries = self.get_canonical_queries()
+        regressions = []
+        
+        with transaction.atomic():
+            if options['force_index']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            
+            for name, queryset in queries:
+                plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+                nodes = list(self._walk(plan))
+                seq_scans = [
+                    node['Relation Name'] for node in nodes
+                    if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in self.WATCHED_TABLES
+                ]
+                scans = ', '.join(self._describe(node) for node in nodes if 'Relation Name' in node)
+                
+                if seq_scans:
+                    regressions.append(name)
+                    self.stdout.write(self.style.ERROR(f'SEQ SCAN  {name}: {scans}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'OK        {name}: {scans}'))
+        
+        if regressions:
+            raise CommandError(f'Последовательное сканирование в {len(regressions)} запросах: {", ".join(regressions)}')
+    
+    def get_canonical_queries(self):
+        """Запросы в том виде, в котором их строят представления"""
+        author_id = Post.objects.order_by().values_list('author_id', flat=True).first()
+        post = Post.objects.filter(responses__isnull=False).order_by().first()
+        recipient_id = Notification.objects.order_by().values_list('recipient_id', flat=True).first()
+        category = Category.objects.first()
+        if not (author_id and post and recipient_id and category):
+            raise CommandError('Недостаточно данных: сначала загрузите тестовый набор данных')
+        
+        author = User.objects.get(pk=author_id)
+        post_author = post.author
+        recipient = User.objects.get(pk=recipient_id)
+        
+        return [
+            ('Главная', self._page(self._view_queryset(PostListView, None))),
+            ('Главная: категория', self._page(self._view_queryset(PostListView, None, {'category': category.pk}))),
+            ('Главная: поиск', self._view_queryset(PostListView, None, {'q': 'танк'})[:self.PAGE_SIZE]),
+            ('Категория', self._page(Post.objects.filter(category=category, status='active'))),
+            ('Подсказки поиска', Post.objects.filter(status='active').title_prefix_search('та')[:8]),
+            ('Страница объявления: отклики', Response.objects.filter(post=post, status='pending').order_by('-created_at')),
+            ('Мои объявления', self._page(self._view_queryset(MyPostsView, author))),
+            ('Мои отклики', self._page(self._view_queryset(MyResponsesView, author))),
+            ('Отклики на мои объявления', self._page(self._view_queryset(ResponsesToPostsView, post_author))),
+            ('Отклики на объявление', self._page(self._view_queryset(ResponsesToPostsView, post_author, {'post': post.pk}))),
+            ('Ожидающие отклики на мои объявления', self._page(
+                self._view_queryset(ResponsesToPostsView, post_author, {'post': post.pk, 'status': 'pending'})
+            )),
+            ('Уведомления', self._view_queryset(NotificationListView, recipient)[:20]),
+            ('Непрочитанные уведомления', self._view_queryset(NotificationListView, recipient, {'read': 'unread'})[:20]),
+            ('Счетчик непрочитанных', Notification.objects.filter(recipient=recipient, is_read=False).values('pk')),
+        ]
+    
+    def _view_queryset(self, view_class, user, params=None):
+        request = RequestFactory().get('/', params or {})
+        request.user = user
+        view = view_class()
+        view.setup(request)
+        return view.get_queryset()
+    
+    def _page(self, queryset):
+        """Первая страница курсорной пагинации"""
+        return queryset.order_by('-created_at', '-pk')[:self.PAGE_SIZE + 1]
+    
+    def _walk(self, node):
+        yield node
+        for child in node.get('Plans', []):
+            yield from self._walk(child)
+    
+    def _describe(self, node):
+        index = node.get('Index Name')
+        return f"{node['Node Type']} {node['Relation Name']}" + (f' ({index})' if index else '')
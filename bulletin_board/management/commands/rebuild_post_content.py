@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from bulletin_board.tasks import rebuild_post_content
+
+
+class Command(BaseCommand):
+    """Пересчет очищенного HTML и анонсов объявлений"""
+    help = 'Заново очистить HTML и построить анонсы для всех объявлений'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Размер пачки объявлений')
+    
+    def handle(self, *args, **options):
+        processed = rebuild_post_content(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Обработано объявлений: {processed}'))
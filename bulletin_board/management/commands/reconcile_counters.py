@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from bulletin_board.tasks import reconcile_response_counters
+
+
+class Command(BaseCommand):
+    """Сверка денормализованных счетчиков откликов"""
+    help = 'Пересчитать счетчики откликов у объявлений, где они разошлись с фактическими'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки объявлений')
+    
+    def handle(self, *args, **options):
+        fixed_count = reconcile_response_counters(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Исправлены счетчики откликов у {fixed_count} объявлений'))
@@ -0,0 +1,398 @@
+import io
+import json
+import random
+import re
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from bulletin_board import cache as listing_cache
+from bulletin_board import registry
+from bulletin_board.models import Category, Post, Response
+from bulletin_board.sanitizer import render_content
+from notifications.models import Notification
+
+# Фразы для генерации заголовков и текстов объявлений
+TITLE_TEMPLATES = [
+    'Ищу {role} в рейд на {boss}',
+    'Гильдия {guild} набирает {role}',
+    'Продам {item} недорого',
+    'Куплю {item}, предлагайте цену',
+    'Нужен {role} на вечерние подземелья',
+    '{role} ищет постоянную группу',
+    'Крафт {item} на заказ',
+    'Помогу пройти {boss}',
+]
+ROLES = ['танка', 'хила', 'ДД', 'торговца', 'кузнеца', 'алхимика', 'мага', 'лучника']
+BOSSES = ['Короля-лича', 'Древнего дракона', 'Повелителя бездны', 'Стража храма', 'Королеву пауков']
+GUILDS = ['Стальной Клык', 'Орден Рассвета', 'Северный Ветер', 'Тени Пустоши', 'Лунный Свет']
+ITEMS = ['меч', 'посох', 'щит', 'зелье здоровья', 'кольцо силы', 'кожаный доспех', 'свиток телепорта']
+SENTENCES = [
+    'Играю каждый вечер после восьми по Москве.',
+    'Есть голосовая связь, опыт прохождения обязателен.',
+    'Полная экипировка, уровень персонажа максимальный.',
+    'Рассмотрю любые предложения, пишите в личные сообщения.',
+    'Гильдия дружная, помогаем новичкам с прокачкой.',
+    'Нужно собрать полную группу до выходных.',
+    'Цена договорная, возможен обмен на ресурсы.',
+    'Ищем людей без токсичности и с чувством юмора.',
+]
+RESPONSE_TEXTS = [
+    'Готов присоединиться, пишите.',
+    'Интересует, когда собираемся?',
+    'Могу сегодня вечером.',
+    'Есть опыт, хочу в группу.',
+    'Сколько просите?',
+]
+
+POST_STATUS_WEIGHTS = {'active': 85, 'closed': 10, 'draft': 5}
+RESPONSE_STATUS_WEIGHTS = {'pending': 60, 'accepted': 20, 'rejected': 20}
+
+# Количество вариантов содержания: HTML очищается один раз на вариант, а не на объявление
+CONTENT_POOL_SIZE = 200
+
+
+# Символы, которые нужно экранировать в текстовом формате COPY
+COPY_SPECIAL_RE = re.compile(r'[\\\t\n\r]')
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_value(value):
+    """Значение в текстовом формате COPY"""
+    if value is None:
+        return '\\N'
+    value_type = type(value)
+    if value_type is int:
+        return str(value)
+    if value_type is bool:
+        return 't' if value else 'f'
+    if value_type is datetime:
+        return value.isoformat()
+    if value_type is dict or value_type is list:
+        value = json.dumps(value, ensure_ascii=False)
+    else:
+        value = str(value)
+    # Большинство строк не содержит спецсимволов, и translate для них не нужен
+    return value.translate(COPY_ESCAPES) if COPY_SPECIAL_RE.search(value) else value
+
+
+class _CopyWriter:
+    """Буфер строк таблицы, загружаемый в PostgreSQL командой COPY
+
+    Поля, не переданные в add(), заполняются значениями по умолчанию модели,
+    поэтому новые поля с default не ломают генератор.
+    """
+
+    def __init__(self, model, batch_size, **constants):
+        self.model = model
+        self.batch_size = batch_size
+        self.fields = model._meta.concrete_fields
+        defaults = {field.attname: field.get_default() for field in self.fields}
+        defaults.update(constants)
+        # Значения по умолчанию экранируются один раз, а не для каждой строки
+        self.escaped_defaults = {name: _copy_value(value) for name, value in defaults.items()}
+        self.rows = []
+        self.total = 0
+
+    def add(self, **values):
+        escaped = self.escaped_defaults
+        self.rows.append('\t'.join(
+            _copy_value(values[field.attname]) if field.attname in values else escaped[field.attname]
+            for field in self.fields
+        ))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        quote_name = connection.ops.quote_name
+        columns = ', '.join(quote_name(field.column) for field in self.fields)
+        buffer = io.StringIO('\n'.join(self.rows) + '\n')
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {quote_name(self.model._meta.db_table)} ({columns}) FROM STDIN', buffer
+            )
+        self.total += len(self.rows)
+        self.rows = []
+
+
+class Command(BaseCommand):
+    """Генератор больших синтетических наборов данных для замеров"""
+    help = 'Заполнить базу синтетическими пользователями, объявлениями, откликами и уведомлениями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Количество пользователей')
+        parser.add_argument('--posts', type=int, default=10000, help='Количество объявлений')
+        parser.add_argument('--responses-per-post', type=float, default=3.0, help='Среднее число откликов на объявление')
+        parser.add_argument('--max-responses', type=int, default=50, help='Максимум откликов на одно объявление')
+        parser.add_argument('--notifications', type=int, default=50000, help='Количество уведомлений')
+        parser.add_argument('--days', type=int, default=365, help='За сколько дней до текущей даты распределить данные')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Строк в одной команде COPY')
+        parser.add_argument('--prefix', default='seed', help='Префикс имен сгенерированных пользователей')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Генератор использует COPY и работает только с PostgreSQL')
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя: автор и откликнувшийся')
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(
+                f"Пользователи с префиксом {options['prefix']}_ уже есть; укажите другой --prefix или очистите базу"
+            )
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # Даты отсчитываются от начала текущих суток, чтобы повторный запуск с тем же
+        # зерном в тот же день давал те же данные
+        self.end = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start = self.end - timedelta(days=options['days'])
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            categories = self._ensure_categories()
+            self._seed_users(options['users'], options['prefix'])
+            self._seed_posts_and_responses(
+                options['posts'], categories, options['responses_per_post'],
+                options['max_responses'], options['notifications']
+            )
+            self._fill_notifications(options['notifications'])
+            self._reset_sequences()
+
+        self._analyze()
+        listing_cache.bump_generation(listing_cache.GLOBAL_SCOPE, *(category.pk for category in categories))
+        registry.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с: пользователей {len(self.user_ids)}, '
+            f'объявлений {self.posts_total}, откликов {self.responses_total}, уведомлений {self.notifications_total}'
+        ))
+
+    def _log(self, message, started):
+        self.stdout.write(f'{message} ({time.perf_counter() - started:.1f} с)')
+
+    def _random_datetime(self):
+        return self.start + timedelta(seconds=self.rng.random() * (self.end - self.start).total_seconds())
+
+    def _choose_user(self):
+        """Случайный пользователь: небольшая доля пользователей дает большую часть активности"""
+        return self.rng.choices(self.user_ids, cum_weights=self.user_cum_weights)[0]
+
+    def _choose_weighted(self, weights):
+        return self.rng.choices(list(weights), weights=list(weights.values()))[0]
+
+    @staticmethod
+    def _next_id(model):
+        return (model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+
+    def _ensure_categories(self):
+        return [Category.objects.get_or_create(name=name)[0] for name, _ in Category.CATEGORY_CHOICES]
+
+    def _seed_users(self, count, prefix):
+        """Пользователи с профилями; у всех пароль password"""
+        started = time.perf_counter()
+        password = make_password('password')
+        users = _CopyWriter(User, self.batch_size, password=password, is_active=True)
+        profiles = _CopyWriter(UserProfile, self.batch_size)
+
+        first_user_id = self._next_id(User)
+        first_profile_id = self._next_id(UserProfile)
+        self.user_ids = []
+        for index in range(count):
+            user_id = first_user_id + index
+            joined = self._random_datetime()
+            users.add(
+                id=user_id,
+                username=f'{prefix}_{index:07d}',
+                email=f'{prefix}_{index:07d}@example.com',
+                date_joined=joined,
+            )
+            profiles.add(
+                id=first_profile_id + index,
+                user_id=user_id,
+                game_level=self.rng.randint(1, 80),
+                game_class=self.rng.choice(ROLES),
+                guild_name=self.rng.choice(GUILDS),
+                newsletter_subscription=self.rng.random() < 0.7,
+                created_at=joined,
+                updated_at=joined,
+            )
+            self.user_ids.append(user_id)
+        users.flush()
+        profiles.flush()
+
+        # Распределение Парето: активность пользователей сильно неравномерна
+        self.user_cum_weights = list(accumulate(self.rng.paretovariate(1.16) for _ in self.user_ids))
+        self._log(f'Пользователи: {count}', started)
+
+    def _content_pool(self):
+        """Набор вариантов содержания с уже очищенным HTML и анонсом"""
+        pool = []
+        for _ in range(CONTENT_POOL_SIZE):
+            paragraphs = self.rng.sample(SENTENCES, self.rng.randint(2, 5))
+            content = ''.join(f'<p>{paragraph}</p>' for paragraph in paragraphs)
+            content_html, excerpt = render_content(content)
+            pool.append((content, content_html, excerpt))
+        return pool
+
+    def _make_title(self):
+        return self.rng.choice(TITLE_TEMPLATES).format(
+            role=self.rng.choice(ROLES),
+            boss=self.rng.choice(BOSSES),
+            guild=self.rng.choice(GUILDS),
+            item=self.rng.choice(ITEMS),
+        )
+
+    def _seed_posts_and_responses(self, count, categories, mean_responses, max_responses, notifications_target):
+        """Объявления с откликами и уведомлениями об откликах
+
+        Отклики на объявление оставляют разные пользователи (unique_together post, author),
+        счетчики откликов объявления вычисляются сразу.
+        """
+        started = time.perf_counter()
+
+        # Популярность категорий убывает по степенному закону
+        ranked = list(categories)
+        self.rng.shuffle(ranked)
+        category_cum_weights = list(accumulate(1 / (rank + 1) ** 1.2 for rank in range(len(ranked))))
+        pool = self._content_pool()
+
+        posts = _CopyWriter(Post, self.batch_size, image_variants={})
+        responses = _CopyWriter(Response, self.batch_size)
+        self.notifications = _CopyWriter(Notification, self.batch_size)
+        self.next_notification_id = self._next_id(Notification)
+        self.notifications_total = 0
+        self.notifications_target = notifications_target
+
+        # Доля откликов, по которым создаются уведомления (в среднем ~1.4 уведомления на отклик)
+        expected_responses = max(count * mean_responses, 1)
+        notify_probability = min(1.0, notifications_target / (expected_responses * 1.4))
+        response_type_id = ContentType.objects.get_for_model(Response).pk
+
+        post_id = self._next_id(Post)
+        response_id = self._next_id(Response)
+        span = (self.end - self.start).total_seconds()
+        users_count = len(self.user_ids)
+
+        for index in range(count):
+            created_at = self.start + timedelta(seconds=span * (index + self.rng.random()) / count)
+            author_id = self._choose_user()
+            content, content_html, excerpt = self.rng.choice(pool)
+
+            responses_count = round(self.rng.expovariate(1 / mean_responses)) if mean_responses > 0 else 0
+            responses_count = min(responses_count, max_responses, users_count - 1)
+            responder_ids = [
+                self.user_ids[position]
+                for position in self.rng.sample(range(users_count), responses_count + 1)
+                if self.user_ids[position] != author_id
+            ][:responses_count]
+
+            counters = {'pending': 0, 'accepted': 0, 'rejected': 0}
+            for responder_id in responder_ids:
+                status = self._choose_weighted(RESPONSE_STATUS_WEIGHTS)
+                responded_at = min(created_at + timedelta(hours=self.rng.expovariate(1 / 24)), self.end)
+                responses.add(
+                    id=response_id,
+                    post_id=post_id,
+                    author_id=responder_id,
+                    content=self.rng.choice(RESPONSE_TEXTS),
+                    status=status,
+                    created_at=responded_at,
+                    updated_at=responded_at,
+                )
+                counters[status] += 1
+
+                if self.rng.random() < notify_probability:
+                    self._add_notification(
+                        author_id, responder_id, 'new_response', 'Новый отклик на ваше объявление',
+                        response_type_id, response_id, responded_at
+                    )
+                    if status != 'pending':
+                        title = 'Ваш отклик принят!' if status == 'accepted' else 'Ваш отклик отклонен'
+                        self._add_notification(
+                            responder_id, author_id, f'response_{status}', title,
+                            response_type_id, response_id, responded_at
+                        )
+                response_id += 1
+
+            posts.add(
+                id=post_id,
+                title=self._make_title(),
+                content=content,
+                content_html=content_html,
+                excerpt=excerpt,
+                author_id=author_id,
+                category_id=self.rng.choices(ranked, cum_weights=category_cum_weights)[0].pk,
+                status=self._choose_weighted(POST_STATUS_WEIGHTS),
+                created_at=created_at,
+                updated_at=created_at,
+                pending_responses_count=counters['pending'],
+                accepted_responses_count=counters['accepted'],
+            )
+            post_id += 1
+
+            if (index + 1) % (self.batch_size * 4) == 0:
+                self._log(f'  объявлений: {index + 1}', started)
+
+        posts.flush()
+        responses.flush()
+        self.posts_total = posts.total
+        self.responses_total = responses.total
+        self._log(f'Объявления: {posts.total}, отклики: {responses.total}', started)
+
+    def _add_notification(self, recipient_id, sender_id, notification_type, title,
+                          content_type_id=None, object_id=None, created_at=None):
+        if self.notifications_total >= self.notifications_target:
+            return
+        created_at = created_at or self._random_datetime()
+        is_read = self.rng.random() < 0.6
+        self.notifications.add(
+            id=self.next_notification_id,
+            recipient_id=recipient_id,
+            sender_id=sender_id,
+            notification_type=notification_type,
+            title=title,
+            message=f'{title}. Подробности на странице объявления.',
+            content_type_id=content_type_id,
+            object_id=object_id,
+            is_read=is_read,
+            is_sent=self.rng.random() < 0.5,
+            created_at=created_at,
+            read_at=created_at + timedelta(minutes=self.rng.randint(1, 600)) if is_read else None,
+        )
+        self.next_notification_id += 1
+        self.notifications_total += 1
+
+    def _fill_notifications(self, target):
+        """Добрать уведомления до нужного количества системными и рассылками"""
+        started = time.perf_counter()
+        while self.notifications_total < target:
+            notification_type = 'newsletter' if self.rng.random() < 0.7 else 'system'
+            title = 'Новости игрового мира' if notification_type == 'newsletter' else 'Системное уведомление'
+            self._add_notification(self._choose_user(), None, notification_type, title)
+        self.notifications.flush()
+        self._log(f'Уведомления: {self.notifications.total}', started)
+
+    def _reset_sequences(self):
+        """Сдвинуть последовательности id после вставки с явными id"""
+        models = [User, UserProfile, Post, Response, Notification]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    def _analyze(self):
+        """Обновить статистику планировщика после массовой загрузки"""
+        with connection.cursor() as cursor:
+            for model in (User, UserProfile, Post, Response, Notification):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Текст содержания хранится в HTML (CKEditor): теги и сущности вырезаются перед индексацией
+SEARCH_VECTOR_EXPRESSION = """
+    setweight(to_tsvector('pg_catalog.russian', coalesce({row}.title, '')), 'A') ||
+    setweight(to_tsvector('pg_catalog.russian', regexp_replace(
+        coalesce({row}.content, ''), '<[^>]*>|&[#a-zA-Z0-9]+;', ' ', 'g'
+    )), 'B')
+"""
+
+CREATE_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION bulletin_board_post_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR_EXPRESSION.format(row='NEW')};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bulletin_board_post_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, content ON bulletin_board_post
+    FOR EACH ROW EXECUTE FUNCTION bulletin_board_post_search_vector_update();
+
+UPDATE bulletin_board_post SET search_vector = {SEARCH_VECTOR_EXPRESSION.format(row='bulletin_board_post')};
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS bulletin_board_post_search_vector_trigger ON bulletin_board_post;
+DROP FUNCTION IF EXISTS bulletin_board_post_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulletin_board', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_search_vector_gin'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER_SQL, DROP_TRIGGER_SQL),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:49
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Индексы строятся CONCURRENTLY, чтобы не блокировать запись в большие таблицы
+    atomic = False
+
+    dependencies = [
+        ('bulletin_board', '0002_post_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['-created_at', '-id'], name='post_active_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['category', '-created_at', '-id'], name='post_active_cat_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='post_author_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='response',
+            index=models.Index(fields=['post', 'status', '-created_at'], name='response_post_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='response',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['post', '-created_at'], name='response_pending_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='response',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='response_author_created_idx'),
+        ),
+    ]
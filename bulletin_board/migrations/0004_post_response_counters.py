@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+# Заполнение счетчиков для уже существующих откликов
+BACKFILL_COUNTERS_SQL = """
+UPDATE bulletin_board_post AS post SET
+    pending_responses_count = counts.pending,
+    accepted_responses_count = counts.accepted
+FROM (
+    SELECT post_id,
+           count(*) FILTER (WHERE status = 'pending') AS pending,
+           count(*) FILTER (WHERE status = 'accepted') AS accepted
+    FROM bulletin_board_response
+    GROUP BY post_id
+) AS counts
+WHERE counts.post_id = post.id;
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulletin_board', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='accepted_responses_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Принятых откликов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='pending_responses_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Ожидающих откликов'),
+        ),
+        migrations.RunSQL(BACKFILL_COUNTERS_SQL, migrations.RunSQL.noop),
+    ]
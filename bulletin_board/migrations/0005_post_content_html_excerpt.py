@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:53
+
+from django.db import migrations, models
+
+from bulletin_board.sanitizer import render_content
+
+
+def backfill_content(apps, schema_editor):
+    """Вычислить очищенный HTML и анонс для существующих объявлений"""
+    Post = apps.get_model('bulletin_board', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'content').iterator(chunk_size=500):
+        post.content_html, post.excerpt = render_content(post.content)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['content_html', 'excerpt'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['content_html', 'excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulletin_board', '0004_post_response_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Очищенное содержание'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Анонс'),
+        ),
+        migrations.RunPython(backfill_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Уже отправленные рассылки получают итоговый статус
+BACKFILL_STATUS_SQL = """
+UPDATE bulletin_board_newsletter SET status = 'sent' WHERE is_sent;
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulletin_board', '0006_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletter',
+            name='failed_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Не доставлено'),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='queued_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В очереди'),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='sent_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Доставлено'),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Черновик'), ('sending', 'Отправляется'), ('sent', 'Отправлена')], default='draft', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.CreateModel(
+            name='NewsletterChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_user_id', models.PositiveIntegerField(verbose_name='Первый получатель')),
+                ('last_user_id', models.PositiveIntegerField(verbose_name='Последний получатель')),
+                ('last_processed_id', models.PositiveIntegerField(default=0, verbose_name='Обработано до')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('done', 'Отправлена')], default='pending', max_length=20, verbose_name='Статус')),
+                ('queued_count', models.PositiveIntegerField(default=0, verbose_name='В очереди')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Доставлено')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Не доставлено')),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Аренда до')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('newsletter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='bulletin_board.newsletter', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Часть рассылки',
+                'verbose_name_plural': 'Части рассылок',
+                'ordering': ['newsletter', 'first_user_id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['updated_at'], name='newsletter_chunk_pending_idx')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_STATUS_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulletin_board', '0007_newsletter_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletterchunk',
+            name='claim_token',
+            field=models.UUIDField(blank=True, null=True, verbose_name='Токен аренды'),
+        ),
+    ]
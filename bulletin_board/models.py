@@ -1,11 +1,22 @@
-from django.db import models
+import re
+from contextlib import nullcontext
+
+from django.db import DatabaseError, connections, models, router, transaction
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
 from django.urls import reverse
 from ckeditor.fields import RichTextField
-from django.utils import timezone
+from .sanitizer import EXCERPT_LENGTH, make_excerpt, render_content
 
 # Create your models here.
 
+# Конфигурация полнотекстового поиска PostgreSQL (сайт русскоязычный)
+SEARCH_CONFIG = 'russian'
+
+# Содержание длиннее этого порога очищается в фоновой задаче, а не при сохранении
+CONTENT_RENDER_INLINE_LIMIT = 20000
+
 class Category(models.Model):
     """Модель для категорий объявлений MMORPG"""
     CATEGORY_CHOICES = [
@@ -37,6 +48,39 @@ class Category(models.Model):
         return reverse('bulletin_board:category_detail', kwargs={'pk': self.pk})
 
 
+class PostQuerySet(models.QuerySet):
+    """QuerySet объявлений с полнотекстовым поиском"""
+    
+    def for_listing(self):
+        """Объявления для списков: без тяжелых полей, которые списки не выводят"""
+        return self.select_related('author', 'category').defer('content', 'content_html', 'search_vector')
+    
+    def search(self, query):
+        """Полнотекстовый поиск по заголовку и содержанию, отсортированный по релевантности"""
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return self.filter(search_vector=search_query).annotate(
+            rank=SearchRank(models.F('search_vector'), search_query)
+        ).order_by('-rank', '-created_at')
+    
+    def title_prefix_search(self, query):
+        """Поиск по префиксам слов заголовка (для подсказок при вводе)
+        
+        Использует тот же GIN-индекс, что и полнотекстовый поиск: каждое слово
+        запроса превращается в префиксный терм, ограниченный весом A (заголовок).
+        """
+        words = re.findall(r'\w+', query)
+        if not words:
+            return self.none()
+        search_query = SearchQuery(
+            ' & '.join(f'{word}:*A' for word in words),
+            config=SEARCH_CONFIG,
+            search_type='raw'
+        )
+        return self.filter(search_vector=search_query).annotate(
+            rank=SearchRank(models.F('search_vector'), search_query)
+        ).order_by('-rank', '-created_at')
+
+
 class Post(models.Model):
     """Модель для объявлений"""
     STATUS_CHOICES = [
@@ -53,25 +97,130 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     image = models.ImageField(upload_to='post_images/', blank=True, null=True, verbose_name='Изображение')
+    # Миниатюры и WebP-варианты изображения, строятся задачей generate_image_variants_task
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Варианты изображения')
+    
+    # Очищенный HTML и текстовый анонс, вычисляются из content при сохранении
+    content_html = models.TextField(blank=True, editable=False, verbose_name='Очищенное содержание')
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False, verbose_name='Анонс')
+    
+    # Денормализованные счетчики откликов, поддерживаются сигналами bulletin_board.signals
+    pending_responses_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Ожидающих откликов')
+    accepted_responses_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Принятых откликов')
+    
+    # Поисковый вектор (заголовок с весом A, содержание с весом B) поддерживается триггером в БД
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name='Поисковый вектор')
+    
+    objects = PostQuerySet.as_manager()
+    
+    # Статус отклика -> поле счетчика
+    RESPONSE_COUNTER_FIELDS = {
+        'pending': 'pending_responses_count',
+        'accepted': 'accepted_responses_count',
+    }
     
     class Meta:
         verbose_name = 'Объявление'
         verbose_name_plural = 'Объявления'
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='post_search_vector_gin'),
+            # Лента активных объявлений (главная страница и курсорная пагинация)
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(status='active'), name='post_active_created_idx'),
+            # Лента активных объявлений категории
+            models.Index(fields=['category', '-created_at', '-id'], condition=models.Q(status='active'), name='post_active_cat_created_idx'),
+            # Объявления пользователя («Мои объявления», профиль, панель управления)
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_created_idx'),
+        ]
     
     def __str__(self):
         return f'{self.title} - {self.author.username}'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженное содержание, чтобы не пересчитывать HTML без изменений
+        instance._loaded_content = instance.__dict__.get('content')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        render_in_background = False
+        
+        # Счетчики откликов меняются сигналами через F(): полное сохранение
+        # не должно перезаписывать их значениями из загруженного экземпляра.
+        # Список полей подставляется только для уже сохраненного объявления и
+        # только если вызывающий код не передал свой update_fields
+        counters_excluded = (
+            not self._state.adding and kwargs.get('update_fields') is None
+            and not args and not kwargs.get('force_insert')
+        )
+        if counters_excluded:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.attname not in self.RESPONSE_COUNTER_FIELDS.values()
+            ]
+        
+        if self._content_changed():
+            if len(self.content) > CONTENT_RENDER_INLINE_LIMIT:
+                # Анонс строим по началу текста сразу, полный HTML - в фоне
+                self.excerpt = make_excerpt(self.content[:CONTENT_RENDER_INLINE_LIMIT])
+                self.content_html = ''
+                render_in_background = True
+            else:
+                self.render_content()
+            
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'content_html', 'excerpt'}
+        
+        if counters_excluded:
+            self._save_excluding_counters(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._loaded_content = self.content
+        
+        if render_in_background:
+            from .tasks import render_post_content_task
+            transaction.on_commit(lambda: render_post_content_task.delay(self.pk))
+    
+    def _save_excluding_counters(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        # Внутри транзакции неудачный UPDATE прерывает ее: нужна точка сохранения
+        savepoint = transaction.atomic(using=using) if connections[using].in_atomic_block else nullcontext()
+        try:
+            with savepoint:
+                super().save(*args, **kwargs)
+        except DatabaseError as exc:
+            # О том, что UPDATE не нашел строку, Django сообщает именно DatabaseError
+            # (ошибки SQL - его подклассы). Строка удалена параллельно: как обычный
+            # save() без update_fields, вставляем объявление заново
+            if type(exc) is not DatabaseError:
+                raise
+            kwargs.pop('update_fields')
+            super().save(*args, **kwargs)
+    
+    def _content_changed(self):
+        if 'content' in self.get_deferred_fields():
+            return False
+        return self._state.adding or getattr(self, '_loaded_content', None) != self.content
+    
+    def render_content(self):
+        """Пересчитать очищенный HTML и анонс из содержания"""
+        self.content_html, self.excerpt = render_content(self.content)
+    
     def get_absolute_url(self):
         return reverse('bulletin_board:post_detail', kwargs={'pk': self.pk})
     
     def get_responses_count(self):
         """Получить количество откликов"""
-        return self.responses.filter(status='pending').count()
+        return self.pending_responses_count
     
     def get_accepted_responses_count(self):
         """Получить количество принятых откликов"""
-        return self.responses.filter(status='accepted').count()
+        return self.accepted_responses_count
 
 
 class Response(models.Model):
@@ -94,6 +243,14 @@ class Response(models.Model):
         verbose_name_plural = 'Отклики'
         ordering = ['-created_at']
         unique_together = ['post', 'author']  # Один пользователь может оставить только один отклик на объявление
+        indexes = [
+            # Отклики на объявления пользователя с фильтром по статусу
+            models.Index(fields=['post', 'status', '-created_at'], name='response_post_status_idx'),
+            # Ожидающие отклики на странице объявления
+            models.Index(fields=['post', '-created_at'], condition=models.Q(status='pending'), name='response_pending_idx'),
+            # «Мои отклики»
+            models.Index(fields=['author', '-created_at', '-id'], name='response_author_created_idx'),
+        ]
     
     def __str__(self):
         return f'Отклик от {self.author.username} на "{self.post.title}"'
@@ -104,6 +261,12 @@ class Response(models.Model):
 
 class Newsletter(models.Model):
     """Модель для новостных рассылок"""
+    STATUS_CHOICES = [
+        ('draft', 'Черновик'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлена'),
+    ]
+    
     title = models.CharField(max_length=200, verbose_name='Заголовок')
     content = RichTextField(verbose_name='Содержание')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
@@ -111,6 +274,12 @@ class Newsletter(models.Model):
     is_sent = models.BooleanField(default=False, verbose_name='Отправлено')
     recipients = models.ManyToManyField(User, blank=True, verbose_name='Получатели')
     
+    # Ход отправки: обновляется частями рассылки по мере доставки
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', verbose_name='Статус')
+    queued_count = models.PositiveIntegerField(default=0, verbose_name='В очереди')
+    sent_count = models.PositiveIntegerField(default=0, verbose_name='Доставлено')
+    failed_count = models.PositiveIntegerField(default=0, verbose_name='Не доставлено')
+    
     class Meta:
         verbose_name = 'Новостная рассылка'
         verbose_name_plural = 'Новостные рассылки'
@@ -121,13 +290,55 @@ class Newsletter(models.Model):
     
     def send_newsletter(self):
         """Отправить рассылку"""
-        if not self.is_sent:
+        if self.status == 'draft':
+            from notifications.models import EmailOutbox
             from .tasks import send_newsletter_task
-            send_newsletter_task.delay(self.pk)
-            self.is_sent = True
-            self.sent_at = timezone.now()
-            self.save()
+            # Запись в исходящей очереди фиксируется вместе со сменой статуса;
+            # is_sent и sent_at выставляются, когда доставлены все части
+            with transaction.atomic():
+                EmailOutbox.enqueue(send_newsletter_task, self.pk)
+                self.status = 'sending'
+                self.save(update_fields=['status'])
     
     def get_recipients_count(self):
         """Получить количество получателей"""
         return self.recipients.count() if self.recipients.exists() else User.objects.filter(is_active=True).count()
+
+
+class NewsletterChunk(models.Model):
+    """Часть рассылки: получатели с id из диапазона [first_user_id, last_user_id]
+
+    Части отправляются параллельными задачами. Курсор last_processed_id
+    сохраняется после каждой пачки писем, поэтому перезапущенная задача
+    продолжает с места остановки. Аренда lease_expires_at не дает двум
+    воркерам отправлять одну часть одновременно: воркер сохраняет прогресс,
+    только пока claim_token в строке совпадает с полученным при захвате.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('done', 'Отправлена'),
+    ]
+    
+    newsletter = models.ForeignKey(Newsletter, on_delete=models.CASCADE, related_name='chunks', verbose_name='Рассылка')
+    first_user_id = models.PositiveIntegerField(verbose_name='Первый получатель')
+    last_user_id = models.PositiveIntegerField(verbose_name='Последний получатель')
+    last_processed_id = models.PositiveIntegerField(default=0, verbose_name='Обработано до')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='Статус')
+    queued_count = models.PositiveIntegerField(default=0, verbose_name='В очереди')
+    sent_count = models.PositiveIntegerField(default=0, verbose_name='Доставлено')
+    failed_count = models.PositiveIntegerField(default=0, verbose_name='Не доставлено')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name='Аренда до')
+    claim_token = models.UUIDField(null=True, blank=True, verbose_name='Токен аренды')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Часть рассылки'
+        verbose_name_plural = 'Части рассылок'
+        ordering = ['newsletter', 'first_user_id']
+        indexes = [
+            # Поиск зависших частей: только неотправленные
+            models.Index(fields=['updated_at'], condition=models.Q(status='pending'), name='newsletter_chunk_pending_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.newsletter}: {self.first_user_id}-{self.last_user_id}'
@@ -0,0 +1,151 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(InvalidPage):
+    """Курсор страницы поврежден или подделан"""
+    pass
+
+
+class CursorPage:
+    """Страница курсорной пагинации
+
+    Повторяет интерфейс django.core.paginator.Page, которым пользуются шаблоны
+    (has_next, has_previous, has_other_pages, итерация), но вместо номеров
+    страниц отдает непрозрачные курсоры next_cursor / previous_cursor.
+    """
+    is_cursor_page = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Курсорная (keyset) пагинация по (created_at, id)
+
+    Вместо OFFSET и COUNT(*) каждая страница выбирается условием
+    (created_at, id) < (курсор) по индексу, поэтому глубокие страницы
+    стоят столько же, сколько первая.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+
+    def page(self, cursor=None):
+        """Получить страницу после (или перед) курсором"""
+        if not cursor:
+            return self._forward_page(self.queryset, has_previous=False)
+
+        direction, created_at, pk = self.decode_cursor(cursor)
+        if direction == 'n':
+            queryset = self.queryset.filter(
+                Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(pk__lt=pk))
+            )
+            return self._forward_page(queryset, has_previous=True)
+
+        queryset = self.queryset.filter(
+            Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(pk__gt=pk))
+        )
+        return self._backward_page(queryset)
+
+    def _forward_page(self, queryset, has_previous):
+        objects = list(queryset.order_by('-created_at', '-pk')[:self.per_page + 1])
+        has_next = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        return self._make_page(objects, has_next, has_previous and bool(objects))
+
+    def _backward_page(self, queryset):
+        objects = list(queryset.order_by('created_at', 'pk')[:self.per_page + 1])
+        has_previous = len(objects) > self.per_page
+        objects = objects[:self.per_page][::-1]
+        return self._make_page(objects, bool(objects), has_previous)
+
+    def _make_page(self, objects, has_next, has_previous):
+        next_cursor = self.encode_cursor('n', objects[-1]) if has_next else None
+        previous_cursor = self.encode_cursor('p', objects[0]) if has_previous else None
+        return CursorPage(objects, self, next_cursor, previous_cursor)
+
+    @staticmethod
+    def encode_cursor(direction, obj):
+        """Закодировать позицию объекта в непрозрачный токен"""
+        payload = json.dumps([direction, obj.created_at.isoformat(), obj.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Раскодировать токен в (направление, created_at, pk)"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+            return direction, datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise InvalidCursor('Некорректный курсор страницы')
+
+
+def get_page(request, queryset, per_page, cursor_param='cursor', page_param='page'):
+    """Страница для шаблона: курсорная, либо нумерованная, если запрошен номер страницы
+
+    Нумерованная страница (с COUNT(*)) строится только при явном параметре ?page=.
+    """
+    if page_param in request.GET:
+        return Paginator(queryset, per_page).get_page(request.GET.get(page_param))
+
+    try:
+        return CursorPaginator(queryset, per_page).page(request.GET.get(cursor_param))
+    except InvalidCursor as e:
+        raise Http404(str(e))
+
+
+class CursorPaginationMixin:
+    """Миксин для ListView: курсорная пагинация вместо OFFSET/COUNT(*)
+
+    Номерная пагинация Django используется, только если в запросе явно
+    передан номер страницы или use_cursor_pagination() вернул False.
+    """
+    cursor_kwarg = 'cursor'
+
+    def use_cursor_pagination(self):
+        return self.page_kwarg not in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
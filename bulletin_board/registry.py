@@ -0,0 +1,83 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Category
+
+# Реестр категорий в памяти процесса.
+#
+# Категорий фиксированное количество, и меняются они крайне редко, поэтому
+# список загружается из БД один раз на процесс. Версия списка хранится в Redis:
+# при сохранении категории версия меняется, и остальные воркеры перечитывают
+# список при следующей проверке версии (не чаще раза в CATEGORY_REGISTRY_CHECK_INTERVAL).
+
+VERSION_KEY = 'board:categories:version'
+
+_lock = threading.Lock()
+_categories = None
+_loaded_version = None
+_checked_at = 0.0
+
+
+def _check_interval():
+    return getattr(settings, 'CATEGORY_REGISTRY_CHECK_INTERVAL', 5)
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_categories():
+    """Список всех категорий без запроса к БД (кроме первой загрузки и после изменений)"""
+    global _categories, _loaded_version, _checked_at
+
+    now = time.monotonic()
+    if _categories is not None and now - _checked_at < _check_interval():
+        return _categories
+
+    with _lock:
+        version = _current_version()
+        if _categories is None or version != _loaded_version:
+            _categories = list(Category.objects.all())
+            _loaded_version = version
+        _checked_at = now
+        return _categories
+
+
+def get_category(pk):
+    """Категория по id из реестра или None"""
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    for category in get_categories():
+        if category.pk == pk:
+            return category
+    return None
+
+
+def get_category_choices(empty_label=None):
+    """Варианты для поля выбора категории в формах"""
+    choices = [(category.pk, str(category)) for category in get_categories()]
+    if empty_label is not None:
+        choices.insert(0, ('', empty_label))
+    return choices
+
+
+def invalidate():
+    """Сбросить реестр во всех процессах (вызывается при изменении категорий)"""
+    global _categories, _checked_at
+
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    with _lock:
+        _categories = None
+        _checked_at = 0.0
@@ -0,0 +1,154 @@
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+from django.utils.html import escape
+from django.utils.text import Truncator
+
+# Очистка HTML из CKEditor по белому списку тегов и атрибутов.
+# Набор тегов соответствует панели инструментов CKEDITOR_CONFIGS['default'].
+
+ALLOWED_TAGS = {
+    'p': {'style'}, 'br': set(), 'div': {'style'}, 'span': {'style'},
+    'b': set(), 'strong': set(), 'i': set(), 'em': set(), 'u': set(),
+    'ol': set(), 'ul': set(), 'li': {'style'}, 'blockquote': set(),
+    'a': {'href', 'title', 'target'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'iframe': {'src', 'width', 'height', 'allowfullscreen', 'frameborder'},
+}
+VOID_TAGS = {'br', 'img'}
+# Содержимое этих тегов выбрасывается целиком
+DROP_CONTENT_TAGS = {'script', 'style', 'head', 'title', 'noscript'}
+# После этих тегов в простом тексте ставится пробел
+BLOCK_TAGS = {'p', 'br', 'div', 'li', 'ol', 'ul', 'blockquote', 'tr', 'td', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+ALLOWED_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+ALLOWED_IFRAME_HOSTS = {'www.youtube.com', 'youtube.com', 'www.youtube-nocookie.com', 'player.vimeo.com'}
+TEXT_ALIGN_RE = re.compile(r'^\s*text-align\s*:\s*(left|right|center|justify)\s*;?\s*$', re.IGNORECASE)
+
+EXCERPT_LENGTH = 300
+
+
+class _Sanitizer(HTMLParser):
+    """Собирает очищенный HTML и простой текст за один проход"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html_parts = []
+        self.text_parts = []
+        self.open_tags = []
+        self.drop_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.drop_depth += 1
+            return
+        if self.drop_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self.text_parts.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+
+        clean_attrs = self._clean_attrs(tag, attrs)
+        if clean_attrs is None:
+            return
+        rendered = ''.join(
+            f' {name}' if value is None else f' {name}="{escape(value)}"'
+            for name, value in clean_attrs
+        )
+        self.html_parts.append(f'<{tag}{rendered}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.drop_depth = max(self.drop_depth - 1, 0)
+            return
+        if self.drop_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self.text_parts.append(' ')
+        if tag not in self.open_tags:
+            return
+        # Закрываем также все незакрытые вложенные теги
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.html_parts.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.drop_depth:
+            return
+        self.html_parts.append(escape(data))
+        self.text_parts.append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.html_parts.append(f'</{self.open_tags.pop()}>')
+
+    def _clean_attrs(self, tag, attrs):
+        """Оставить только разрешенные атрибуты; None - выбросить тег целиком"""
+        allowed = ALLOWED_TAGS[tag]
+        clean = []
+        for name, value in attrs:
+            if name not in allowed:
+                continue
+            if name in ('href', 'src'):
+                if not value or not _is_safe_url(value):
+                    continue
+                if tag == 'iframe' and urlparse(value).hostname not in ALLOWED_IFRAME_HOSTS:
+                    return None
+            elif name == 'style':
+                if not value or not TEXT_ALIGN_RE.match(value):
+                    continue
+            elif name == 'target':
+                value = '_blank'
+                clean.append(('rel', 'noopener noreferrer nofollow'))
+            clean.append((name, value))
+        if tag in ('img', 'iframe') and not any(name == 'src' for name, _ in clean):
+            return None
+        return clean
+
+
+def _is_safe_url(url):
+    url = url.strip()
+    try:
+        return urlparse(url).scheme.lower() in ALLOWED_URL_SCHEMES
+    except ValueError:
+        return False
+
+
+def _parse(content):
+    parser = _Sanitizer()
+    parser.feed(content or '')
+    parser.close()
+    return parser
+
+
+def _make_excerpt(text_parts, length):
+    text = ' '.join(''.join(text_parts).split())
+    return Truncator(text).chars(length)
+
+
+def sanitize_html(content):
+    """Очищенный HTML, безопасный для вывода через |safe"""
+    return ''.join(_parse(content).html_parts)
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    """Короткий текстовый анонс из HTML-содержания"""
+    return _make_excerpt(_parse(content).text_parts, length)
+
+
+def render_content(content, length=EXCERPT_LENGTH):
+    """Очищенный HTML и текстовый анонс за один разбор документа"""
+    parser = _parse(content)
+    return ''.join(parser.html_parts), _make_excerpt(parser.text_parts, length)
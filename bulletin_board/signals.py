@@ -1,75 +1,114 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django.contrib.contenttypes.models import ContentType
-from .models import Response, Post
-from notifications.models import Notification
-from django.contrib.auth.models import User
+from .models import Category, Response, Post
+from . import cache as listing_cache
+from . import registry
+from .images import schedule_variants, variants_outdated
+from notifications.pipeline import enqueue_notification
 
 @receiver(post_save, sender=Response)
 def create_response_notification(sender, instance, created, **kwargs):
-    """Создать уведомление при создании нового отклика"""
+    """Поставить в очередь уведомление о новом отклике или о решении по нему
+    
+    Обработчик должен идти раньше update_response_counters: тот обновляет
+    запомненный прежний статус.
+    """
     if created:
-        # Уведомление автору объявления о новом отклике
-        Notification.objects.create(
-            recipient=instance.post.author,
-            sender=instance.author,
-            notification_type='new_response',
-            title='Новый отклик на ваше объявление',
-            message=f'Пользователь {instance.author.username} оставил отклик на ваше объявление "{instance.post.title}"',
-            content_type=ContentType.objects.get_for_model(Response),
-            object_id=instance.pk
-        )
-        
-        # Отправить email уведомление
-        notification = Notification.objects.filter(
-            recipient=instance.post.author,
-            content_type=ContentType.objects.get_for_model(Response),
-            object_id=instance.pk
-        ).first()
-        
-        if notification:
-            notification.send_email()
+        enqueue_notification('new_response', instance.pk)
+        return
+    
+    previous_status = getattr(instance, '_previous_status', instance.status)
+    if previous_status == 'pending' and instance.status in ('accepted', 'rejected'):
+        enqueue_notification(f'response_{instance.status}', instance.pk)
 
 
 @receiver(pre_save, sender=Response)
 def response_status_changed(sender, instance, **kwargs):
-    """Обработать изменение статуса отклика"""
+    """Запомнить прежний статус отклика для уведомлений и пересчета счетчиков в post_save"""
+    if instance.pk:
+        previous_status = Response.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        if previous_status is not None:
+            instance._previous_status = previous_status
+
+
+def shift_response_counters(post_id, decrement_status=None, increment_status=None):
+    """Атомарно сдвинуть счетчики откликов объявления одним UPDATE через F()"""
+    updates = {}
+    decrement_field = Post.RESPONSE_COUNTER_FIELDS.get(decrement_status)
+    increment_field = Post.RESPONSE_COUNTER_FIELDS.get(increment_status)
+    
+    if decrement_field:
+        updates[decrement_field] = Greatest(F(decrement_field) - 1, 0)
+    if increment_field:
+        updates[increment_field] = F(increment_field) + 1
+    
+    if updates:
+        Post.objects.filter(pk=post_id).update(**updates)
+
+
+@receiver(post_save, sender=Response)
+def update_response_counters(sender, instance, created, **kwargs):
+    """Обновить счетчики откликов при создании отклика или смене его статуса"""
+    if created:
+        shift_response_counters(instance.post_id, increment_status=instance.status)
+        return
+    
+    previous_status = getattr(instance, '_previous_status', instance.status)
+    if previous_status != instance.status:
+        shift_response_counters(instance.post_id, previous_status, instance.status)
+    instance._previous_status = instance.status
+
+
+@receiver(post_delete, sender=Response)
+def decrement_response_counters(sender, instance, **kwargs):
+    """Уменьшить счетчик откликов при удалении отклика"""
+    shift_response_counters(instance.post_id, decrement_status=instance.status)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_category(sender, instance, **kwargs):
+    """Запомнить прежнюю категорию, чтобы сбросить кеш и ее страницы"""
     if instance.pk:
-        try:
-            old_instance = Response.objects.get(pk=instance.pk)
-            # Если статус изменился с pending на accepted или rejected
-            if old_instance.status != instance.status and old_instance.status == 'pending':
-                if instance.status == 'accepted':
-                    # Уведомление автору отклика о принятии
-                    Notification.objects.create(
-                        recipient=instance.author,
-                        sender=instance.post.author,
-                        notification_type='response_accepted',
-                        title='Ваш отклик принят!',
-                        message=f'Ваш отклик на объявление "{instance.post.title}" был принят пользователем {instance.post.author.username}',
-                        content_type=ContentType.objects.get_for_model(Response),
-                        object_id=instance.pk
-                    )
-                elif instance.status == 'rejected':
-                    # Уведомление автору отклика об отклонении
-                    Notification.objects.create(
-                        recipient=instance.author,
-                        sender=instance.post.author,
-                        notification_type='response_rejected',
-                        title='Ваш отклик отклонен',
-                        message=f'Ваш отклик на объявление "{instance.post.title}" был отклонен пользователем {instance.post.author.username}',
-                        content_type=ContentType.objects.get_for_model(Response),
-                        object_id=instance.pk
-                    )
-                
-                # Отправить email уведомление
-                notification = Notification.objects.filter(
-                    recipient=instance.author,
-                    content_type=ContentType.objects.get_for_model(Response),
-                    object_id=instance.pk
-                ).last()
-                
-                if notification:
-                    notification.send_email()
-        except Response.DoesNotExist:
-            pass 
\ No newline at end of file
+        instance._previous_category_id = Post.objects.filter(pk=instance.pk).values_list(
+            'category_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_listings(sender, instance, **kwargs):
+    """Сбросить кеш списков объявлений при изменении объявления"""
+    listing_cache.bump_for_category(instance.category_id)
+    previous_category_id = getattr(instance, '_previous_category_id', None)
+    if previous_category_id and previous_category_id != instance.category_id:
+        listing_cache.bump_generation(previous_category_id)
+
+
+@receiver(post_save, sender=Response)
+@receiver(post_delete, sender=Response)
+def invalidate_response_listings(sender, instance, **kwargs):
+    """Сбросить кеш списков объявлений, где показаны счетчики откликов"""
+    try:
+        category_id = instance.post.category_id
+    except Post.DoesNotExist:
+        # Отклик удаляется каскадно вместе с объявлением, кеш сбросит сигнал объявления
+        return
+    listing_cache.bump_for_category(category_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_registry(sender, instance, **kwargs):
+    """Сбросить реестр категорий во всех процессах"""
+    registry.invalidate()
+
+
+@receiver(post_save, sender=Post)
+def schedule_post_image_variants(sender, instance, **kwargs):
+    """Построить варианты изображения в фоне после загрузки нового файла"""
+    if {'image', 'image_variants'} & instance.get_deferred_fields():
+        return
+    if variants_outdated(instance):
+        schedule_variants(instance)
@@ -1,73 +1,143 @@
 from celery import shared_task
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.conf import settings
-from django.contrib.auth.models import User
-from .models import Newsletter
+from django.utils import timezone
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import Newsletter, Post, Response
+from .images import generate_variants
+from .sanitizer import render_content
 
-@shared_task
+@shared_task(acks_late=True)
 def send_newsletter_task(newsletter_id):
-    """Задача для отправки новостной рассылки"""
+    """Задача для отправки новостной рассылки: делит получателей на части и запускает их параллельно"""
+    from notifications.newsletters import dispatch_newsletter
     try:
-        newsletter = Newsletter.objects.get(id=newsletter_id)
-        
-        # Получаем список получателей
-        if newsletter.recipients.exists():
-            recipients = newsletter.recipients.all()
-        else:
-            # Если получатели не указаны, отправляем всем активным пользователям с подпиской
-            recipients = User.objects.filter(
-                is_active=True,
-                profile__newsletter_subscription=True
-            )
-        
-        sent_count = 0
-        
-        for user in recipients:
-            try:
-                # Подготовка содержимого письма
-                subject = f'[MMORPG Board Newsletter] {newsletter.title}'
-                
-                context = {
-                    'newsletter': newsletter,
-                    'user': user,
-                    'site_name': 'MMORPG Board',
-                    'site_url': getattr(settings, 'SITE_URL', 'http://localhost:8000'),
-                }
-                
-                # Рендерим HTML и текстовую версию
-                html_message = render_to_string('notifications/emails/newsletter.html', context)
-                plain_message = strip_tags(html_message)
-                
-                # Отправляем email
-                send_mail(
-                    subject=subject,
-                    message=plain_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    html_message=html_message,
-                    fail_silently=False,
-                )
-                
-                sent_count += 1
-                
-                # Создаем уведомление в системе
-                from notifications.models import Notification
-                Notification.objects.create(
-                    recipient=user,
-                    notification_type='newsletter',
-                    title=newsletter.title,
-                    message=f'Новая рассылка: {newsletter.title}',
-                    is_sent=True
-                )
-                
-            except Exception as e:
-                print(f'Ошибка при отправке рассылки пользователю {user.username}: {str(e)}')
-        
-        return f'Рассылка "{newsletter.title}" отправлена {sent_count} пользователям'
-        
+        dispatched = dispatch_newsletter(newsletter_id)
     except Newsletter.DoesNotExist:
         return f'Рассылка с ID {newsletter_id} не найдена'
-    except Exception as e:
-        return f'Ошибка при отправке рассылки: {str(e)}' 
\ No newline at end of file
+    return f'Рассылка {newsletter_id}: запущено частей {dispatched}'
+
+
+@shared_task(bind=True, acks_late=True, max_retries=5)
+def send_newsletter_chunk_task(self, chunk_id):
+    """Отправить часть рассылки; при повторном запуске продолжает с места остановки"""
+    from notifications.mailer import MailServerUnavailable
+    from notifications.newsletters import ChunkLeaseLost, send_newsletter_chunk
+    try:
+        sent, failed = send_newsletter_chunk(chunk_id)
+    except MailServerUnavailable as exc:
+        # Часть осталась в ожидании; после исчерпания попыток ее перезапустит resume_newsletters_task
+        raise self.retry(exc=exc, countdown=60 * 2 ** self.request.retries)
+    except ChunkLeaseLost:
+        return f'Часть рассылки {chunk_id} отправляет другой воркер'
+    return f'Часть рассылки {chunk_id}: доставлено {sent}, не доставлено {failed}'
+
+
+@shared_task
+def finish_newsletter_task(newsletter_id):
+    """Отметить рассылку отправленной после отправки всех частей"""
+    from notifications.newsletters import finish_newsletter
+    if finish_newsletter(newsletter_id):
+        return f'Рассылка {newsletter_id} отправлена'
+    return f'Рассылка {newsletter_id}: остались неотправленные части'
+
+
+@shared_task
+def resume_newsletters_task():
+    """Перезапустить рассылки с зависшими частями"""
+    from notifications.newsletters import resume_stalled_newsletters
+    return f'Перезапущено рассылок: {resume_stalled_newsletters()}'
+
+
+def _response_count_subquery(status):
+    """Подзапрос с фактическим количеством откликов объявления в заданном статусе"""
+    return Coalesce(
+        Subquery(
+            Response.objects.filter(post=OuterRef('pk'), status=status)
+            .order_by()
+            .values('post')
+            .annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def reconcile_response_counters(batch_size=1000):
+    """Сверить денормализованные счетчики откликов с фактическими и исправить расхождения
+    
+    Объявления обрабатываются пачками по диапазонам id, обновляются только
+    строки с расхождением. Возвращает количество исправленных объявлений.
+    """
+    max_id = Post.objects.aggregate(max_id=Max('pk'))['max_id'] or 0
+    fixed_count = 0
+    
+    for start in range(0, max_id + 1, batch_size):
+        drifted_ids = list(
+            Post.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+            .annotate(
+                actual_pending=_response_count_subquery('pending'),
+                actual_accepted=_response_count_subquery('accepted'),
+            )
+            .filter(
+                ~Q(pending_responses_count=F('actual_pending')) |
+                ~Q(accepted_responses_count=F('actual_accepted'))
+            )
+            .values_list('pk', flat=True)
+        )
+        if drifted_ids:
+            fixed_count += Post.objects.filter(pk__in=drifted_ids).update(
+                pending_responses_count=_response_count_subquery('pending'),
+                accepted_responses_count=_response_count_subquery('accepted'),
+            )
+    
+    return fixed_count
+
+
+@shared_task
+def reconcile_response_counters_task(batch_size=1000):
+    """Периодическая сверка счетчиков откликов"""
+    fixed_count = reconcile_response_counters(batch_size)
+    return f'Исправлены счетчики откликов у {fixed_count} объявлений'
+
+
+@shared_task
+def render_post_content_task(post_id):
+    """Очистить HTML и построить анонс для объявления с большим содержанием"""
+    content = Post.objects.filter(pk=post_id).values_list('content', flat=True).first()
+    if content is None:
+        return f'Объявление с ID {post_id} не найдено'
+    
+    content_html, excerpt = render_content(content)
+    # update() не вызывает save(), поэтому задача не перезапускает сама себя;
+    # условие по content защищает от записи результата для устаревшей версии текста
+    # (updated_at меняется, чтобы сбросить ETag страницы объявления)
+    Post.objects.filter(pk=post_id, content=content).update(
+        content_html=content_html, excerpt=excerpt, updated_at=timezone.now()
+    )
+    return f'Содержание объявления {post_id} обработано'
+
+
+def rebuild_post_content(batch_size=500):
+    """Пересчитать очищенный HTML и анонсы всех объявлений (после изменения правил очистки)"""
+    batch = []
+    processed = 0
+    for post in Post.objects.only('pk', 'content').iterator(chunk_size=batch_size):
+        post.content_html, post.excerpt = render_content(post.content)
+        batch.append(post)
+        if len(batch) >= batch_size:
+            Post.objects.bulk_update(batch, ['content_html', 'excerpt'])
+            processed += len(batch)
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['content_html', 'excerpt'])
+        processed += len(batch)
+    return processed
+
+
+@shared_task
+def generate_image_variants_task(label, pk):
+    """Построить миниатюры и WebP-варианты изображения объявления или аватара"""
+    if generate_variants(label, pk):
+        return f'Варианты изображения {label} {pk} построены'
+    return f'Изображение {label} {pk} изменилось или объект удален'
@@ -0,0 +1,47 @@
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+def _srcset(storage, variants, image_format):
+    return ', '.join(
+        f"{storage.url(variant['name'])} {variant['width']}w"
+        for variant in variants
+        if variant['format'] == image_format
+    )
+
+
+@register.simple_tag
+def responsive_image(image, variants=None, sizes='100vw', alt='', css_class=''):
+    """Тег <picture> с WebP и srcset по построенным вариантам изображения
+
+    Пока варианты не построены, выводится исходное изображение.
+    Пример: {% responsive_image post.image post.image_variants sizes="160px" alt=post.title %}
+    """
+    if not image:
+        return ''
+
+    variants = (variants or {}).get('variants') or []
+    if not variants:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            image.url, alt, css_class
+        )
+
+    fallback = [variant for variant in variants if variant['format'] != 'webp']
+    largest = fallback[-1]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" class="{}" loading="lazy" decoding="async"></picture>',
+        _srcset(image.storage, variants, 'webp'),
+        sizes,
+        image.storage.url(largest['name']),
+        _srcset(image.storage, variants, largest['format']),
+        sizes,
+        largest['width'],
+        largest['height'],
+        alt,
+        css_class,
+    )
@@ -0,0 +1,300 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from celery import current_app
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import registry
+from .models import Category, Post, Response
+from .sanitizer import render_content
+
+# Общая инфраструктура тестов производительности представлений.
+#
+# Каждый тест запрашивает страницу тестовым клиентом, проверяет верхнюю
+# границу числа SQL-запросов и записывает число запросов, время ответа и
+# размер ответа. В конце прогона результаты сравниваются с сохраненным
+# базовым файлом performance_baseline.json. Обновить базовый файл:
+#
+#     PERF_UPDATE_BASELINE=1 python manage.py test
+
+BASELINE_PATH = Path(os.environ.get('PERF_BASELINE_PATH', Path(settings.BASE_DIR) / 'performance_baseline.json'))
+
+# Изменение времени меньше порога считается шумом
+TIME_TOLERANCE = 0.25
+TIME_TOLERANCE_MS = 5.0
+
+# Шаблон-заглушка для страниц, шаблонов которых нет в репозитории.
+# Выводит те же объекты, что и настоящие страницы, чтобы ленивые
+# обращения к связанным моделям (N+1) попадали в подсчет запросов.
+STUB_TEMPLATE = """{% extends 'base.html' %}
+{% block content %}
+{{ object }}
+{% for item in object_list %}{{ item }}{% endfor %}
+{% for item in responses %}{{ item }}{% endfor %}
+{% for item in recent_posts %}{{ item }}{% endfor %}
+{% for item in recent_responses %}{{ item }}{% endfor %}
+{% for item in recent_responses_to_posts %}{{ item }}{% endfor %}
+{% for item in my_posts %}{{ item.title }}{% endfor %}
+{{ form.as_p }}{{ user_form.as_p }}
+{% endblock %}
+"""
+
+STUB_TEMPLATE_NAMES = [
+    'bulletin_board/category_detail.html',
+    'bulletin_board/post_detail.html',
+    'bulletin_board/post_form.html',
+    'bulletin_board/post_confirm_delete.html',
+    'bulletin_board/response_form.html',
+    'bulletin_board/response_confirm_delete.html',
+    'bulletin_board/my_posts.html',
+    'bulletin_board/my_responses.html',
+    'bulletin_board/responses_to_posts.html',
+    'bulletin_board/search_results.html',
+    'notifications/notification_list.html',
+    'notifications/notification_detail.html',
+    'notifications/notification_confirm_delete.html',
+    'accounts/dashboard.html',
+    'accounts/profile.html',
+    'accounts/public_profile.html',
+    'accounts/profile_edit.html',
+    'accounts/settings.html',
+    'accounts/password_change.html',
+]
+
+
+def _templates_with_stubs():
+    templates = [dict(options) for options in settings.TEMPLATES]
+    django_templates = templates[0]
+    django_templates['APP_DIRS'] = False
+    django_templates['OPTIONS'] = dict(django_templates.get('OPTIONS', {}))
+    django_templates['OPTIONS']['loaders'] = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+        ('django.template.loaders.locmem.Loader', {name: STUB_TEMPLATE for name in STUB_TEMPLATE_NAMES}),
+    ]
+    return templates
+
+
+def seed_performance_data(posts_count=40, responders_count=6, notifications_count=30):
+    """Небольшой, но реалистичный набор данных: у каждой страницы есть что выводить
+
+    Основной пользователь (owner) владеет частью объявлений, оставляет отклики
+    на чужие и получает уведомления. Объекты создаются через bulk_create,
+    поэтому сигналы (уведомления, письма) не срабатывают.
+    """
+    from notifications.models import Notification
+
+    categories = [Category.objects.create(name=name) for name, _ in Category.CATEGORY_CHOICES]
+    owner = User.objects.create(username='owner', email='owner@example.com')
+    others = [
+        User.objects.create(username=f'player{index}', email=f'player{index}@example.com')
+        for index in range(responders_count)
+    ]
+
+    content = '<p>Ищу группу для рейда. <strong>Опыт обязателен</strong>.</p>'
+    content_html, excerpt = render_content(content)
+    posts = Post.objects.bulk_create([
+        Post(
+            title=f'Объявление {index}',
+            content=content,
+            content_html=content_html,
+            excerpt=excerpt,
+            author=owner if index % 2 == 0 else others[index % responders_count],
+            category=categories[index % len(categories)],
+        )
+        for index in range(posts_count)
+    ])
+
+    responses = []
+    for post in posts:
+        authors = [owner] if post.author_id != owner.pk else []
+        authors += [user for user in others if user.pk != post.author_id][:3]
+        responses += [
+            Response(post=post, author=author, content='Готов присоединиться', status='pending')
+            for author in authors
+        ]
+    responses = Response.objects.bulk_create(responses)
+    for post in posts:
+        post.pending_responses_count = sum(1 for response in responses if response.post_id == post.pk)
+    Post.objects.bulk_update(posts, ['pending_responses_count'])
+
+    response_type = ContentType.objects.get_for_model(Response)
+    owner_responses = [response for response in responses if response.post.author_id == owner.pk]
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            recipient=owner,
+            sender=response.author,
+            notification_type='new_response',
+            title='Новый отклик на ваше объявление',
+            message=f'Пользователь {response.author.username} оставил отклик',
+            content_type=response_type,
+            object_id=response.pk,
+            is_read=index % 3 == 0,
+        )
+        for index, response in enumerate((owner_responses * notifications_count)[:notifications_count])
+    ])
+
+    return {
+        'owner': owner,
+        'others': others,
+        'categories': categories,
+        'owner_post': next(post for post in posts if post.author_id == owner.pk),
+        'other_post': next(post for post in posts if post.author_id != owner.pk),
+        'owner_response': next(response for response in responses if response.author_id == owner.pk),
+        'response_to_owner': owner_responses[0],
+        'notification': notifications[0],
+    }
+
+
+class ViewPerformanceTestCase(TestCase):
+    """Базовый класс тестов производительности представлений"""
+    # Сколько раз повторять GET-запрос для оценки времени (берется минимум)
+    repeat = 3
+
+    @classmethod
+    def setUpClass(cls):
+        cls.results = {}
+        cls._settings_override = override_settings(
+            TEMPLATES=_templates_with_stubs(),
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        )
+        cls._settings_override.enable()
+        cls._eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        current_app.conf.task_always_eager = cls._eager
+        cls._settings_override.disable()
+        report_results(cls.results)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_performance_data()
+        cls.owner = cls.data['owner']
+
+    def _reset_caches(self):
+        # Каждый замер делается с холодными кешами, чтобы число запросов не
+        # зависело от порядка тестов
+        cache.clear()
+        registry.invalidate()
+        ContentType.objects.clear_cache()
+
+    def _request(self, method, url, data):
+        self._reset_caches()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(url, data or {})
+                if hasattr(response, 'render') and not response.is_rendered:
+                    response.render()
+                elapsed = time.perf_counter() - started
+            # Изменения, сделанные запросом, откатываются: повторы идут в одинаковых условиях
+            transaction.set_rollback(True)
+        return response, len(queries), elapsed
+
+    def assertViewPerformance(self, name, url, max_queries, user=None, method='get', data=None, status=None):
+        """Запросить страницу, проверить бюджет запросов и записать замер"""
+        if user is not None:
+            self.client.force_login(user)
+        else:
+            self.client.logout()
+
+        repeat = self.repeat if method == 'get' else 1
+        timings = []
+        for _ in range(repeat):
+            response, query_count, elapsed = self._request(method, url, data)
+            timings.append(elapsed)
+
+        key = f'{name}:{"user" if user is not None else "anonymous"}'
+        self.results[key] = {
+            'method': method.upper(),
+            'status': response.status_code,
+            'queries': query_count,
+            'time_ms': round(min(timings) * 1000, 2),
+            'size': len(getattr(response, 'content', b'')),
+        }
+
+        if status is not None:
+            self.assertEqual(response.status_code, status, key)
+        self.assertLessEqual(
+            query_count, max_queries,
+            f'{key}: {query_count} SQL-запросов при бюджете {max_queries}'
+        )
+        return response
+
+
+def _load_baseline():
+    try:
+        with open(BASELINE_PATH, encoding='utf-8') as baseline_file:
+            return json.load(baseline_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _format_delta(current, previous, unit=''):
+    if previous is None:
+        return f'{current}{unit} (новый)'
+    delta = current - previous
+    if not delta:
+        return f'{current}{unit}'
+    sign = '+' if delta > 0 else ''
+    return f'{current}{unit} ({sign}{round(delta, 2)}{unit})'
+
+
+def diff_results(results, baseline):
+    """Строки отчета по замерам, отличающимся от базовых"""
+    lines = []
+    for key in sorted(results):
+        current = results[key]
+        previous = baseline.get(key, {})
+        time_delta = current['time_ms'] - previous.get('time_ms', current['time_ms'])
+        changed = (
+            not previous
+            or current['queries'] != previous.get('queries')
+            or current['size'] != previous.get('size')
+            or (
+                abs(time_delta) > TIME_TOLERANCE_MS
+                and abs(time_delta) > TIME_TOLERANCE * previous.get('time_ms', 0)
+            )
+        )
+        if not changed:
+            continue
+        marker = '!' if current['queries'] > previous.get('queries', current['queries']) else ' '
+        lines.append(
+            f"{marker} {key}: запросов {_format_delta(current['queries'], previous.get('queries'))}, "
+            f"время {_format_delta(current['time_ms'], previous.get('time_ms'), ' мс')}, "
+            f"размер {_format_delta(current['size'], previous.get('size'), ' Б')}"
+        )
+    return lines
+
+
+def report_results(results):
+    """Сравнить замеры с базовым файлом или обновить его"""
+    if not results:
+        return
+
+    baseline = _load_baseline()
+    if os.environ.get('PERF_UPDATE_BASELINE'):
+        baseline.update(results)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as baseline_file:
+            json.dump(dict(sorted(baseline.items())), baseline_file, ensure_ascii=False, indent=2)
+            baseline_file.write('\n')
+        return
+
+    lines = diff_results(results, baseline)
+    if lines:
+        sys.stderr.write('\nОтличия от базовых замеров производительности:\n')
+        sys.stderr.write('\n'.join(lines) + '\n')
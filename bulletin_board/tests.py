@@ -1,3 +1,436 @@
-from django.test import TestCase
+import base64
+from datetime import timedelta
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.db.models import F
+from django.http import Http404, HttpResponse
+from django.template import engines
+from django.template.response import SimpleTemplateResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
+
+from mmorpg_board.routers import PIN_COOKIE_NAME, ReplicaPinningMiddleware, ReplicaReadMixin, ReplicaRouter, replica_reads
+from .cache import AnonymousPageCacheMixin
+from .models import Category, Post, Response
+from .pagination import CursorPaginator, InvalidCursor, get_page
+from .sanitizer import EXCERPT_LENGTH, make_excerpt, render_content, sanitize_html
+from .testing import ViewPerformanceTestCase
+from .views import PostDetailView
 
 # Create your tests here.
+
+class PostDetailQueryBudgetTests(TestCase):
+    """Страница объявления укладывается в бюджет запросов при любом числе откликов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.category = Category.objects.create(name='tanks')
+        cls.post = Post.objects.create(title='Ищу танка', content='<p>В рейд</p>', author=cls.author, category=cls.category)
+
+    def add_responses(self, count, status='pending'):
+        for index in range(count):
+            responder = User.objects.create(username=f'responder{status}{index}')
+            Response.objects.create(post=self.post, author=responder, content='Готов', status=status)
+
+    def get_detail(self, user):
+        request = RequestFactory().get(self.post.get_absolute_url())
+        request.user = user
+        with CaptureQueriesContext(connection) as queries:
+            response = PostDetailView.as_view()(request, pk=self.post.pk)
+            # Шаблон не рендерится: считаем только запросы представления
+            context = response.context_data
+            list(context['responses'])
+        return len(queries), context
+
+    def test_query_count_does_not_grow_with_responses(self):
+        empty_count, _ = self.get_detail(AnonymousUser())
+        self.add_responses(25)
+        full_count, context = self.get_detail(AnonymousUser())
+
+        self.assertEqual(empty_count, full_count)
+        self.assertLessEqual(full_count, PostDetailView.query_budget)
+        self.assertEqual(context['responses_count'], 25)
+
+    def test_authors_are_loaded_with_responses(self):
+        self.add_responses(5)
+        _, context = self.get_detail(AnonymousUser())
+
+        with CaptureQueriesContext(connection) as queries:
+            usernames = [response.author.username for response in context['responses']]
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(len(usernames), 5)
+
+    def test_user_response_is_taken_from_prefetched_set(self):
+        self.add_responses(10)
+        responder = User.objects.create(username='accepted')
+        own_response = Response.objects.create(post=self.post, author=responder, content='Я', status='accepted')
+
+        query_count, context = self.get_detail(responder)
+
+        self.assertLessEqual(query_count, PostDetailView.query_budget)
+        self.assertEqual(context['user_response'], own_response)
+        self.assertEqual(context['responses_count'], 10)
+        self.assertNotIn(own_response, context['responses'])
+
+    def test_post_author_within_budget(self):
+        self.add_responses(10)
+        query_count, context = self.get_detail(self.author)
+
+        self.assertLessEqual(query_count, PostDetailView.query_budget)
+        self.assertIsNone(context['user_response'])
+        self.assertNotIn('response_form', context)
+
+
+class PostCounterTests(TestCase):
+    """Сохранение объявления не затирает счетчики откликов, измененные сигналами"""
+
+    def test_save_keeps_concurrent_counter_updates(self):
+        author = User.objects.create(username='author')
+        post = Post.objects.create(
+            title='Ищу танка', content='<p>В рейд</p>', author=author, category=Category.objects.create(name='tanks')
+        )
+        stale = Post.objects.get(pk=post.pk)
+        # Отклик, созданный параллельным запросом после загрузки объявления
+        Response.objects.create(post=post, author=User.objects.create(username='responder'), content='Готов')
+        Post.objects.filter(pk=post.pk).update(accepted_responses_count=F('accepted_responses_count') + 2)
+
+        stale.title = 'Ищу хила'
+        stale.status = 'closed'
+        stale.save()
+
+        post.refresh_from_db()
+        self.assertEqual((post.title, post.status), ('Ищу хила', 'closed'))
+        self.assertEqual((post.pending_responses_count, post.accepted_responses_count), (1, 2))
+
+    def test_save_reinserts_concurrently_deleted_post(self):
+        author = User.objects.create(username='author')
+        post = Post.objects.create(
+            title='Ищу танка', content='<p>В рейд</p>', author=author, category=Category.objects.create(name='tanks')
+        )
+        Post.objects.filter(pk=post.pk).delete()
+
+        post.title = 'Ищу хила'
+        post.save()
+
+        self.assertEqual(Post.objects.get(pk=post.pk).title, 'Ищу хила')
+
+
+class CursorPaginatorTests(TestCase):
+    """Курсорная пагинация проходит все объявления без пропусков и повторов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username='author')
+        category = Category.objects.create(name='tanks')
+        posts = [
+            Post.objects.create(title=f'Объявление {index}', content='<p>Текст</p>', author=author, category=category)
+            for index in range(7)
+        ]
+        # Два момента создания на семь объявлений: порядок внутри момента задает id
+        moment = timezone.now().replace(microsecond=0)
+        Post.objects.filter(pk__in=[post.pk for post in posts[:4]]).update(created_at=moment)
+        Post.objects.filter(pk__in=[post.pk for post in posts[4:]]).update(created_at=moment + timedelta(seconds=1))
+        cls.ordered_ids = list(Post.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+    def paginator(self, per_page=3):
+        return CursorPaginator(Post.objects.all(), per_page)
+
+    def ids(self, page):
+        return [post.pk for post in page]
+
+    def test_cursor_round_trip(self):
+        post = Post.objects.get(pk=self.ordered_ids[0])
+        for direction in ('n', 'p'):
+            cursor = CursorPaginator.encode_cursor(direction, post)
+            self.assertNotIn('=', cursor)
+            self.assertEqual(CursorPaginator.decode_cursor(cursor), (direction, post.created_at, post.pk))
+
+    def test_forward_and_backward_with_ties(self):
+        paginator = self.paginator()
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], self.ordered_ids)
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(all(page.has_previous() for page in pages[1:]))
+
+        # Назад от последней страницы получаются те же страницы
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.page(page.previous_cursor)
+            self.assertEqual(self.ids(page), self.ids(expected))
+            self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_page_edges(self):
+        # Ровно одна полная страница: следующей нет
+        page = self.paginator(per_page=7).page()
+        self.assertEqual(self.ids(page), self.ordered_ids)
+        self.assertFalse(page.has_other_pages())
+
+        # Курсор после последнего объявления дает пустую страницу без ссылок
+        last = Post.objects.get(pk=self.ordered_ids[-1])
+        page = self.paginator().page(CursorPaginator.encode_cursor('n', last))
+        self.assertEqual(len(page), 0)
+        self.assertFalse(page.has_other_pages())
+
+        page = CursorPaginator(Post.objects.none(), 3).page()
+        self.assertEqual((len(page), page.next_cursor, page.previous_cursor), (0, None, None))
+
+    def test_invalid_cursor(self):
+        post = Post.objects.get(pk=self.ordered_ids[0])
+        valid = CursorPaginator.encode_cursor('n', post)
+        tampered = [
+            'not-a-cursor',
+            valid[:-3],
+            base64.urlsafe_b64encode(b'["x","2024-01-01T00:00:00+00:00",1]').decode(),
+            base64.urlsafe_b64encode(b'["n","yesterday",1]').decode(),
+            base64.urlsafe_b64encode(b'["n","2024-01-01T00:00:00+00:00","abc"]').decode(),
+            base64.urlsafe_b64encode(b'{"n":1}').decode(),
+        ]
+        for cursor in tampered:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    self.paginator().page(cursor)
+                request = RequestFactory().get('/', {'cursor': cursor})
+                with self.assertRaises(Http404):
+                    get_page(request, Post.objects.all(), 3)
+
+        owner = User.objects.get(username='author')
+        self.client.force_login(owner)
+        response = self.client.get(reverse('bulletin_board:my_posts'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class SanitizerTests(SimpleTestCase):
+    """HTML из редактора очищается по белому списку, анонс строится из текста"""
+
+    def test_drops_script_and_style_with_content(self):
+        self.assertEqual(
+            sanitize_html('<p>a</p><script>alert(1)</script><style>p{color:red}</style><p>b</p>'),
+            '<p>a</p><p>b</p>',
+        )
+        self.assertEqual(sanitize_html('<script><p>x</p>'), '')
+
+    def test_drops_event_handlers_and_unsafe_styles(self):
+        self.assertEqual(
+            sanitize_html(
+                '<p onclick="x()" style="text-align: center">a</p>'
+                '<img src="/a.png" onerror="x()" alt="a"><p style="position:fixed">c</p>'
+            ),
+            '<p style="text-align: center">a</p><img src="/a.png" alt="a"><p>c</p>',
+        )
+
+    def test_drops_javascript_and_data_urls(self):
+        for url in ('javascript:alert(1)', ' JaVaScRiPt:alert(1)', 'javascript&#58;alert(1)',
+                    'java&#9;script:alert(1)', 'data:text/html,x'):
+            with self.subTest(url=url):
+                self.assertEqual(sanitize_html(f'<a href="{url}" title="t">x</a>'), '<a title="t">x</a>')
+        # Картинка и фрейм без допустимого адреса выбрасываются целиком
+        self.assertEqual(sanitize_html('<img src="data:image/png;base64,AAAA">'), '')
+        self.assertEqual(
+            sanitize_html('<iframe src="https://evil.example.com/"></iframe>'
+                          '<iframe src="https://www.youtube.com/embed/x"></iframe>'),
+            '<iframe src="https://www.youtube.com/embed/x"></iframe>',
+        )
+        self.assertEqual(
+            sanitize_html('<a href="https://example.com/" target="_self">ok</a>'),
+            '<a href="https://example.com/" rel="noopener noreferrer nofollow" target="_blank">ok</a>',
+        )
+
+    def test_nested_and_malformed_tags(self):
+        self.assertEqual(
+            sanitize_html('<p><b>bold<i>both</p>tail</div><ul><li>one'),
+            '<p><b>bold<i>both</i></b></p>tail<ul><li>one</li></ul>',
+        )
+        self.assertEqual(
+            sanitize_html('<p>1 < 2 &amp; "3"</p><br/><span/>'),
+            '<p>1 &lt; 2 &amp; &quot;3&quot;</p><br><span></span>',
+        )
+        self.assertEqual(sanitize_html('<scr<script>ipt>alert(1)</script>'), 'ipt&gt;alert(1)')
+
+    def test_excerpt(self):
+        self.assertEqual(make_excerpt('<p>a</p><p>b</p><script>s</script>c<br>d'), 'a b c d')
+        excerpt = make_excerpt('<p>' + 'слово ' * 100 + '</p>', 20)
+        self.assertEqual((len(excerpt), excerpt[-1]), (20, '…'))
+        self.assertLessEqual(len(make_excerpt('<p>' + 'слово ' * 100 + '</p>')), EXCERPT_LENGTH)
+
+        content = '<p onclick="x()">' + 'текст ' * 100 + '</p>'
+        self.assertEqual(render_content(content), (sanitize_html(content), make_excerpt(content)))
+
+
+class BulletinBoardViewPerformanceTests(ViewPerformanceTestCase):
+    """Бюджеты запросов для всех страниц доски объявлений"""
+
+    def test_post_list(self):
+        url = reverse('bulletin_board:post_list')
+        self.assertViewPerformance('bulletin_board:post_list', url, 3, status=200)
+        self.assertViewPerformance('bulletin_board:post_list', url, 5, user=self.owner, status=200)
+
+    def test_category_detail(self):
+        url = reverse('bulletin_board:category_detail', kwargs={'pk': self.data['categories'][0].pk})
+        self.assertViewPerformance('bulletin_board:category_detail', url, 2, status=200)
+        self.assertViewPerformance('bulletin_board:category_detail', url, 4, user=self.owner, status=200)
+
+    def test_post_detail(self):
+        url = reverse('bulletin_board:post_detail', kwargs={'pk': self.data['owner_post'].pk})
+        self.assertViewPerformance('bulletin_board:post_detail', url, 4, status=200)
+        self.assertViewPerformance('bulletin_board:post_detail', url, 6, user=self.owner, status=200)
+
+    def test_post_create(self):
+        url = reverse('bulletin_board:post_create')
+        self.assertViewPerformance('bulletin_board:post_create', url, 0, status=302)
+        self.assertViewPerformance('bulletin_board:post_create', url, 3, user=self.owner, status=200)
+
+    def test_post_edit(self):
+        url = reverse('bulletin_board:post_edit', kwargs={'pk': self.data['owner_post'].pk})
+        self.assertViewPerformance('bulletin_board:post_edit', url, 0, status=302)
+        self.assertViewPerformance('bulletin_board:post_edit', url, 5, user=self.owner, status=200)
+
+    def test_post_delete(self):
+        url = reverse('bulletin_board:post_delete', kwargs={'pk': self.data['owner_post'].pk})
+        self.assertViewPerformance('bulletin_board:post_delete', url, 0, status=302)
+        self.assertViewPerformance('bulletin_board:post_delete', url, 5, user=self.owner, status=200)
+
+    def test_response_create(self):
+        url = reverse('bulletin_board:response_create', kwargs={'post_pk': self.data['other_post'].pk})
+        self.assertViewPerformance('bulletin_board:response_create', url, 0, status=302)
+        # Основной пользователь уже откликнулся на объявление и перенаправляется на него
+        self.assertViewPerformance('bulletin_board:response_create', url, 5, user=self.owner, status=302)
+
+    def test_response_accept(self):
+        url = reverse('bulletin_board:response_accept', kwargs={'pk': self.data['response_to_owner'].pk})
+        self.assertViewPerformance('bulletin_board:response_accept', url, 0, method='post', status=302)
+        self.assertViewPerformance('bulletin_board:response_accept', url, 7, user=self.owner, method='post', status=302)
+
+    def test_response_reject(self):
+        url = reverse('bulletin_board:response_reject', kwargs={'pk': self.data['response_to_owner'].pk})
+        self.assertViewPerformance('bulletin_board:response_reject', url, 0, method='post', status=302)
+        self.assertViewPerformance('bulletin_board:response_reject', url, 7, user=self.owner, method='post', status=302)
+
+    def test_response_delete(self):
+        url = reverse('bulletin_board:response_delete', kwargs={'pk': self.data['owner_response'].pk})
+        self.assertViewPerformance('bulletin_board:response_delete', url, 0, status=302)
+        self.assertViewPerformance('bulletin_board:response_delete', url, 6, user=self.owner, status=200)
+
+    def test_my_posts(self):
+        url = reverse('bulletin_board:my_posts')
+        self.assertViewPerformance('bulletin_board:my_posts', url, 0, status=302)
+        self.assertViewPerformance('bulletin_board:my_posts', url, 4, user=self.owner, status=200)
+
+    def test_my_responses(self):
+        url = reverse('bulletin_board:my_responses')
+        self.assertViewPerformance('bulletin_board:my_responses', url, 0, status=302)
+        self.assertViewPerformance('bulletin_board:my_responses', url, 4, user=self.owner, status=200)
+
+    def test_responses_to_posts(self):
+        url = reverse('bulletin_board:responses_to_posts')
+        self.assertViewPerformance('bulletin_board:responses_to_posts', url, 0, status=302)
+        self.assertViewPerformance('bulletin_board:responses_to_posts', url, 5, user=self.owner, status=200)
+
+    def test_search(self):
+        url = reverse('bulletin_board:search') + '?q=рейд'
+        self.assertViewPerformance('bulletin_board:search', url, 3, status=200)
+        self.assertViewPerformance('bulletin_board:search', url, 5, user=self.owner, status=200)
+
+    def test_toggle_post_status(self):
+        url = reverse('bulletin_board:toggle_post_status', kwargs={'pk': self.data['owner_post'].pk})
+        self.assertViewPerformance('bulletin_board:toggle_post_status', url, 0, method='post', status=302)
+        self.assertViewPerformance('bulletin_board:toggle_post_status', url, 5, user=self.owner, method='post', status=200)
+
+    def test_toggle_response_status(self):
+        url = reverse('bulletin_board:toggle_response_status', kwargs={'pk': self.data['response_to_owner'].pk})
+        self.assertViewPerformance('bulletin_board:toggle_response_status', url, 0, method='post', status=302)
+        self.assertViewPerformance('bulletin_board:toggle_response_status', url, 7, user=self.owner, method='post', status=200)
+
+    def test_search_typeahead(self):
+        url = reverse('bulletin_board:search_typeahead') + '?q=объяв'
+        self.assertViewPerformance('bulletin_board:search_typeahead', url, 1, status=200)
+        self.assertViewPerformance('bulletin_board:search_typeahead', url, 2, user=self.owner, status=200)
+
+    def test_listing_cache_stats(self):
+        url = reverse('bulletin_board:listing_cache_stats')
+        self.assertViewPerformance('bulletin_board:listing_cache_stats', url, 0, status=302)
+        self.assertViewPerformance('bulletin_board:listing_cache_stats', url, 2, user=self.owner, status=302)
+
+
+@override_settings(REPLICA_DATABASES=['replica_1'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Чтения в помеченных представлениях идут на реплику, кроме закрепленных за основной базой"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_go_to_default_outside_replica_views(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_reads_go_to_replica_inside_replica_views(self):
+        with replica_reads(self.factory.get('/')):
+            self.assertEqual(self.router.db_for_read(Post), 'replica_1')
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_pinned_user_reads_from_default(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE_NAME] = '1'
+        with replica_reads(request):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_middleware_pins_after_write(self):
+        def write_view(request):
+            self.router.db_for_write(Post)
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(write_view)(self.factory.get('/'))
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+        response = ReplicaPinningMiddleware(lambda request: HttpResponse())(self.factory.get('/'))
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+
+@override_settings(
+    REPLICA_DATABASES=['replica_1'],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class ReplicaPageCacheTests(SimpleTestCase):
+    """Кеш страниц для анонимов заполняется только из основной базы"""
+
+    def setUp(self):
+        self.aliases = []
+        router = ReplicaRouter()
+        aliases = self.aliases
+
+        class ListingView(ReplicaReadMixin, AnonymousPageCacheMixin, View):
+            def get(self, request):
+                aliases.append(router.db_for_read(Post))
+                # Ленивые запросы шаблона выполняются при рендеринге
+                template = engines['django'].from_string('{{ alias }}')
+                return SimpleTemplateResponse(template, {'alias': lambda: router.db_for_read(Post)})
+
+        self.view = ListingView.as_view()
+        self.factory = RequestFactory()
+
+    def get(self, user):
+        request = self.factory.get('/listing/')
+        request.user = user
+        return self.view(request)
+
+    def test_cache_miss_is_rendered_from_primary(self):
+        response = self.get(AnonymousUser())
+        self.assertEqual((self.aliases, response.content), (['default'], b'default'))
+
+        # Повторный запрос отдается из кеша без обращения к базе
+        self.assertEqual(self.get(AnonymousUser()).content, b'default')
+        self.assertEqual(self.aliases, ['default'])
+
+    def test_uncached_pages_read_from_replica(self):
+        response = self.get(User(username='reader'))
+        self.assertEqual((self.aliases, response.content), (['replica_1'], b'replica_1'))
@@ -33,4 +33,7 @@ urlpatterns = [
     # API endpoints для AJAX
     path('api/post/<int:pk>/toggle-status/', views.toggle_post_status, name='toggle_post_status'),
     path('api/response/<int:pk>/toggle-status/', views.toggle_response_status, name='toggle_response_status'),
+    path('api/search/typeahead/', views.search_typeahead, name='search_typeahead'),
+    path('api/cache-stats/', views.listing_cache_stats, name='listing_cache_stats'),
+    path('api/db-pool-stats/', views.database_pool_stats, name='database_pool_stats'),
 ] 
\ No newline at end of file
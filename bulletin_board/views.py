@@ -1,21 +1,33 @@
+import hashlib
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.db.models import Q, Count
-from django.http import JsonResponse, HttpResponseForbidden
-from django.core.paginator import Paginator
+from django.db.models import Q, Count, Max, Prefetch
+from django.http import Http404, JsonResponse, HttpResponseForbidden
+from django.core.cache import cache
+from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.utils.text import Truncator
+from mmorpg_board.db.pool import get_all_stats as get_pool_stats
+from mmorpg_board.routers import ReplicaReadMixin
 from .models import Post, Category, Response, Newsletter
 from .forms import PostForm, ResponseForm, SearchForm
+from .pagination import CursorPaginationMixin, get_page
+from .cache import AnonymousPageCacheMixin
+from . import cache as listing_cache
+from . import registry
 
 # Create your views here.
 
-class PostListView(ListView):
+class PostListView(ReplicaReadMixin, AnonymousPageCacheMixin, CursorPaginationMixin, ListView):
     """Главная страница со списком объявлений"""
     model = Post
     template_name = 'bulletin_board/post_list.html'
@@ -23,76 +35,138 @@ class PostListView(ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        queryset = Post.objects.filter(status='active').select_related('author', 'category')
+        queryset = Post.objects.filter(status='active').for_listing()
         
         # Фильтрация по категории
         category_id = self.request.GET.get('category')
         if category_id:
             queryset = queryset.filter(category_id=category_id)
         
-        # Поиск
+        # Поиск (результаты ранжируются по релевантности)
         search_query = self.request.GET.get('q')
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(content__icontains=search_query)
-            )
+            return queryset.search(search_query)
         
         return queryset.order_by('-created_at')
     
+    def use_cursor_pagination(self):
+        # Результаты поиска упорядочены по релевантности, а не по дате
+        return super().use_cursor_pagination() and not self.request.GET.get('q')
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = registry.get_categories()
+        
+        # Количество активных объявлений по категориям одним запросом
+        posts_counts = dict(
+            Post.objects.filter(status='active').order_by().values('category').annotate(
+                count=Count('pk')
+            ).values_list('category', 'count')
+        )
+        context['category_counts'] = [
+            (category, posts_counts.get(category.pk, 0)) for category in context['categories']
+        ]
         context['search_form'] = SearchForm(self.request.GET)
         context['current_category'] = self.request.GET.get('category')
         return context
 
 
-class CategoryDetailView(DetailView):
+class CategoryDetailView(ReplicaReadMixin, AnonymousPageCacheMixin, DetailView):
     """Страница категории с объявлениями"""
     model = Category
     template_name = 'bulletin_board/category_detail.html'
     context_object_name = 'category'
     
+    def get_page_cache_scope(self):
+        return self.kwargs['pk']
+    
+    def get_object(self, queryset=None):
+        category = registry.get_category(self.kwargs['pk'])
+        if category is None:
+            raise Http404('Категория не найдена')
+        return category
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         posts = Post.objects.filter(
             category=self.object,
             status='active'
-        ).select_related('author').order_by('-created_at')
+        ).for_listing().order_by('-created_at')
         
-        paginator = Paginator(posts, 10)
-        page_number = self.request.GET.get('page')
-        context['posts'] = paginator.get_page(page_number)
+        context['posts'] = get_page(self.request, posts, 10)
         return context
 
 
+def post_detail_etag(request, pk):
+    """ETag страницы объявления одним запросом по индексам
+
+    Учитывает изменение объявления, откликов и счетчиков, а также пользователя,
+    так как страница выглядит по-разному для автора, откликнувшихся и гостей.
+    """
+    # Страница с flash-сообщениями должна быть отрисована заново
+    if len(messages.get_messages(request)):
+        return None
+    
+    validators = Post.objects.filter(pk=pk).annotate(
+        last_response_at=Max('responses__updated_at'),
+        responses_total=Count('responses'),
+    ).values_list(
+        'updated_at', 'pending_responses_count', 'accepted_responses_count',
+        'last_response_at', 'responses_total',
+    ).first()
+    if validators is None:
+        return None
+    
+    raw = ':'.join(str(value) for value in (pk, request.user.pk, *validators))
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+@method_decorator(cache_control(private=True, no_cache=True), name='get')
+@method_decorator(condition(etag_func=post_detail_etag), name='get')
 class PostDetailView(DetailView):
     """Детальная страница объявления"""
     model = Post
     template_name = 'bulletin_board/post_detail.html'
     context_object_name = 'post'
     
+    # Максимум запросов к БД при любом количестве откликов:
+    # ETag, объявление с автором и категорией, отклики с авторами
+    query_budget = 4
+    
     def get_queryset(self):
-        return Post.objects.select_related('author', 'category').prefetch_related('responses')
+        # Ожидающие отклики и собственный отклик пользователя загружаются
+        # одним запросом вместе с авторами
+        responses_filter = Q(status='pending')
+        if self.request.user.is_authenticated:
+            responses_filter |= Q(author=self.request.user)
+        
+        return Post.objects.select_related('author', 'category').prefetch_related(
+            Prefetch(
+                'responses',
+                queryset=Response.objects.filter(responses_filter).select_related('author'),
+                to_attr='loaded_responses'
+            )
+        )
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        user = self.request.user
         
         # Отклики на объявление
-        responses = self.object.responses.filter(status='pending').select_related('author')
+        responses = [response for response in self.object.loaded_responses if response.status == 'pending']
         context['responses'] = responses
-        context['responses_count'] = responses.count()
+        context['responses_count'] = len(responses)
         
         # Форма для отклика
-        if self.request.user.is_authenticated and self.request.user != self.object.author:
+        if user.is_authenticated and user != self.object.author:
             context['response_form'] = ResponseForm()
         
         # Проверяем, оставлял ли пользователь отклик
-        if self.request.user.is_authenticated:
-            context['user_response'] = self.object.responses.filter(
-                author=self.request.user
-            ).first()
+        if user.is_authenticated:
+            context['user_response'] = next(
+                (response for response in self.object.loaded_responses if response.author_id == user.pk),
+                None
+            )
         
         return context
 
@@ -152,6 +226,10 @@ class ResponseCreateView(LoginRequiredMixin, CreateView):
     template_name = 'bulletin_board/response_form.html'
     
     def dispatch(self, request, *args, **kwargs):
+        # Проверки ниже обращаются к request.user, поэтому вход проверяется раньше них
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        
         self.post = get_object_or_404(Post, pk=kwargs['post_pk'])
         
         # Проверяем, что пользователь не автор объявления
@@ -228,7 +306,7 @@ class ResponseDeleteView(LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class MyPostsView(LoginRequiredMixin, ListView):
+class MyPostsView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Мои объявления"""
     model = Post
     template_name = 'bulletin_board/my_posts.html'
@@ -236,10 +314,10 @@ class MyPostsView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        return Post.objects.filter(author=self.request.user).select_related('category').order_by('-created_at')
+        return Post.objects.filter(author=self.request.user).for_listing().order_by('-created_at')
 
 
-class MyResponsesView(LoginRequiredMixin, ListView):
+class MyResponsesView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Мои отклики"""
     model = Response
     template_name = 'bulletin_board/my_responses.html'
@@ -247,10 +325,10 @@ class MyResponsesView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        return Response.objects.filter(author=self.request.user).select_related('post', 'post__author').order_by('-created_at')
+        return Response.objects.filter(author=self.request.user).select_related('author', 'post', 'post__author').order_by('-created_at')
 
 
-class ResponsesToPostsView(LoginRequiredMixin, ListView):
+class ResponsesToPostsView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Отклики на мои объявления"""
     model = Response
     template_name = 'bulletin_board/responses_to_posts.html'
@@ -282,7 +360,7 @@ class ResponsesToPostsView(LoginRequiredMixin, ListView):
         return context
 
 
-class SearchView(ListView):
+class SearchView(ReplicaReadMixin, ListView):
     """Поиск объявлений"""
     model = Post
     template_name = 'bulletin_board/search_results.html'
@@ -291,15 +369,12 @@ class SearchView(ListView):
     
     def get_queryset(self):
         form = SearchForm(self.request.GET)
-        queryset = Post.objects.filter(status='active').select_related('author', 'category')
+        queryset = Post.objects.filter(status='active').for_listing()
         
         if form.is_valid():
             query = form.cleaned_data['q']
             if query:
-                queryset = queryset.filter(
-                    Q(title__icontains=query) |
-                    Q(content__icontains=query)
-                )
+                return queryset.search(query)
         
         return queryset.order_by('-created_at')
     
@@ -324,7 +399,7 @@ def toggle_post_status(request, pk):
     else:
         post.status = 'active'
     
-    post.save()
+    post.save(update_fields=['status', 'updated_at'])
     
     return JsonResponse({
         'success': True,
@@ -352,3 +427,47 @@ def toggle_response_status(request, pk):
         })
     
     return JsonResponse({'success': False, 'error': 'Отклик уже обработан'})
+
+
+@require_GET
+def search_typeahead(request):
+    """Подсказки поиска: компактный JSON вместо полной страницы результатов"""
+    # Нормализуем запрос, чтобы одинаковые запросы попадали в один ключ кеша
+    query = ' '.join(request.GET.get('q', '').lower().split())[:100]
+    if len(query) < getattr(settings, 'TYPEAHEAD_MIN_LENGTH', 2):
+        return JsonResponse({'query': query, 'results': []})
+    
+    max_results = getattr(settings, 'TYPEAHEAD_MAX_RESULTS', 8)
+    cache_key = 'typeahead:' + hashlib.md5(query.encode('utf-8')).hexdigest()
+    results = cache.get(cache_key)
+    
+    if results is None:
+        category_names = dict(Category.CATEGORY_CHOICES)
+        posts = Post.objects.filter(status='active').title_prefix_search(query).values(
+            'id', 'title', 'category__name', 'excerpt'
+        )[:max_results]
+        results = [
+            {
+                'id': post['id'],
+                'title': post['title'],
+                'category': category_names.get(post['category__name'], post['category__name']),
+                'snippet': Truncator(post['excerpt']).chars(120),
+                'url': reverse('bulletin_board:post_detail', kwargs={'pk': post['id']}),
+            }
+            for post in posts
+        ]
+        cache.set(cache_key, results, getattr(settings, 'TYPEAHEAD_CACHE_TIMEOUT', 60))
+    
+    return JsonResponse({'query': query, 'results': results})
+
+
+@staff_member_required
+def listing_cache_stats(request):
+    """Статистика кеша страниц списков объявлений (для мониторинга)"""
+    return JsonResponse(listing_cache.get_stats())
+
+
+@staff_member_required
+def database_pool_stats(request):
+    """Метрики пула соединений с БД процесса, обработавшего запрос (для мониторинга)"""
+    return JsonResponse(get_pool_stats())
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mmorpg_board.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после настройки Django: модулю нужны модели и URL-конфигурация
+from notifications.asgi import PollingRouter  # noqa: E402
+
+# Эндпоинты опроса уведомлений обслуживаются быстрым асинхронным путем
+application = PollingRouter(django_application)
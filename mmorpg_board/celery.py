@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 from django.conf import settings
 
 # Устанавливаем модуль настроек по умолчанию для программы 'celery'
@@ -17,8 +18,11 @@ app.autodiscover_tasks()
 # Настройка очередей
 app.conf.task_routes = {
     'notifications.tasks.send_notification_email_task': {'queue': 'notifications'},
+    'notifications.tasks.create_notifications_task': {'queue': 'notifications'},
     'notifications.tasks.send_newsletter_task': {'queue': 'newsletters'},
     'bulletin_board.tasks.send_newsletter_task': {'queue': 'newsletters'},
+    'bulletin_board.tasks.send_newsletter_chunk_task': {'queue': 'newsletters'},
+    'bulletin_board.tasks.finish_newsletter_task': {'queue': 'newsletters'},
 }
 
 # Настройка beat scheduler для периодических задач
@@ -28,10 +32,38 @@ app.conf.beat_schedule = {
         'task': 'notifications.tasks.cleanup_old_notifications',
         'schedule': 86400.0,  # 24 часа
     },
+    # Сверка денормализованных счетчиков откликов каждый час
+    'reconcile-response-counters': {
+        'task': 'bulletin_board.tasks.reconcile_response_counters_task',
+        'schedule': 3600.0,
+    },
+    # Сверка счетчиков непрочитанных уведомлений в Redis каждый час
+    'reconcile-unread-counters': {
+        'task': 'notifications.tasks.reconcile_unread_counters_task',
+        'schedule': 3600.0,
+    },
+    # Перезапуск рассылок с зависшими частями каждые 10 минут
+    'resume-stalled-newsletters': {
+        'task': 'bulletin_board.tasks.resume_newsletters_task',
+        'schedule': 600.0,
+    },
+    # Очистка переданных записей исходящей очереди писем раз в сутки
+    'purge-email-outbox': {
+        'task': 'notifications.tasks.purge_email_outbox_task',
+        'schedule': 86400.0,
+    },
 }
 
 app.conf.timezone = 'Europe/Moscow'
 
+
+@worker_process_init.connect
+def reset_database_pools(**kwargs):
+    """Дочерний процесс воркера не должен использовать соединения родителя"""
+    from mmorpg_board.db.pool import reset_after_fork
+    reset_after_fork()
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}') 
\ No newline at end of file
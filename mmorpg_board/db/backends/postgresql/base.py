@@ -0,0 +1,55 @@
+import os
+
+from django.db.backends.postgresql import base, creation
+
+from mmorpg_board.db import pool as connection_pool
+
+# Бэкенд PostgreSQL с пулом соединений.
+#
+# Настройки пула задаются в DATABASES[alias]['POOL']:
+# MIN_SIZE, MAX_SIZE, TIMEOUT, HEALTH_CHECK_INTERVAL, MAX_LIFETIME.
+
+
+def _pool_key(alias, settings_dict):
+    return (
+        alias,
+        settings_dict.get('NAME') or '',
+        settings_dict.get('HOST') or '',
+        str(settings_dict.get('PORT') or ''),
+        settings_dict.get('USER') or '',
+    )
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Соединения пула держат тестовую базу открытой, и DROP DATABASE не пройдет
+        pool = connection_pool.find_pool(_pool_key(self.connection.alias, self.connection.settings_dict))
+        if pool is not None:
+            pool.close_all()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params):
+        return connection_pool.get_pool(
+            _pool_key(self.alias, self.settings_dict),
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            self.settings_dict.get('POOL') or {},
+        )
+
+    def get_new_connection(self, conn_params):
+        return self.get_pool(conn_params).getconn()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = connection_pool.find_pool(_pool_key(self.alias, self.settings_dict))
+        # Соединение не из пула этого процесса (например, унаследованное после fork)
+        if pool is None or pool.pid != os.getpid():
+            super()._close()
+            return
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from collections import deque
+
+from psycopg2 import extensions
+
+# Пул соединений PostgreSQL внутри процесса.
+#
+# Django по умолчанию открывает новое соединение на каждый запрос
+# (CONN_MAX_AGE = 0). Бэкенд mmorpg_board.db.backends.postgresql вместо
+# закрытия возвращает соединение в пул, а при следующем запросе берет
+# готовое, проверив, что оно живо. Пул свой у каждого процесса (воркера
+# gunicorn или Celery), поэтому MAX_SIZE - это лимит на один воркер.
+
+
+class PoolExhausted(Exception):
+    """Все соединения заняты, и свободное не появилось за TIMEOUT секунд"""
+    pass
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений psycopg2 с проверкой при выдаче"""
+
+    def __init__(self, connect, min_size=0, max_size=10, timeout=10.0,
+                 health_check_interval=30.0, max_lifetime=3600.0):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_lifetime = max_lifetime
+        self.pid = os.getpid()
+
+        self._lock = threading.Condition()
+        # Свободные соединения: (соединение, время создания, время возврата)
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'exhausted': 0,
+            'connections_created': 0,
+            'connections_closed': 0,
+            'health_check_failures': 0,
+        }
+
+    def getconn(self):
+        """Выдать соединение из пула (или открыть новое, если лимит позволяет)"""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        wait_started = None
+
+        while True:
+            with self._lock:
+                while True:
+                    if self._idle:
+                        conn, created_at, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        conn = None
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['exhausted'] += 1
+                        raise PoolExhausted(
+                            f'Нет свободных соединений в пуле за {self.timeout} с (максимум {self.max_size})'
+                        )
+                    if not waited:
+                        waited = True
+                        wait_started = time.monotonic()
+                        self.stats['waits'] += 1
+                    self._lock.wait(remaining)
+
+                if waited:
+                    self.stats['wait_time'] += time.monotonic() - wait_started
+                self.stats['checkouts'] += 1
+
+            if conn is None:
+                return self._open()
+            if self._is_healthy(conn, created_at, returned_at):
+                return conn
+            self.stats['health_check_failures'] += 1
+            self._discard(conn)
+
+    def putconn(self, conn):
+        """Вернуть соединение в пул; сломанные и занятые транзакцией закрываются"""
+        if not self._reset(conn):
+            self._discard(conn)
+            return
+        with self._lock:
+            self._idle.append((conn, self._created_at.get(id(conn), time.monotonic()), time.monotonic()))
+            self._lock.notify()
+
+    def prefill(self):
+        """Открыть MIN_SIZE соединений заранее"""
+        while True:
+            with self._lock:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open()
+            self.putconn(conn)
+
+    def close_all(self):
+        """Закрыть все свободные соединения (занятые закроются при возврате)"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self.stats,
+                'wait_time': round(self.stats['wait_time'], 4),
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            }
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        self._created_at[id(conn)] = time.monotonic()
+        self.stats['connections_created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self.stats['connections_closed'] += 1
+            self._lock.notify()
+
+    def _reset(self, conn):
+        """Вернуть соединение в исходное состояние перед повторным использованием"""
+        if conn.closed:
+            return False
+        try:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _is_healthy(self, conn, created_at, returned_at):
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        # Соединение, пролежавшее без дела дольше интервала, проверяем запросом:
+        # его мог закрыть сервер или балансировщик
+        if now - returned_at > self.health_check_interval:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                return False
+        return True
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Соединения, унаследованные от родительского процесса после fork. Их нельзя
+# закрывать (это закрыло бы соединения родителя), поэтому ссылки просто хранятся.
+_inherited = []
+
+
+def get_pool(key, connect, options):
+    """Пул для набора параметров подключения в текущем процессе"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.pid != os.getpid():
+            reset_after_fork()
+            pool = None
+        if pool is None:
+            pool = ConnectionPool(
+                connect,
+                min_size=options.get('MIN_SIZE', 0),
+                max_size=options.get('MAX_SIZE', 10),
+                timeout=options.get('TIMEOUT', 10.0),
+                health_check_interval=options.get('HEALTH_CHECK_INTERVAL', 30.0),
+                max_lifetime=options.get('MAX_LIFETIME', 3600.0),
+            )
+            _pools[key] = pool
+            created = True
+        else:
+            created = False
+    if created and pool.min_size:
+        pool.prefill()
+    return pool
+
+
+def find_pool(key):
+    return _pools.get(key)
+
+
+def reset_after_fork():
+    """Забыть пулы родительского процесса, не закрывая их соединения"""
+    for pool in _pools.values():
+        _inherited.extend(conn for conn, _, _ in pool._idle)
+    _pools.clear()
+
+
+def get_all_stats():
+    """Метрики всех пулов текущего процесса"""
+    return {
+        'pid': os.getpid(),
+        'pools': {f'{key[0]}:{key[1]}': pool.get_stats() for key, pool in list(_pools.items())},
+    }
@@ -0,0 +1,152 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+# Чтение с реплик базы данных.
+#
+# По умолчанию все запросы идут в основную базу (default). Представления,
+# помеченные декоратором read_from_replica или миксином ReplicaReadMixin,
+# читают с одной из реплик из settings.REPLICA_DATABASES. Запись всегда
+# идет в основную базу.
+#
+# Чтобы пользователь сразу видел свои изменения (read-your-writes), после
+# запроса, который что-то записал, ReplicaPinningMiddleware ставит cookie,
+# и в течение REPLICA_PIN_SECONDS его запросы читают из основной базы.
+
+PIN_COOKIE_NAME = 'db_pin_primary'
+
+_read_alias = ContextVar('replica_read_alias', default=None)
+_wrote = ContextVar('replica_wrote', default=False)
+
+
+def get_replica_aliases():
+    return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+
+def get_pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+def is_pinned(request):
+    """Пользователь недавно что-то записал и должен читать из основной базы"""
+    return PIN_COOKIE_NAME in request.COOKIES
+
+
+@contextmanager
+def replica_reads(request=None):
+    """Выполнять чтения внутри блока на случайной реплике"""
+    aliases = get_replica_aliases()
+    if not aliases or (request is not None and is_pinned(request)):
+        yield None
+        return
+
+    if request is not None and hasattr(request, 'user'):
+        # Сессия и пользователь загружаются из основной базы: только что
+        # созданной сессии на реплике еще может не быть
+        request.user.is_authenticated
+
+    token = _read_alias.set(random.choice(aliases))
+    try:
+        yield _read_alias.get()
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Выполнять чтения внутри блока в основной базе, даже внутри replica_reads"""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def read_from_replica(view_func):
+    """Декоратор функционального представления: чтения идут на реплику"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            # Пользователь должен быть уже загружен: в асинхронном коде
+            # ленивая загрузка из базы невозможна
+            with replica_reads(request):
+                return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(request):
+            response = view_func(request, *args, **kwargs)
+            # Шаблон рендерится здесь, чтобы ленивые запросы тоже ушли на реплику
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """Миксин представления: чтения (включая рендеринг шаблона) идут на реплику"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        with replica_reads(request):
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+
+
+class ReplicaRouter:
+    """Роутер: чтения в помеченных представлениях на реплику, остальное в default"""
+
+    # Приложения, данные которых всегда читаются из основной базы
+    primary_only_apps = {'sessions'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in self.primary_only_apps:
+            return 'default'
+        alias = _read_alias.get()
+        # Внутри транзакции основной базы читаем из нее же, иначе реплика может
+        # не увидеть только что записанные в этой транзакции данные
+        if alias is None or connections['default'].in_atomic_block:
+            return 'default'
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replica_aliases()
+
+
+class ReplicaPinningMiddleware:
+    """Закрепляет пользователя за основной базой на время после записи"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get() or request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+        finally:
+            _wrote.reset(token)
+
+        if wrote and get_replica_aliases():
+            response.set_cookie(
+                PIN_COOKIE_NAME, '1', max_age=get_pin_seconds(), httponly=True, samesite='Lax'
+            )
+        return response
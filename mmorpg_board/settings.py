@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     
     # Third-party apps
     'allauth',
@@ -64,6 +65,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'mmorpg_board.routers.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -97,15 +99,47 @@ WSGI_APPLICATION = 'mmorpg_board.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # PostgreSQL с пулом соединений внутри процесса (см. mmorpg_board/db/pool.py)
+        'ENGINE': 'mmorpg_board.db.backends.postgresql',
         'NAME': config('DB_NAME', default='mmorpg_board'),
         'USER': config('DB_USER', default='postgres'),
         'PASSWORD': config('DB_PASSWORD', default='postgres'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Лимиты пула на один процесс (воркер веб-сервера или Celery)
+        'POOL': {
+            'MIN_SIZE': config('DB_POOL_MIN_SIZE', default=0, cast=int),
+            'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'TIMEOUT': config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+            'HEALTH_CHECK_INTERVAL': config('DB_POOL_HEALTH_CHECK_INTERVAL', default=30.0, cast=float),
+            'MAX_LIFETIME': config('DB_POOL_MAX_LIFETIME', default=3600.0, cast=float),
+        },
     }
 }
 
+# Реплики только для чтения (необязательно): DB_REPLICA_HOSTS=replica1,replica2:5433.
+# Для проверки локально можно указать тот же сервер и отдельную базу через DB_REPLICA_NAME.
+REPLICA_DATABASES = []
+for index, replica_host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]), start=1):
+    replica_host, _, replica_port = replica_host.partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': config('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        # В тестах реплика - это та же тестовая база
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['mmorpg_board.routers.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает из основной базы
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -215,13 +249,31 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
 # Cache settings
+REDIS_URL = config('REDIS_URL', default='redis://redis:6379/1')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': config('REDIS_URL', default='redis://redis:6379/1'),
+        'LOCATION': REDIS_URL,
     }
 }
 
+# Поток событий уведомлений (SSE, только под ASGI): интервал комментариев
+# keep-alive и время, после которого браузер переподключается (в секундах)
+NOTIFICATIONS_STREAM_KEEPALIVE = 25
+NOTIFICATIONS_STREAM_MAX_AGE = 600
+
+# Время жизни закешированных страниц списков объявлений для анонимных посетителей
+LISTING_CACHE_TIMEOUT = config('LISTING_CACHE_TIMEOUT', default=300, cast=int)
+
+# Как часто (в секундах) воркер сверяет версию реестра категорий в Redis
+CATEGORY_REGISTRY_CHECK_INTERVAL = 5
+
+# Search typeahead settings
+TYPEAHEAD_MIN_LENGTH = 2
+TYPEAHEAD_MAX_RESULTS = config('TYPEAHEAD_MAX_RESULTS', default=8, cast=int)
+TYPEAHEAD_CACHE_TIMEOUT = 60  # секунд
+
 # Message tags for Bootstrap
 from django.contrib.messages import constants as messages
 MESSAGE_TAGS = {
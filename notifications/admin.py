@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from .models import Notification, EmailTemplate
+from django.utils import timezone
+from . import services
+from .models import Notification, EmailOutbox, EmailTemplate
 
 # Register your models here.
 
@@ -39,27 +41,22 @@ class NotificationAdmin(admin.ModelAdmin):
     actions = ['mark_as_read', 'mark_as_unread', 'send_email']
     
     def mark_as_read(self, request, queryset):
-        count = 0
-        for notification in queryset:
-            if not notification.is_read:
-                notification.mark_as_read()
-                count += 1
+        count = services.mark_read(queryset)
         self.message_user(request, f'Помечено как прочитанные: {count} уведомлений')
     mark_as_read.short_description = 'Пометить как прочитанные'
     
     def mark_as_unread(self, request, queryset):
-        count = queryset.filter(is_read=True).update(is_read=False, read_at=None)
+        count = services.mark_unread(queryset)
         self.message_user(request, f'Помечено как непрочитанные: {count} уведомлений')
     mark_as_unread.short_description = 'Пометить как непрочитанные'
     
     def send_email(self, request, queryset):
-        count = 0
-        for notification in queryset:
-            if not notification.is_sent:
-                notification.send_email()
-                count += 1
+        count = services.send_emails(queryset)
         self.message_user(request, f'Отправлено по email: {count} уведомлений')
     send_email.short_description = 'Отправить по email'
+    
+    def delete_queryset(self, request, queryset):
+        services.delete_notifications(queryset)
 
 
 @admin.register(EmailTemplate)
@@ -97,3 +94,17 @@ class NotificationInline(admin.TabularInline):
     
     def has_add_permission(self, request, obj=None):
         return False
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['task_name', 'args', 'status', 'attempts', 'next_attempt_at', 'created_at', 'published_at']
+    list_filter = ['status', 'task_name']
+    readonly_fields = ['task_name', 'args', 'attempts', 'last_error', 'created_at', 'published_at']
+    
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status='published').update(status='pending', next_attempt_at=timezone.now())
+        self.message_user(request, f'Поставлено на повторную передачу: {count} записей')
+    retry_now.short_description = 'Повторить передачу сейчас'
@@ -0,0 +1,122 @@
+import asyncio
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core import signals
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.exception import response_for_exception
+from django.middleware.security import SecurityMiddleware
+from django.urls import reverse, set_urlconf
+
+from . import views
+
+# Быстрый путь ASGI для эндпоинтов опроса уведомлений.
+#
+# Счетчик и выпадающее меню опрашивает каждая открытая вкладка, а сами
+# запросы крошечные. Под полной цепочкой middleware Django 4.2 каждый хук
+# MiddlewareMixin выполняется в отдельном потоке (десятки переключений на
+# запрос), поэтому эти пути обслуживает облегченный обработчик: сессия и
+# пользователь загружаются за одно переключение, дальше работает
+# асинхронное представление. Здесь же обслуживается поток событий SSE.
+# Остальные запросы идут в обычное приложение.
+
+
+def get_polling_routes():
+    """Пути эндпоинтов опроса и их асинхронные представления"""
+    return {
+        reverse('notifications:unread_count'): views.unread_count_async,
+        reverse('notifications:notifications_dropdown'): views.notifications_dropdown_async,
+        reverse('notifications:notification_stream'): views.notification_stream,
+    }
+
+
+def get_stream_paths():
+    """Пути долгих потоковых ответов"""
+    return {reverse('notifications:notification_stream')}
+
+
+def load_user(request):
+    """Работа SessionMiddleware и AuthenticationMiddleware для запроса только на чтение"""
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    request.user = get_user(request)
+
+
+class PollingASGIHandler(ASGIHandler):
+    """ASGI-обработчик эндпоинтов опроса без цепочки middleware"""
+
+    def __init__(self, routes, stream_paths=()):
+        super().__init__()
+        self.routes = routes
+        self.stream_paths = set(stream_paths)
+        # Перенаправление на HTTPS и заголовки безопасности без ввода-вывода
+        self.security_middleware = SecurityMiddleware(self.get_response_async)
+
+    def load_middleware(self, is_async=False):
+        # Цепочка не строится: get_response_async делает все нужное сам
+        pass
+
+    async def handle(self, scope, receive, send):
+        if scope['path'] not in self.stream_paths:
+            return await super().handle(scope, receive, send)
+
+        # Django 4.2 не замечает отключения клиента во время потокового ответа,
+        # и поток жил бы до истечения своего срока: ответ отменяется по
+        # сообщению http.disconnect
+        body_read = asyncio.Event()
+
+        async def receive_body():
+            message = await receive()
+            if not message.get('more_body', False):
+                body_read.set()
+            return message
+
+        async def wait_disconnect():
+            await body_read.wait()
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        handler = asyncio.ensure_future(super().handle(scope, receive_body, send))
+        watcher = asyncio.ensure_future(wait_disconnect())
+        done, pending = await asyncio.wait({handler, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if handler in done:
+            handler.result()
+        else:
+            # Отмененный ответ не закрывается обработчиком: соединения с БД
+            # этого запроса возвращаются в пул здесь
+            await sync_to_async(signals.request_finished.send, thread_sensitive=True)(sender=self.__class__)
+
+    async def get_response_async(self, request):
+        set_urlconf(settings.ROOT_URLCONF)
+        try:
+            response = self.security_middleware.process_request(request)
+            if response is None:
+                # Проверка ALLOWED_HOSTS, как в CommonMiddleware
+                request.get_host()
+                await sync_to_async(load_user, thread_sensitive=True)(request)
+                response = await self.routes[request.path_info](request)
+        except Exception as exc:
+            response = await sync_to_async(response_for_exception, thread_sensitive=False)(request, exc)
+        return self.security_middleware.process_response(request, response)
+
+
+class PollingRouter:
+    """ASGI-приложение: GET-запросы опроса в быстрый обработчик, остальное в Django"""
+
+    def __init__(self, application):
+        self.application = application
+        self.handler = PollingASGIHandler(get_polling_routes(), get_stream_paths())
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] == 'http'
+            and scope['method'] in ('GET', 'HEAD')
+            and scope['path'] in self.handler.routes
+        ):
+            return await self.handler(scope, receive, send)
+        return await self.application(scope, receive, send)
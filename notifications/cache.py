@@ -0,0 +1,282 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+# Версия уведомлений пользователя.
+#
+# Номер меняется при любом изменении уведомлений получателя (создание,
+# прочтение, удаление) и служит валидатором ETag для AJAX-эндпоинтов:
+# опрос счетчика без изменений обходится одним обращением к Redis.
+
+
+def _version_key(user_id):
+    return f'notifications:version:{user_id}'
+
+
+def get_version(user_id):
+    """Текущая версия уведомлений пользователя"""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Новое значение не должно совпасть с прежними, если ключ был вытеснен
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(user_id):
+    """Асинхронный вариант get_version для ASGI-представлений"""
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(user_id, dropdown_change=None):
+    """Отметить изменение уведомлений пользователя
+
+    dropdown_change правит кэш выпадающего меню на месте (dropdown_upsert,
+    dropdown_remove, dropdown_mark).
+    """
+    key = _version_key(user_id)
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+        return
+    if dropdown_change is not None:
+        patch_dropdown(user_id, version, dropdown_change)
+
+
+# Выпадающее меню уведомлений.
+#
+# Последние уведомления пользователя хранятся в кэше уже сериализованными
+# вместе с версией, которую они отражают. Изменения (создание, прочтение,
+# удаление) правят список на месте сразу после смены версии, поэтому
+# открытие меню не обращается к БД. Правка применяется, только если список
+# отражает версию, непосредственно предшествующую изменению: после
+# пропущенной или параллельной правки версии расходятся, и список
+# перестраивается из БД при следующем открытии.
+
+DROPDOWN_SIZE = 10
+
+# Сколько записей хранится про запас, чтобы удаления не опустошали меню
+DROPDOWN_BUFFER = 20
+
+
+def get_dropdown_timeout():
+    return getattr(settings, 'NOTIFICATIONS_DROPDOWN_TIMEOUT', 60 * 60 * 24)
+
+
+def _dropdown_key(user_id):
+    return f'notifications:dropdown:{user_id}'
+
+
+def dropdown_item(notification):
+    """Запись уведомления в выпадающем меню"""
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message[:100],
+        'type': notification.notification_type,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.strftime('%d.%m.%Y %H:%M'),
+        'url': f'/notifications/{notification.id}/'
+    }
+
+
+def _recent_notifications(user_id):
+    from .models import Notification
+    # Из основной базы: список с реплики мог бы отстать от версии, под которой сохраняется
+    return Notification.objects.using('default').filter(recipient_id=user_id).order_by('-created_at')[:DROPDOWN_BUFFER]
+
+
+def _store_dropdown(user_id, version, items, complete):
+    cache.set(
+        _dropdown_key(user_id),
+        {'version': version, 'items': items, 'complete': complete},
+        get_dropdown_timeout(),
+    )
+
+
+def get_dropdown_items(user_id, version):
+    """Последние уведомления пользователя для выпадающего меню"""
+    cached = cache.get(_dropdown_key(user_id))
+    if cached is not None and cached['version'] == version:
+        return cached['items'][:DROPDOWN_SIZE]
+    items = [dropdown_item(notification) for notification in _recent_notifications(user_id)]
+    _store_dropdown(user_id, version, items, complete=len(items) < DROPDOWN_BUFFER)
+    return items[:DROPDOWN_SIZE]
+
+
+async def aget_dropdown_items(user_id, version):
+    """Асинхронный вариант get_dropdown_items для ASGI-представлений"""
+    cached = await cache.aget(_dropdown_key(user_id))
+    if cached is not None and cached['version'] == version:
+        return cached['items'][:DROPDOWN_SIZE]
+    items = [dropdown_item(notification) async for notification in _recent_notifications(user_id)]
+    await cache.aset(
+        _dropdown_key(user_id),
+        {'version': version, 'items': items, 'complete': len(items) < DROPDOWN_BUFFER},
+        get_dropdown_timeout(),
+    )
+    return items[:DROPDOWN_SIZE]
+
+
+def patch_dropdown(user_id, version, change):
+    """Применить правку к кэшу меню, если он отражает версию перед изменением"""
+    key = _dropdown_key(user_id)
+    cached = cache.get(key)
+    if cached is None or cached['version'] != version - 1:
+        return
+    items = change(cached['items'])
+    complete = cached['complete']
+    if len(items) > DROPDOWN_BUFFER:
+        items = items[:DROPDOWN_BUFFER]
+        complete = False
+    if not complete and len(items) < DROPDOWN_SIZE:
+        # Записей после удалений не хватает, а в БД остались более старые
+        cache.delete(key)
+        return
+    _store_dropdown(user_id, version, items, complete)
+
+
+def _upsert(entries, items):
+    entries_by_id = {entry['id']: entry for entry in entries}
+    updated = [entries_by_id.pop(item['id'], item) for item in items]
+    # Оставшиеся записи новые и идут в начало списка
+    return [entry for entry in entries if entry['id'] in entries_by_id] + updated
+
+
+def _remove(ids, items):
+    return [item for item in items if item['id'] not in ids]
+
+
+def _mark(ids, is_read, items):
+    return [dict(item, is_read=is_read) if item['id'] in ids else item for item in items]
+
+
+def dropdown_upsert(entries):
+    """Правка меню: новые или измененные записи (dropdown_item)"""
+    return partial(_upsert, list(entries))
+
+
+def dropdown_remove(ids):
+    """Правка меню: удаленные уведомления"""
+    return partial(_remove, set(ids))
+
+
+def dropdown_mark(ids, is_read):
+    """Правка меню: смена состояния прочтения"""
+    return partial(_mark, set(ids), is_read)
+
+
+# Статистика уведомлений пользователя.
+#
+# Общее число, непрочитанные, прочитанные и число по типам считаются одним
+# запросом с условной агрегацией и кэшируются под текущей версией
+# уведомлений: любая запись меняет версию, и старая статистика больше не
+# читается (и истекает сама).
+
+
+def get_stats_timeout():
+    return getattr(settings, 'NOTIFICATIONS_STATS_TIMEOUT', 60 * 60 * 24)
+
+
+def _stats_key(user_id, version):
+    return f'notifications:stats:{user_id}:{version}'
+
+
+def compute_stats(user_id):
+    """Статистика уведомлений пользователя одним запросом"""
+    from .models import Notification
+    aggregates = {
+        'total': Count('pk'),
+        'unread': Count('pk', filter=Q(is_read=False)),
+    }
+    for notification_type, _ in Notification.NOTIFICATION_TYPES:
+        aggregates[f'type_{notification_type}'] = Count('pk', filter=Q(notification_type=notification_type))
+    values = Notification.objects.filter(recipient_id=user_id).aggregate(**aggregates)
+    return {
+        'total': values['total'],
+        'unread': values['unread'],
+        'read': values['total'] - values['unread'],
+        'by_type': {
+            notification_type: values[f'type_{notification_type}']
+            for notification_type, _ in Notification.NOTIFICATION_TYPES
+        },
+    }
+
+
+def get_stats(user_id):
+    """Статистика уведомлений пользователя: total, unread, read и by_type"""
+    key = _stats_key(user_id, get_version(user_id))
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(user_id)
+        cache.set(key, stats, get_stats_timeout())
+    return stats
+
+
+# Счетчик непрочитанных уведомлений пользователя.
+#
+# Хранится в Redis без срока жизни и меняется сигналами модели на +1/-1
+# после фиксации транзакции. Отсутствующий ключ пересчитывается из БД при
+# первом чтении, а периодическая задача reconcile_unread_counters_task
+# исправляет расхождения после массовых изменений в обход сигналов.
+
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _count_unread(user_id):
+    from .models import Notification
+    # Из основной базы: отставшая реплика закрепила бы в кэше устаревшее значение
+    return Notification.objects.using('default').filter(recipient_id=user_id, is_read=False)
+
+
+def get_unread_count(user_id):
+    """Количество непрочитанных уведомлений пользователя"""
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None or count < 0:
+        count = _count_unread(user_id).count()
+        cache.set(key, count, timeout=None)
+    return count
+
+
+async def aget_unread_count(user_id):
+    """Асинхронный вариант get_unread_count для ASGI-представлений"""
+    key = _unread_key(user_id)
+    count = await cache.aget(key)
+    if count is None or count < 0:
+        count = await _count_unread(user_id).acount()
+        await cache.aset(key, count, timeout=None)
+    return count
+
+
+def change_unread_count(user_id, delta):
+    """Изменить счетчик на delta; отсутствующий счетчик пересчитается при чтении"""
+    if not delta:
+        return
+    try:
+        cache.incr(_unread_key(user_id), delta)
+    except ValueError:
+        pass
+
+
+def invalidate_unread_counts(user_ids):
+    """Сбросить счетчики пользователей, изменения которых прошли мимо сигналов"""
+    cache.delete_many([_unread_key(user_id) for user_id in user_ids])
+
+
+def get_cached_unread_counts(user_ids):
+    """Счетчики пользователей, которые сейчас есть в кэше: {user_id: count}"""
+    keys = {_unread_key(user_id): user_id for user_id in user_ids}
+    return {keys[key]: count for key, count in cache.get_many(list(keys)).items()}
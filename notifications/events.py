@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# События уведомлений через Redis pub/sub.
+#
+# При создании, прочтении и удалении уведомления в канал получателя
+# публикуется короткое сообщение. ASGI-процесс держит одну подписку на все
+# каналы пользователей и раздает сообщения открытым потокам SSE этого
+# процесса, поэтому вкладки без новых событий не обращаются ни к БД, ни к
+# Redis.
+
+CHANNEL_PREFIX = 'notifications:events:'
+
+# Через сколько миллисекунд браузер переподключается к закрытому потоку
+STREAM_RETRY_MS = 5000
+
+_redis_client = None
+
+
+def _redis_url():
+    return getattr(settings, 'REDIS_URL', 'redis://localhost:6379/1')
+
+
+def channel_name(user_id):
+    return f'{CHANNEL_PREFIX}{user_id}'
+
+
+def get_redis():
+    """Синхронный клиент Redis для публикации (пул соединений внутри клиента)"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(_redis_url())
+    return _redis_client
+
+
+def publish_event(user_id, event):
+    """Отправить событие в канал пользователя
+
+    Ошибки Redis не прерывают запрос: браузер без потока событий
+    переходит на периодический опрос.
+    """
+    try:
+        get_redis().publish(channel_name(user_id), json.dumps(event, ensure_ascii=False))
+    except redis.RedisError:
+        logger.warning('Не удалось опубликовать событие уведомлений для пользователя %s', user_id, exc_info=True)
+
+
+def created_event(notification):
+    """Событие о новом уведомлении"""
+    return {
+        'type': 'created',
+        'id': notification.pk,
+        'title': notification.title,
+        'notification_type': notification.notification_type,
+        'url': f'/notifications/{notification.pk}/',
+    }
+
+
+class NotificationBroadcaster:
+    """Одна подписка Redis на процесс, раздающая события по очередям потоков"""
+
+    # Размер очереди одного потока: медленный клиент теряет лишние события,
+    # но не задерживает остальных
+    queue_size = 100
+
+    def __init__(self):
+        self.listeners = defaultdict(set)
+        self.task = None
+        self.ready = None
+        self.loop = None
+
+    def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            # Новый цикл событий (перезапуск процесса или тесты): прежняя задача ему не принадлежит
+            self.listeners = defaultdict(set)
+            self.task = None
+            self.loop = loop
+        if self.task is None or self.task.done():
+            self.ready = asyncio.Event()
+            self.task = loop.create_task(self.listen())
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.listeners[user_id].add(queue)
+        return queue
+
+    async def wait_ready(self, timeout):
+        """Дождаться подписки в Redis; False, если подписаться не удалось"""
+        waiter = asyncio.ensure_future(self.ready.wait())
+        try:
+            await asyncio.wait({waiter, self.task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        return self.ready.is_set()
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.listeners.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.listeners[user_id]
+
+    def dispatch(self, user_id, data):
+        for queue in list(self.listeners.get(user_id, ())):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                pass
+
+    async def listen(self):
+        client = redis.asyncio.Redis.from_url(_redis_url())
+        pubsub = client.pubsub()
+        try:
+            await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+            self.ready.set()
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                user_id = int(message['channel'][len(CHANNEL_PREFIX):])
+                self.dispatch(user_id, message['data'].decode())
+        except redis.RedisError:
+            logger.warning('Подписка на события уведомлений прервана', exc_info=True)
+        finally:
+            self.ready.clear()
+            # Потоки завершаются, браузеры переподключаются и подписка создается заново
+            for user_id in list(self.listeners):
+                self.dispatch(user_id, None)
+            await pubsub.aclose()
+            await client.aclose()
+
+
+broadcaster = NotificationBroadcaster()
+
+
+def format_event(data, event='notification'):
+    return f'event: {event}\ndata: {data}\n\n'
+
+
+async def stream_events(user_id):
+    """Поток SSE пользователя: события, комментарии keep-alive и ограничение времени жизни"""
+    keepalive = getattr(settings, 'NOTIFICATIONS_STREAM_KEEPALIVE', 25)
+    max_age = getattr(settings, 'NOTIFICATIONS_STREAM_MAX_AGE', 600)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_age
+
+    queue = broadcaster.subscribe(user_id)
+    try:
+        yield f'retry: {STREAM_RETRY_MS}\n\n'
+        # Без подписки поток бесполезен: браузер после нескольких неудач
+        # переходит на опрос
+        if not await broadcaster.wait_ready(keepalive):
+            return
+        # Пропущенные до подписки события браузер наверстывает, запросив счетчик
+        yield format_event(json.dumps({'type': 'connected'}), event='ready')
+        while True:
+            timeout = min(keepalive, deadline - loop.time())
+            if timeout <= 0:
+                break
+            try:
+                data = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if data is None:
+                break
+            yield format_event(data)
+    finally:
+        broadcaster.unsubscribe(user_id, queue)
@@ -0,0 +1,77 @@
+import logging
+import smtplib
+
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых соединение с SMTP-сервером считается потерянным:
+# письмо повторяется через новое соединение
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class MailServerUnavailable(Exception):
+    """Почтовый сервер недоступен и после повторных подключений"""
+
+
+class BulkMailer:
+    """Отправка пачки писем через одно соединение с почтовым сервером
+
+    Соединение открывается один раз на пачку (TLS-рукопожатие и авторизация
+    тоже), письма уходят по одному, чтобы результат был известен для
+    каждого получателя. При обрыве соединение переоткрывается, и письмо
+    повторяется до max_retries раз.
+    """
+
+    def __init__(self, connection=None, max_retries=2, timeout=None):
+        # timeout ограничивает одну операцию с сервером (None - EMAIL_TIMEOUT)
+        self.connection = connection or get_connection(fail_silently=False, timeout=timeout)
+        self.max_retries = max_retries
+        self.broken = False
+
+    def __enter__(self):
+        try:
+            self.connection.open()
+        except CONNECTION_ERRORS:
+            # Сервер недоступен: первая отправка попробует подключиться снова
+            self.broken = True
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            # Соединение могло быть уже оборвано сервером
+            logger.debug('Ошибка при закрытии почтового соединения', exc_info=True)
+
+    def send(self, message):
+        """Отправить одно письмо; возвращает None или текст ошибки
+
+        Если после ошибки broken остается установленным, письмо не ушло из-за
+        недоступности сервера, а не из-за самого письма.
+        """
+        attempt = 0
+        while True:
+            try:
+                if self.broken:
+                    self.close()
+                    self.connection.open()
+                    self.broken = False
+                self.connection.send_messages([message])
+                return None
+            except CONNECTION_ERRORS as exc:
+                self.broken = True
+                if attempt >= self.max_retries:
+                    return f'{type(exc).__name__}: {exc}'
+                attempt += 1
+                logger.warning('Почтовое соединение потеряно, переподключение (%s)', exc)
+            except Exception as exc:
+                # Ошибка конкретного письма (например, адрес отклонен): соединение живо
+                return f'{type(exc).__name__}: {exc}'
+
+    def send_all(self, messages):
+        """Отправить письма; возвращает список (письмо, ошибка или None)"""
+        return [(message, self.send(message)) for message in messages]
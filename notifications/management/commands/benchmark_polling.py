@@ -0,0 +1,242 @@
+import asyncio
+import io
+import time
+from collections import Counter
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.urls import reverse
+
+ENDPOINTS = {
+    'count': 'notifications:unread_count',
+    'dropdown': 'notifications:notifications_dropdown',
+}
+
+
+class Command(BaseCommand):
+    """Сравнение пропускной способности эндпоинтов опроса: синхронный WSGI против быстрого пути ASGI
+
+    Запросы подаются обработчикам напрямую, без сети: замеряется работа
+    одного процесса приложения (включая запросы к БД и Redis).
+    """
+    help = 'Замерить запросы в секунду на один процесс для эндпоинтов опроса уведомлений: WSGI против ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Имя пользователя (по умолчанию пользователь с наибольшим числом уведомлений)')
+        parser.add_argument('--endpoint', choices=ENDPOINTS, action='append', help='Эндпоинт (по умолчанию все)')
+        parser.add_argument('--requests', type=int, default=500, help='Количество запросов в каждом замере')
+        parser.add_argument('--concurrency', type=int, default=50, help='Одновременных клиентов у ASGI-процесса')
+        parser.add_argument('--warmup', type=int, default=20, help='Запросов на прогрев перед замером')
+        parser.add_argument(
+            '--db-latency', type=float, default=0,
+            help='Добавить задержку (мс) к каждому SQL-запросу, имитируя сетевую задержку до БД'
+        )
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        session = self._login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+        self.host = self._get_host()
+
+        self.stdout.write(
+            f'Пользователь: {user.username}, запросов в замере: {options["requests"]}, '
+            f'клиентов ASGI: {options["concurrency"]}, задержка БД: {options["db_latency"]} мс'
+        )
+        if options['db_latency']:
+            self._add_db_latency(options['db_latency'] / 1000)
+
+        from mmorpg_board.asgi import application, django_application
+
+        applications = {
+            'wsgi': get_wsgi_application(),
+            'asgi': django_application,
+            'fast': application,
+        }
+        try:
+            for endpoint in options['endpoint'] or ENDPOINTS:
+                self._compare(applications, reverse(ENDPOINTS[endpoint]), cookie, options)
+        finally:
+            session.delete()
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден')
+        user = User.objects.annotate(total=Count('notifications')).order_by('-total').first()
+        if user is None:
+            raise CommandError('В базе нет пользователей: заполните ее командой seed_board')
+        return user
+
+    def _login(self, user):
+        """Сессия вошедшего пользователя, как после django.contrib.auth.login"""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session
+
+    def _add_db_latency(self, seconds):
+        """Задержка перед каждым SQL-запросом на всех соединениях, открытых во время замера"""
+        def delay(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        # Ссылка нужна, чтобы обработчик не был удален сборщиком мусора
+        self._install_delay = install
+        connection_created.connect(install)
+        for connection in connections.all():
+            install(None, connection)
+
+    def _get_host(self):
+        for host in settings.ALLOWED_HOSTS:
+            if host == '*':
+                break
+            return host.lstrip('.')
+        return 'localhost'
+
+    def _compare(self, applications, path, cookie, options):
+        self.stdout.write(f'\nЭндпоинт: {path}')
+
+        # Первый ответ дает текущий ETag для замера условных запросов
+        status, headers = self._wsgi_request(applications['wsgi'], path, {'HTTP_COOKIE': cookie})
+        if status != 200:
+            raise CommandError(f'Эндпоинт {path} ответил {status}: проверьте сессию и ALLOWED_HOSTS')
+        etag = headers['ETag']
+
+        for label, extra in [('полный ответ', {}), ('304 по ETag', {'If-None-Match': etag})]:
+            wsgi_headers = {'HTTP_COOKIE': cookie}
+            wsgi_headers.update({f'HTTP_{name.upper().replace("-", "_")}': value for name, value in extra.items()})
+            asgi_headers = [(b'cookie', cookie.encode())]
+            asgi_headers += [(name.lower().encode(), value.encode()) for name, value in extra.items()]
+
+            results = [(
+                'WSGI, синхронные представления',
+                self._run_wsgi(applications['wsgi'], path, wsgi_headers, options['requests'], options['warmup']),
+            )]
+            for key, title in [
+                ('asgi', 'ASGI, вся цепочка Django'),
+                ('fast', 'ASGI, быстрый путь'),
+            ]:
+                results.append((title, asyncio.run(self._run_asgi(
+                    applications[key], path, asgi_headers,
+                    options['requests'], options['concurrency'], options['warmup'],
+                ))))
+
+            self.stdout.write(f'  {label}:')
+            for title, (rps, statuses) in results:
+                self.stdout.write(f'    {title:<32} {rps:8.1f} запросов/с {self._format_statuses(statuses)}')
+            sync_rps, fast_rps = results[0][1][0], results[-1][1][0]
+            style = self.style.SUCCESS if fast_rps >= sync_rps else self.style.WARNING
+            self.stdout.write(style(f'    быстрый путь / WSGI: x{fast_rps / sync_rps:.2f}'))
+
+    def _format_statuses(self, statuses):
+        return '(' + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())) + ')'
+
+    def _wsgi_environ(self, path, headers):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'SCRIPT_NAME': '',
+            'QUERY_STRING': '',
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': self.stderr,
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        environ.update(headers)
+        return environ
+
+    def _wsgi_request(self, app, path, headers):
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = dict(response_headers)
+
+        result = app(self._wsgi_environ(path, headers), start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            # close() отправляет request_finished: соединение с БД возвращается в пул
+            result.close()
+        return response['status'], response['headers']
+
+    def _run_wsgi(self, app, path, headers, requests, warmup):
+        """Синхронный процесс обрабатывает запросы строго по одному"""
+        for _ in range(warmup):
+            self._wsgi_request(app, path, headers)
+
+        statuses = Counter()
+        started = time.perf_counter()
+        for _ in range(requests):
+            status, _ = self._wsgi_request(app, path, headers)
+            statuses[status] += 1
+        return requests / (time.perf_counter() - started), statuses
+
+    async def _asgi_request(self, app, path, headers):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', self.host.encode())] + headers,
+            'client': ('127.0.0.1', 0),
+            'server': (self.host, 80),
+        }
+        response = {}
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+
+        await app(scope, receive, send)
+        return response['status']
+
+    async def _run_asgi(self, app, path, headers, requests, concurrency, warmup):
+        """Асинхронный процесс обслуживает concurrency клиентов в одном цикле событий"""
+        for _ in range(warmup):
+            await self._asgi_request(app, path, headers)
+
+        statuses = Counter()
+        remaining = requests
+
+        async def client():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                statuses[await self._asgi_request(app, path, headers)] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started), statuses
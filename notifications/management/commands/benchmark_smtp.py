@@ -0,0 +1,105 @@
+import socketserver
+import threading
+import time
+
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.core.management.base import BaseCommand
+
+from notifications.mailer import BulkMailer
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-сервер: принимает письма и отбрасывает их"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        # Задержка приветствия имитирует установку соединения (TCP, TLS, авторизация)
+        time.sleep(self.server.handshake_delay)
+        self.reply('220 localhost SMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                time.sleep(self.server.message_delay)
+                self.server.received += 1
+                self.reply('250 OK')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:
+                # MAIL FROM, RCPT TO, RSET, NOOP
+                self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handshake_delay, message_delay):
+        super().__init__(address, SMTPStandInHandler)
+        self.handshake_delay = handshake_delay
+        self.message_delay = message_delay
+        self.received = 0
+
+
+class Command(BaseCommand):
+    """Сравнение отправки писем по одному соединению на письмо и через BulkMailer"""
+    help = 'Замерить скорость отправки писем (писем/с) на локальном SMTP-сервере'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Количество писем в каждом замере')
+        parser.add_argument('--handshake-delay', type=float, default=0.02,
+                            help='Задержка (с) установки соединения на сервере')
+        parser.add_argument('--message-delay', type=float, default=0.0,
+                            help='Задержка (с) приема одного письма на сервере')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Писем на одно соединение BulkMailer')
+
+    def handle(self, *args, **options):
+        server = SMTPStandIn(('127.0.0.1', 0), options['handshake_delay'], options['message_delay'])
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address
+        backend = 'django.core.mail.backends.smtp.EmailBackend'
+        count = options['messages']
+
+        def connection():
+            return get_connection(backend, host=host, port=port, username='', password='',
+                                  use_tls=False, use_ssl=False, fail_silently=False)
+
+        def message(index):
+            return EmailMessage(f'Benchmark {index}', 'Текст письма', 'board@example.com',
+                                [f'user{index}@example.com'])
+
+        try:
+            # До: send_mail() на каждого получателя, новое соединение на каждое письмо
+            started = time.perf_counter()
+            for index in range(count):
+                send_mail(f'Benchmark {index}', 'Текст письма', 'board@example.com',
+                          [f'user{index}@example.com'], connection=connection())
+            before = time.perf_counter() - started
+
+            # После: одно соединение на пачку
+            started = time.perf_counter()
+            errors = 0
+            for offset in range(0, count, options['chunk_size']):
+                with BulkMailer(connection()) as mailer:
+                    for index in range(offset, min(offset + options['chunk_size'], count)):
+                        errors += mailer.send(message(index)) is not None
+            after = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f'Писем в замере: {count}, принято сервером за оба замера: {server.received}, ошибок: {errors}')
+        self.stdout.write(f'send_mail по одному: {count / before:.1f} писем/с ({before:.2f} с)')
+        self.stdout.write(f'BulkMailer:          {count / after:.1f} писем/с ({after:.2f} с)')
+        self.stdout.write(f'Ускорение: x{before / after:.1f}')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.outbox import get_batch_size, relay_email_outbox
+
+
+class Command(BaseCommand):
+    """Ретранслятор исходящей очереди писем
+
+    Работает постоянно; для масштабирования запускается в нескольких
+    процессах, записи между ними делит SKIP LOCKED.
+    """
+    help = 'Передавать задачи отправки писем из исходящей очереди (EmailOutbox) в Celery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=get_batch_size(), help='Записей за одну транзакцию')
+        parser.add_argument('--interval', type=float, default=1.0, help='Пауза (с), когда очередь пуста')
+        parser.add_argument('--once', action='store_true', help='Обработать одну пачку и завершиться')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        try:
+            while True:
+                published, failed = relay_email_outbox(batch_size)
+                if published or failed:
+                    self.stdout.write(f'Передано: {published}, неудачных попыток: {failed}')
+                if options['once']:
+                    break
+                # Соединение с БД проверяется между пачками, как между запросами
+                close_old_connections()
+                if failed or published < batch_size:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
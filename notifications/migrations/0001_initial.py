@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название шаблона')),
+                ('subject', models.CharField(max_length=200, verbose_name='Тема письма')),
+                ('html_content', models.TextField(verbose_name='HTML содержание')),
+                ('text_content', models.TextField(blank=True, verbose_name='Текстовое содержание')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Шаблон email',
+                'verbose_name_plural': 'Шаблоны email',
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('new_response', 'Новый отклик'), ('response_accepted', 'Отклик принят'), ('response_rejected', 'Отклик отклонен'), ('newsletter', 'Новостная рассылка'), ('system', 'Системное уведомление')], max_length=20, verbose_name='Тип уведомления')),
+                ('title', models.CharField(max_length=200, verbose_name='Заголовок')),
+                ('message', models.TextField(verbose_name='Сообщение')),
+                ('object_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_read', models.BooleanField(default=False, verbose_name='Прочитано')),
+                ('is_sent', models.BooleanField(default=False, verbose_name='Отправлено по email')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата прочтения')),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='Получатель')),
+                ('sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sent_notifications', to=settings.AUTH_USER_MODEL, verbose_name='Отправитель')),
+            ],
+            options={
+                'verbose_name': 'Уведомление',
+                'verbose_name_plural': 'Уведомления',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -37,24 +38,39 @@ class Notification(models.Model):
         verbose_name = 'Уведомление'
         verbose_name_plural = 'Уведомления'
         ordering = ['-created_at']
+        indexes = [
+            # Список и выпадающее меню уведомлений пользователя
+            models.Index(fields=['recipient', '-created_at'], name='notification_recipient_idx'),
+            # Непрочитанные уведомления (счетчик и фильтр)
+            models.Index(fields=['recipient', '-created_at'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+            # Поиск уведомлений по связанному объекту
+            models.Index(fields=['content_type', 'object_id'], name='notification_object_idx'),
+        ]
     
     def __str__(self):
         return f'{self.title} для {self.recipient.username}'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Состояние прочтения в БД: по нему сигналы меняют счетчик непрочитанных
+        instance._saved_is_read = instance.__dict__.get('is_read')
+        return instance
+    
     def mark_as_read(self):
         """Пометить как прочитанное"""
-        from django.utils import timezone
         self.is_read = True
         self.read_at = timezone.now()
         self.save()
     
     def send_email(self):
-        """Отправить уведомление по email"""
+        """Отправить уведомление по email (через исходящую очередь EmailOutbox)"""
         if not self.is_sent and self.recipient.profile.email_notifications:
             from .tasks import send_notification_email_task
-            send_notification_email_task.delay(self.pk)
-            self.is_sent = True
-            self.save()
+            with transaction.atomic():
+                EmailOutbox.enqueue(send_notification_email_task, self.pk)
+                self.is_sent = True
+                self.save()
 
 
 class EmailTemplate(models.Model):
@@ -73,3 +89,48 @@ class EmailTemplate(models.Model):
     
     def __str__(self):
         return self.name
+
+
+class EmailOutbox(models.Model):
+    """Исходящая очередь задач отправки писем
+
+    Запись создается в транзакции вызывающего кода и передается в Celery
+    ретранслятором (команда relay_email_outbox) только после фиксации:
+    откат не порождает писем, а медленный брокер не задерживает запрос.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает передачи'),
+        ('published', 'Передано в очередь'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    task_name = models.CharField(max_length=200, verbose_name='Задача')
+    args = models.JSONField(default=list, blank=True, verbose_name='Аргументы')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='Статус')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    published_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата передачи')
+    
+    class Meta:
+        verbose_name = 'Письмо в очереди'
+        verbose_name_plural = 'Исходящая очередь писем'
+        indexes = [
+            # Выборка ретранслятора: только ожидающие записи в порядке попыток
+            models.Index(fields=['next_attempt_at', 'id'], condition=models.Q(status='pending'), name='email_outbox_pending_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.task_name}{tuple(self.args)}'
+    
+    @classmethod
+    def enqueue(cls, task, *args):
+        """Записать задачу отправки письма в текущей транзакции"""
+        return cls.objects.create(task_name=task.name, args=list(args))
+    
+    @classmethod
+    def enqueue_many(cls, task, args_list):
+        """Записать задачи отправки писем одним INSERT"""
+        return cls.objects.bulk_create([cls(task_name=task.name, args=list(args)) for args in args_list])
@@ -0,0 +1,303 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from celery import chord
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from bulletin_board.models import Newsletter, NewsletterChunk
+from . import services
+from .mailer import BulkMailer, MailServerUnavailable
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Доставка новостных рассылок.
+#
+# Получатели делятся на части по диапазонам id (NEWSLETTER_CHUNK_SIZE
+# получателей), части отправляются параллельными задачами Celery, а chord
+# отмечает рассылку отправленной после последней части. Часть отправляет
+# письма через одно SMTP-соединение и сохраняет курсор и счетчики после
+# каждой пачки из NEWSLETTER_CHECKPOINT_SIZE писем: перезапуск продолжает с
+# места остановки, повторно может уйти только последняя незафиксированная
+# пачка. Часть захватывается арендой на NEWSLETTER_CHUNK_LEASE секунд с
+# токеном: прогресс сохраняется условным UPDATE по токену, и воркер, чью
+# аренду перехватили, прекращает отправку. Недоступность почтового сервера
+# не считается ошибкой доставки: часть остается в ожидании и продолжается
+# повторной попыткой задачи или задачей перезапуска.
+
+
+class ChunkLeaseLost(Exception):
+    """Аренда части истекла и перехвачена другим воркером"""
+
+
+def get_chunk_size():
+    return getattr(settings, 'NEWSLETTER_CHUNK_SIZE', 500)
+
+
+def get_checkpoint_size():
+    return getattr(settings, 'NEWSLETTER_CHECKPOINT_SIZE', 50)
+
+
+def get_lease():
+    return timedelta(seconds=getattr(settings, 'NEWSLETTER_CHUNK_LEASE', 300))
+
+
+def get_stall_timeout():
+    return timedelta(seconds=getattr(settings, 'NEWSLETTER_STALL_TIMEOUT', 900))
+
+
+def get_send_timeout():
+    # Одна операция с почтовым сервером не должна пережить аренду части
+    return getattr(settings, 'NEWSLETTER_SEND_TIMEOUT', 30)
+
+
+def get_newsletter_recipients(newsletter):
+    """Получатели рассылки: выбранные пользователи или все активные подписчики"""
+    if newsletter.recipients.exists():
+        return newsletter.recipients.all()
+    return User.objects.filter(is_active=True, profile__newsletter_subscription=True)
+
+
+def build_newsletter_message(newsletter, user):
+    """Письмо рассылки для одного пользователя"""
+    context = {
+        'newsletter': newsletter,
+        'user': user,
+        'site_name': 'MMORPG Board',
+        'site_url': getattr(settings, 'SITE_URL', 'http://localhost:8000'),
+    }
+    html_message = render_to_string('notifications/emails/newsletter.html', context)
+    message = EmailMultiAlternatives(
+        subject=f'[MMORPG Board Newsletter] {newsletter.title}',
+        body=strip_tags(html_message),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email],
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def send_newsletter_batch(newsletter, users, mailer):
+    """Отправить письма пачке пользователей; возвращает список (пользователь, ошибка или None)
+
+    Если почтовый сервер недоступен (mailer.broken после повторных попыток),
+    отправка останавливается: результаты есть только для пользователей до
+    первого неотправленного письма.
+    """
+    results = []
+    for user in users:
+        try:
+            message = build_newsletter_message(newsletter, user)
+        except Exception as exc:
+            results.append((user, f'{type(exc).__name__}: {exc}'))
+            continue
+        error = mailer.send(message)
+        if error is not None and mailer.broken:
+            logger.warning('Рассылка %s прервана: почтовый сервер недоступен (%s)', newsletter.pk, error)
+            break
+        results.append((user, error))
+
+    for user, error in results:
+        if error is not None:
+            logger.warning('Рассылка %s не доставлена пользователю %s: %s', newsletter.pk, user.username, error)
+
+    # Уведомления в системе для тех, кому письмо ушло
+    services.create_notifications([
+        Notification(
+            recipient=user,
+            notification_type='newsletter',
+            title=newsletter.title,
+            message=f'Новая рассылка: {newsletter.title}',
+            is_sent=True,
+        )
+        for user, error in results if error is None
+    ])
+    return results
+
+
+def plan_newsletter(newsletter_id, chunk_size=None):
+    """Разбить получателей рассылки на части по диапазонам id
+
+    Части создаются один раз: повторный вызов (перезапуск) возвращает
+    рассылку с уже созданными частями.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    with transaction.atomic():
+        newsletter = Newsletter.objects.select_for_update().get(pk=newsletter_id)
+        if newsletter.status == 'sent' or newsletter.chunks.exists():
+            return newsletter
+
+        chunks = []
+        user_ids = []
+
+        def add_chunk():
+            chunks.append(NewsletterChunk(
+                newsletter=newsletter,
+                first_user_id=user_ids[0],
+                last_user_id=user_ids[-1],
+                queued_count=len(user_ids),
+            ))
+
+        recipients = get_newsletter_recipients(newsletter).order_by('pk').values_list('pk', flat=True)
+        for user_id in recipients.iterator(chunk_size=chunk_size):
+            user_ids.append(user_id)
+            if len(user_ids) >= chunk_size:
+                add_chunk()
+                user_ids = []
+        if user_ids:
+            add_chunk()
+
+        NewsletterChunk.objects.bulk_create(chunks)
+        newsletter.status = 'sending'
+        newsletter.queued_count = sum(chunk.queued_count for chunk in chunks)
+        newsletter.save(update_fields=['status', 'queued_count'])
+    return newsletter
+
+
+def dispatch_newsletter(newsletter_id):
+    """Запустить параллельную отправку неотправленных частей; возвращает количество запущенных частей"""
+    from bulletin_board.tasks import finish_newsletter_task, send_newsletter_chunk_task
+
+    newsletter = plan_newsletter(newsletter_id)
+    if newsletter.status == 'sent':
+        return 0
+
+    pending = newsletter.chunks.filter(status='pending')
+    chunk_ids = list(pending.values_list('pk', flat=True))
+    if not chunk_ids:
+        finish_newsletter(newsletter_id)
+        return 0
+
+    # Отметка о постановке в очередь: части, ждущие воркера, не считаются зависшими
+    pending.update(updated_at=timezone.now())
+    chord(send_newsletter_chunk_task.s(chunk_id) for chunk_id in chunk_ids)(
+        finish_newsletter_task.si(newsletter_id)
+    )
+    return len(chunk_ids)
+
+
+def _claim_chunk(chunk_id):
+    """Взять часть в аренду; возвращает токен или None, если часть отправлена или ее отправляет другой воркер"""
+    now = timezone.now()
+    token = uuid.uuid4()
+    claimed = NewsletterChunk.objects.filter(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now),
+        pk=chunk_id,
+        status='pending',
+    ).update(lease_expires_at=now + get_lease(), claim_token=token, updated_at=now)
+    return token if claimed else None
+
+
+def _update_claimed(chunk, **fields):
+    """Обновить часть, только пока аренда принадлежит этому воркеру"""
+    updated = NewsletterChunk.objects.filter(pk=chunk.pk, claim_token=chunk.claim_token).update(
+        updated_at=timezone.now(), **fields
+    )
+    if not updated:
+        raise ChunkLeaseLost(f'Аренда части рассылки {chunk.pk} перехвачена')
+
+
+def _save_progress(chunk, last_processed_id, sent, failed):
+    with transaction.atomic():
+        # Аренда продлевается с каждой пачкой, пока часть отправляется
+        _update_claimed(
+            chunk,
+            last_processed_id=last_processed_id,
+            sent_count=F('sent_count') + sent,
+            failed_count=F('failed_count') + failed,
+            lease_expires_at=timezone.now() + get_lease(),
+        )
+        Newsletter.objects.filter(pk=chunk.newsletter_id).update(
+            sent_count=F('sent_count') + sent,
+            failed_count=F('failed_count') + failed,
+        )
+    chunk.last_processed_id = last_processed_id
+
+
+def send_newsletter_chunk(chunk_id):
+    """Отправить часть рассылки с места остановки; возвращает (доставлено, не доставлено) за этот запуск
+
+    Вызывает MailServerUnavailable, если почтовый сервер недоступен: часть
+    остается в ожидании с курсором после последнего отправленного письма.
+    """
+    token = _claim_chunk(chunk_id)
+    if token is None:
+        return 0, 0
+
+    chunk = NewsletterChunk.objects.select_related('newsletter').get(pk=chunk_id)
+    # Все обновления части проверяют токен именно этого захвата
+    chunk.claim_token = token
+    newsletter = chunk.newsletter
+    recipients = (
+        get_newsletter_recipients(newsletter)
+        .filter(pk__range=(chunk.first_user_id, chunk.last_user_id))
+        .order_by('pk')
+    )
+    checkpoint_size = get_checkpoint_size()
+    sent = failed = 0
+
+    with BulkMailer(timeout=get_send_timeout()) as mailer:
+        while True:
+            users = list(recipients.filter(pk__gt=chunk.last_processed_id)[:checkpoint_size])
+            if not users:
+                break
+            results = send_newsletter_batch(newsletter, users, mailer)
+            batch_failed = sum(1 for _, error in results if error is not None)
+            if results:
+                _save_progress(chunk, results[-1][0].pk, len(results) - batch_failed, batch_failed)
+            sent += len(results) - batch_failed
+            failed += batch_failed
+
+            if mailer.broken:
+                # Аренда снимается, чтобы повторная попытка задачи взяла часть сразу
+                _update_claimed(chunk, lease_expires_at=None, claim_token=None)
+                raise MailServerUnavailable(f'Часть рассылки {chunk.pk} остановлена на пользователе {chunk.last_processed_id}')
+
+    _update_claimed(chunk, status='done', lease_expires_at=None, claim_token=None)
+    return sent, failed
+
+
+def finish_newsletter(newsletter_id):
+    """Отметить рассылку отправленной, если отправлены все части; возвращает True при завершении"""
+    if NewsletterChunk.objects.filter(newsletter_id=newsletter_id, status='pending').exists():
+        return False
+    return bool(
+        Newsletter.objects.filter(pk=newsletter_id, status='sending')
+        .update(status='sent', is_sent=True, sent_at=timezone.now())
+    )
+
+
+def resume_stalled_newsletters():
+    """Перезапустить рассылки, части которых зависли; возвращает количество перезапущенных
+
+    Зависшей считается часть с истекшей арендой (воркер упал во время
+    отправки) или не взятая в работу дольше NEWSLETTER_STALL_TIMEOUT.
+    """
+    now = timezone.now()
+    stalled = NewsletterChunk.objects.filter(status='pending', newsletter__status='sending').filter(
+        Q(lease_expires_at__lt=now)
+        | Q(lease_expires_at__isnull=True, updated_at__lt=now - get_stall_timeout())
+    )
+    newsletter_ids = set(stalled.values_list('newsletter_id', flat=True))
+
+    # Все части отправлены, но завершение chord не выполнилось
+    unfinished = (
+        Newsletter.objects.filter(status='sending', chunks__isnull=False)
+        .exclude(chunks__status='pending')
+        .values_list('pk', flat=True)
+        .distinct()
+    )
+    for newsletter_id in unfinished:
+        finish_newsletter(newsletter_id)
+
+    for newsletter_id in newsletter_ids:
+        dispatch_newsletter(newsletter_id)
+    return len(newsletter_ids)
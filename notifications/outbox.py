@@ -0,0 +1,85 @@
+import logging
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# Ретрансляция исходящей очереди писем в Celery.
+#
+# Ретранслятор забирает пачку ожидающих записей через SELECT ... FOR UPDATE
+# SKIP LOCKED, поэтому несколько процессов делят очередь без повторной
+# отправки одной записи. Неудачная передача откладывает запись с
+# экспоненциальной задержкой, после EMAIL_OUTBOX_MAX_ATTEMPTS попыток запись
+# помечается ошибочной. Доставка «хотя бы один раз»: если транзакция
+# ретранслятора не зафиксируется после передачи, задача уйдет повторно.
+
+
+def get_batch_size():
+    return getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 100)
+
+
+def get_retry_delay(attempts):
+    """Задержка перед следующей попыткой: удваивается с каждой неудачей"""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 10)
+    maximum = getattr(settings, 'EMAIL_OUTBOX_MAX_RETRY_DELAY', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), maximum))
+
+
+def _get_task(name):
+    if name not in current_app.tasks:
+        # Вне воркера модули задач еще не импортированы: autodiscover_tasks ленивый
+        current_app.loader.import_default_modules()
+    return current_app.tasks[name]
+
+
+def relay_email_outbox(batch_size=None):
+    """Передать в Celery пачку ожидающих записей; возвращает (передано, неудачных попыток)"""
+    batch_size = batch_size or get_batch_size()
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 8)
+    now = timezone.now()
+    published = []
+    failed = []
+
+    with transaction.atomic():
+        entries = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        for entry in entries:
+            entry.attempts += 1
+            try:
+                _get_task(entry.task_name).apply_async(args=entry.args)
+            except Exception as exc:
+                entry.last_error = f'{type(exc).__name__}: {exc}'
+                if entry.attempts >= max_attempts:
+                    entry.status = 'failed'
+                    logger.error('Запись исходящей очереди %s не передана после %s попыток: %s', entry.pk, entry.attempts, exc)
+                else:
+                    entry.next_attempt_at = now + get_retry_delay(entry.attempts)
+                failed.append(entry)
+                # Скорее всего недоступен брокер: остальные записи пачки ждут следующего прохода
+                break
+            entry.status = 'published'
+            entry.published_at = timezone.now()
+            entry.last_error = ''
+            published.append(entry)
+
+        EmailOutbox.objects.bulk_update(
+            published + failed, ['status', 'attempts', 'next_attempt_at', 'last_error', 'published_at']
+        )
+
+    return len(published), len(failed)
+
+
+def purge_email_outbox(days=7):
+    """Удалить переданные записи старше days дней; возвращает количество удаленных"""
+    threshold = timezone.now() - timedelta(days=days)
+    deleted, _ = EmailOutbox.objects.filter(status='published', published_at__lt=threshold).delete()
+    return deleted
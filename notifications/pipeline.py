@@ -0,0 +1,81 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from bulletin_board.models import Response
+from . import services
+from .models import Notification
+
+# Создание уведомлений после фиксации транзакции.
+#
+# Сигналы моделей не создают уведомления в запросе: они ставят компактное
+# событие [тип, id объекта] в очередь Celery после фиксации транзакции
+# (откат не порождает событий). Воркер получает список событий, загружает
+# объекты с авторами одним запросом, создает уведомления пачкой INSERT и
+# ставит письма в очередь.
+
+
+def _new_response(response):
+    return Notification(
+        recipient=response.post.author,
+        sender=response.author,
+        notification_type='new_response',
+        title='Новый отклик на ваше объявление',
+        message=f'Пользователь {response.author.username} оставил отклик на ваше объявление "{response.post.title}"',
+    )
+
+
+def _response_accepted(response):
+    return Notification(
+        recipient=response.author,
+        sender=response.post.author,
+        notification_type='response_accepted',
+        title='Ваш отклик принят!',
+        message=f'Ваш отклик на объявление "{response.post.title}" был принят пользователем {response.post.author.username}',
+    )
+
+
+def _response_rejected(response):
+    return Notification(
+        recipient=response.author,
+        sender=response.post.author,
+        notification_type='response_rejected',
+        title='Ваш отклик отклонен',
+        message=f'Ваш отклик на объявление "{response.post.title}" был отклонен пользователем {response.post.author.username}',
+    )
+
+
+RESPONSE_NOTIFICATIONS = {
+    'new_response': _new_response,
+    'response_accepted': _response_accepted,
+    'response_rejected': _response_rejected,
+}
+
+
+def enqueue_notification(event_type, object_id):
+    """Поставить событие в очередь создания уведомлений после фиксации транзакции"""
+    from .tasks import create_notifications_task
+    events = [[event_type, object_id]]
+    # Недоступный брокер не должен ломать уже зафиксированный запрос: ошибка записывается в лог
+    transaction.on_commit(lambda: create_notifications_task.delay(events), robust=True)
+
+
+def create_notifications_for_events(events):
+    """Создать уведомления по списку событий [тип, id отклика]; возвращает созданные"""
+    responses = Response.objects.select_related('author', 'post__author').in_bulk(
+        {object_id for _, object_id in events}
+    )
+    content_type = ContentType.objects.get_for_model(Response)
+
+    notifications = []
+    for event_type, response_id in events:
+        build = RESPONSE_NOTIFICATIONS.get(event_type)
+        response = responses.get(response_id)
+        if build is None or response is None:
+            # Неизвестный тип или отклик удален до обработки события
+            continue
+        notification = build(response)
+        notification.content_type = content_type
+        notification.object_id = response.pk
+        notifications.append(notification)
+
+    return services.create_notifications(notifications)
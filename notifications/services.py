@@ -0,0 +1,145 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .cache import bump_version, change_unread_count, dropdown_item, dropdown_mark, dropdown_remove, dropdown_upsert
+from .events import created_event, publish_event
+from .models import EmailOutbox, Notification
+
+# Массовые переходы состояний уведомлений.
+#
+# Уведомления обрабатываются пачками: строки пачки блокируются одним
+# SELECT ... FOR UPDATE и меняются одним UPDATE (или DELETE) по списку id.
+# Сигналы модели при этом не вызываются, поэтому счетчики непрочитанных,
+# версии ETag и события SSE получателей обновляются здесь же, по одному
+# разу на получателя в пачке. Каждая функция принимает QuerySet или список
+# id и возвращает количество затронутых уведомлений.
+
+BATCH_SIZE = 1000
+
+
+def _as_queryset(notifications):
+    if not isinstance(notifications, QuerySet):
+        return Notification.objects.filter(pk__in=list(notifications))
+    if notifications.query.is_sliced:
+        # Срез вычисляется один раз: иначе каждая пачка выбирала бы новые строки
+        return Notification.objects.filter(pk__in=list(notifications.values_list('pk', flat=True)))
+    if notifications.query.distinct:
+        # FOR UPDATE несовместим с DISTINCT (поиск в админке по связанным полям)
+        return Notification.objects.filter(pk__in=notifications.values('pk'))
+    return notifications
+
+
+def _process_batches(queryset, apply, batch_size):
+    """Применять apply к пачкам строк (pk, recipient_id, is_read), пока queryset не опустеет
+
+    apply должен выводить строки из queryset, иначе цикл не завершится.
+    """
+    affected = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(of=('self',))
+                .order_by('pk')
+                .values_list('pk', 'recipient_id', 'is_read')[:batch_size]
+            )
+            if rows:
+                apply(rows)
+        affected += len(rows)
+        if len(rows) < batch_size:
+            return affected
+
+
+def _notify_recipients(rows, event_type, dropdown_change, unread_delta):
+    """После фиксации пачки: счетчики непрочитанных, версии, меню и события получателей"""
+    ids_by_recipient = defaultdict(list)
+    deltas = defaultdict(int)
+    for pk, recipient_id, is_read in rows:
+        ids_by_recipient[recipient_id].append(pk)
+        deltas[recipient_id] += unread_delta(is_read)
+
+    def notify():
+        for recipient_id, ids in ids_by_recipient.items():
+            change_unread_count(recipient_id, deltas[recipient_id])
+            bump_version(recipient_id, dropdown_change(ids))
+            if event_type:
+                publish_event(recipient_id, {'type': event_type, 'ids': ids})
+
+    transaction.on_commit(notify)
+
+
+def create_notifications(notifications, batch_size=BATCH_SIZE):
+    """Создать уведомления пачками INSERT и поставить в очередь письма по ним
+
+    Возвращает созданные уведомления.
+    """
+    created = Notification.objects.bulk_create(notifications, batch_size=batch_size)
+
+    by_recipient = defaultdict(list)
+    for notification in created:
+        # Дальнейшие сохранения объекта сигналы сравнивают с этим состоянием
+        notification._saved_is_read = notification.is_read
+        by_recipient[notification.recipient_id].insert(0, notification)
+
+    def notify():
+        for recipient_id, recipient_notifications in by_recipient.items():
+            change_unread_count(recipient_id, sum(not notification.is_read for notification in recipient_notifications))
+            bump_version(recipient_id, dropdown_upsert(dropdown_item(notification) for notification in recipient_notifications))
+            for notification in recipient_notifications:
+                publish_event(recipient_id, created_event(notification))
+
+    transaction.on_commit(notify)
+    send_emails([notification.pk for notification in created], batch_size)
+    return created
+
+
+def mark_read(notifications, batch_size=BATCH_SIZE):
+    """Пометить непрочитанные уведомления прочитанными"""
+    read_at = timezone.now()
+
+    def apply(rows):
+        Notification.objects.filter(pk__in=[row[0] for row in rows]).update(is_read=True, read_at=read_at)
+        _notify_recipients(rows, 'read', partial(dropdown_mark, is_read=True), lambda is_read: -1)
+
+    return _process_batches(_as_queryset(notifications).filter(is_read=False), apply, batch_size)
+
+
+def mark_unread(notifications, batch_size=BATCH_SIZE):
+    """Вернуть прочитанные уведомления в непрочитанные"""
+    def apply(rows):
+        Notification.objects.filter(pk__in=[row[0] for row in rows]).update(is_read=False, read_at=None)
+        _notify_recipients(rows, 'unread', partial(dropdown_mark, is_read=False), lambda is_read: 1)
+
+    return _process_batches(_as_queryset(notifications).filter(is_read=True), apply, batch_size)
+
+
+def delete_notifications(notifications, batch_size=BATCH_SIZE):
+    """Удалить уведомления"""
+    def apply(rows):
+        # Закрытый QuerySet._raw_delete() намеренно: delete() загрузил бы объекты и
+        # отправил post_delete на каждое уведомление, а обработчики в signals.py
+        # уменьшили бы счетчик непрочитанных и обновили меню повторно, поверх
+        # _notify_recipients ниже. Каскадов нет: на Notification никто не ссылается
+        # (проверяется в NotificationServiceTests).
+        batch = Notification.objects.filter(pk__in=[row[0] for row in rows])
+        batch._raw_delete(batch.db)
+        _notify_recipients(rows, 'deleted', dropdown_remove, lambda is_read: 0 if is_read else -1)
+
+    return _process_batches(_as_queryset(notifications), apply, batch_size)
+
+
+def send_emails(notifications, batch_size=BATCH_SIZE):
+    """Поставить в очередь письма по неотправленным уведомлениям получателей с включенной рассылкой"""
+    from .tasks import send_notification_email_task
+
+    def apply(rows):
+        ids = [row[0] for row in rows]
+        Notification.objects.filter(pk__in=ids).update(is_sent=True)
+        # В той же транзакции: письма уйдут, только если пачка зафиксируется
+        EmailOutbox.enqueue_many(send_notification_email_task, [[pk] for pk in ids])
+
+    queryset = _as_queryset(notifications).filter(is_sent=False, recipient__profile__email_notifications=True)
+    return _process_batches(queryset, apply, batch_size)
@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import (
+    bump_version, change_unread_count, dropdown_item, dropdown_remove, dropdown_upsert, invalidate_unread_counts,
+)
+from .events import created_event, publish_event
+from .models import Notification
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_count_on_save(sender, instance, created, **kwargs):
+    """Изменить счетчик непрочитанных получателя, если изменилось состояние прочтения"""
+    recipient_id = instance.recipient_id
+    if created:
+        delta = 0 if instance.is_read else 1
+    elif getattr(instance, '_saved_is_read', None) is None:
+        # Прежнее состояние неизвестно (объект создан не из БД): счетчик пересчитается при чтении
+        transaction.on_commit(lambda: invalidate_unread_counts([recipient_id]))
+        delta = 0
+    else:
+        # Прочтение уменьшает счетчик, возврат в непрочитанные увеличивает
+        delta = int(instance._saved_is_read) - int(instance.is_read)
+    if delta:
+        transaction.on_commit(lambda: change_unread_count(recipient_id, delta))
+    instance._saved_is_read = instance.is_read
+
+
+@receiver(post_delete, sender=Notification)
+def update_unread_count_on_delete(sender, instance, **kwargs):
+    if not getattr(instance, '_saved_is_read', instance.is_read):
+        recipient_id = instance.recipient_id
+        transaction.on_commit(lambda: change_unread_count(recipient_id, -1))
+
+
+@receiver(post_save, sender=Notification)
+def bump_notifications_version_on_save(sender, instance, **kwargs):
+    """Сменить версию уведомлений получателя после фиксации транзакции и обновить меню"""
+    recipient_id = instance.recipient_id
+    change = dropdown_upsert([dropdown_item(instance)])
+    transaction.on_commit(lambda: bump_version(recipient_id, change))
+
+
+@receiver(post_delete, sender=Notification)
+def bump_notifications_version_on_delete(sender, instance, **kwargs):
+    recipient_id = instance.recipient_id
+    change = dropdown_remove([instance.pk])
+    transaction.on_commit(lambda: bump_version(recipient_id, change))
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification_saved(sender, instance, created, **kwargs):
+    """Сообщить открытым вкладкам получателя о новом или прочитанном уведомлении"""
+    if created:
+        event = created_event(instance)
+    elif instance.is_read:
+        event = {'type': 'read', 'id': instance.pk}
+    else:
+        # Служебные сохранения (например, отметка об отправке письма) счетчик не меняют
+        return
+    recipient_id = instance.recipient_id
+    transaction.on_commit(lambda: publish_event(recipient_id, event))
+
+
+@receiver(post_delete, sender=Notification)
+def publish_notification_deleted(sender, instance, **kwargs):
+    recipient_id = instance.recipient_id
+    event = {'type': 'deleted', 'id': instance.pk}
+    transaction.on_commit(lambda: publish_event(recipient_id, event))
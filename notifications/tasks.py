@@ -4,6 +4,8 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.models import Count, Max
+from .cache import get_cached_unread_counts, invalidate_unread_counts
 from .models import Notification
 from bulletin_board.models import Newsletter
 
@@ -52,9 +54,8 @@ def send_notification_email_task(notification_id):
             fail_silently=False,
         )
         
-        # Помечаем как отправленное
-        notification.is_sent = True
-        notification.save()
+        # Помечаем как отправленное, не перезаписывая поля, измененные во время отправки
+        Notification.objects.filter(pk=notification.pk).update(is_sent=True)
         
         return f'Email уведомление отправлено пользователю {notification.recipient.username}'
         
@@ -65,69 +66,23 @@ def send_notification_email_task(notification_id):
 
 
 @shared_task
+def create_notifications_task(events):
+    """Создать уведомления по событиям из сигналов моделей"""
+    from .pipeline import create_notifications_for_events
+    created = create_notifications_for_events(events)
+    return f'Создано {len(created)} уведомлений'
+
+
+@shared_task(acks_late=True)
 def send_newsletter_task(newsletter_id):
     """Задача для отправки новостной рассылки"""
+    from .newsletters import dispatch_newsletter
     try:
-        newsletter = Newsletter.objects.get(id=newsletter_id)
-        
-        # Получаем список получателей
-        if newsletter.recipients.exists():
-            recipients = newsletter.recipients.all()
-        else:
-            # Если получатели не указаны, отправляем всем активным пользователям с подпиской
-            recipients = User.objects.filter(
-                is_active=True,
-                profile__newsletter_subscription=True
-            )
-        
-        sent_count = 0
-        
-        for user in recipients:
-            try:
-                # Подготовка содержимого письма
-                subject = f'[MMORPG Board Newsletter] {newsletter.title}'
-                
-                context = {
-                    'newsletter': newsletter,
-                    'user': user,
-                    'site_name': 'MMORPG Board',
-                    'site_url': getattr(settings, 'SITE_URL', 'http://localhost:8000'),
-                }
-                
-                # Рендерим HTML и текстовую версию
-                html_message = render_to_string('notifications/emails/newsletter.html', context)
-                plain_message = strip_tags(html_message)
-                
-                # Отправляем email
-                send_mail(
-                    subject=subject,
-                    message=plain_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    html_message=html_message,
-                    fail_silently=False,
-                )
-                
-                sent_count += 1
-                
-                # Создаем уведомление в системе
-                Notification.objects.create(
-                    recipient=user,
-                    notification_type='newsletter',
-                    title=newsletter.title,
-                    message=f'Новая рассылка: {newsletter.title}',
-                    is_sent=True
-                )
-                
-            except Exception as e:
-                print(f'Ошибка при отправке рассылки пользователю {user.username}: {str(e)}')
-        
-        return f'Рассылка "{newsletter.title}" отправлена {sent_count} пользователям'
-        
+        dispatched = dispatch_newsletter(newsletter_id)
     except Newsletter.DoesNotExist:
         return f'Рассылка с ID {newsletter_id} не найдена'
-    except Exception as e:
-        return f'Ошибка при отправке рассылки: {str(e)}'
+    # Части рассылки отправляются задачами bulletin_board.tasks.send_newsletter_chunk_task
+    return f'Рассылка {newsletter_id}: запущено частей {dispatched}'
 
 
 @shared_task
@@ -148,8 +103,7 @@ def send_bulk_notification_task(user_ids, notification_type, title, message):
                 )
                 
                 # Отправляем email если включены уведомления
-                if user.profile.email_notifications:
-                    send_notification_email_task.delay(notification.id)
+                notification.send_email()
                 
                 sent_count += 1
                 
@@ -159,4 +113,47 @@ def send_bulk_notification_task(user_ids, notification_type, title, message):
         return f'Создано {sent_count} уведомлений'
         
     except Exception as e:
-        return f'Ошибка при массовой отправке: {str(e)}' 
\ No newline at end of file
+        return f'Ошибка при массовой отправке: {str(e)}'
+
+
+def reconcile_unread_counters(batch_size=1000):
+    """Сверить счетчики непрочитанных уведомлений в Redis с БД
+
+    Пользователи обрабатываются пачками по диапазонам id, сверяются только
+    счетчики, которые есть в кэше. Разошедшиеся счетчики сбрасываются и
+    пересчитываются при следующем чтении (перезапись могла бы потерять
+    изменение, пришедшее во время сверки). Возвращает количество сброшенных.
+    """
+    max_id = User.objects.aggregate(max_id=Max('pk'))['max_id'] or 0
+    fixed_count = 0
+
+    for start in range(0, max_id + 1, batch_size):
+        cached = get_cached_unread_counts(range(start, start + batch_size))
+        if not cached:
+            continue
+        actual = dict(
+            Notification.objects.filter(recipient_id__in=list(cached), is_read=False)
+            .values('recipient_id')
+            .annotate(count=Count('pk'))
+            .values_list('recipient_id', 'count')
+        )
+        drifted_ids = [user_id for user_id, count in cached.items() if count != actual.get(user_id, 0)]
+        invalidate_unread_counts(drifted_ids)
+        fixed_count += len(drifted_ids)
+
+    return fixed_count
+
+
+@shared_task
+def reconcile_unread_counters_task(batch_size=1000):
+    """Периодическая сверка счетчиков непрочитанных уведомлений"""
+    fixed_count = reconcile_unread_counters(batch_size)
+    return f'Сброшены счетчики непрочитанных у {fixed_count} пользователей'
+
+
+@shared_task
+def purge_email_outbox_task(days=7):
+    """Периодическая очистка переданных записей исходящей очереди писем"""
+    from .outbox import purge_email_outbox
+    deleted = purge_email_outbox(days)
+    return f'Удалено {deleted} записей исходящей очереди писем'
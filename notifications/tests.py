@@ -1,3 +1,861 @@
-from django.test import TestCase
+import asyncio
+import json
+import smtplib
+import uuid
+from datetime import timedelta
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+import redis
+from celery import current_app
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bulletin_board.models import Category, Newsletter, NewsletterChunk, Post, Response
+from bulletin_board.testing import ViewPerformanceTestCase, seed_performance_data
+from . import services, views
+from .asgi import PollingRouter
+from .cache import bump_version, get_dropdown_items, get_stats, get_unread_count, get_version
+from .events import get_redis
+from .mailer import BulkMailer, MailServerUnavailable
+from .models import EmailOutbox, Notification
+from .newsletters import (
+    ChunkLeaseLost, finish_newsletter, plan_newsletter, resume_stalled_newsletters, send_newsletter_chunk,
+)
+from .outbox import relay_email_outbox
+from .pipeline import create_notifications_for_events
+from .tasks import reconcile_unread_counters, send_notification_email_task
 
 # Create your tests here.
+
+class NotificationViewPerformanceTests(ViewPerformanceTestCase):
+    """Бюджеты запросов для страниц и AJAX-эндпоинтов уведомлений"""
+
+    def test_notification_list(self):
+        url = reverse('notifications:notification_list')
+        self.assertViewPerformance('notifications:notification_list', url, 0, status=302)
+        self.assertViewPerformance('notifications:notification_list', url, 5, user=self.owner, status=200)
+
+    def test_notification_detail(self):
+        url = reverse('notifications:notification_detail', kwargs={'pk': self.data['notification'].pk})
+        self.assertViewPerformance('notifications:notification_detail', url, 0, status=302)
+        self.assertViewPerformance('notifications:notification_detail', url, 5, user=self.owner, status=200)
+
+    def test_mark_read(self):
+        url = reverse('notifications:mark_read', kwargs={'pk': self.data['notification'].pk})
+        self.assertViewPerformance('notifications:mark_read', url, 0, method='post', status=302)
+        self.assertViewPerformance('notifications:mark_read', url, 4, user=self.owner, method='post', status=302)
+
+    def test_mark_all_read(self):
+        url = reverse('notifications:mark_all_read')
+        self.assertViewPerformance('notifications:mark_all_read', url, 0, method='post', status=302)
+        self.assertViewPerformance('notifications:mark_all_read', url, 6, user=self.owner, method='post', status=302)
+
+    def test_notification_delete(self):
+        url = reverse('notifications:notification_delete', kwargs={'pk': self.data['notification'].pk})
+        self.assertViewPerformance('notifications:notification_delete', url, 0, status=302)
+        self.assertViewPerformance('notifications:notification_delete', url, 5, user=self.owner, status=200)
+
+    def test_unread_count(self):
+        url = reverse('notifications:unread_count')
+        self.assertViewPerformance('notifications:unread_count', url, 0, status=302)
+        self.assertViewPerformance('notifications:unread_count', url, 3, user=self.owner, status=200)
+
+    def test_notifications_dropdown(self):
+        url = reverse('notifications:notifications_dropdown')
+        self.assertViewPerformance('notifications:notifications_dropdown', url, 0, status=302)
+        self.assertViewPerformance('notifications:notifications_dropdown', url, 4, user=self.owner, status=200)
+
+    def test_mark_read_ajax(self):
+        url = reverse('notifications:mark_read_ajax', kwargs={'pk': self.data['notification'].pk})
+        self.assertViewPerformance('notifications:mark_read_ajax', url, 0, method='post', status=302)
+        self.assertViewPerformance('notifications:mark_read_ajax', url, 5, user=self.owner, method='post', status=200)
+
+    def test_mark_all_read_ajax(self):
+        url = reverse('notifications:mark_all_read_ajax')
+        self.assertViewPerformance('notifications:mark_all_read_ajax', url, 0, method='post', status=302)
+        self.assertViewPerformance('notifications:mark_all_read_ajax', url, 6, user=self.owner, method='post', status=200)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AsyncPollingViewTests(TestCase):
+    """Асинхронные эндпоинты опроса отвечают так же, как синхронные"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = seed_performance_data(posts_count=10, notifications_count=15)['owner']
+
+    async def call_async(self, view, user, headers=None):
+        request = AsyncRequestFactory().get('/', headers=headers)
+        request.user = user
+        return await view(request)
+
+    def call_sync(self, view, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return view(request)
+
+    async def test_payload_matches_sync_views(self):
+        pairs = [
+            (views.unread_count, views.unread_count_async),
+            (views.notifications_dropdown, views.notifications_dropdown_async),
+        ]
+        for sync_view, async_view in pairs:
+            async_response = await self.call_async(async_view, self.owner)
+            sync_response = await sync_to_async(self.call_sync)(sync_view, self.owner)
+
+            self.assertEqual(async_response.status_code, 200)
+            self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+            self.assertEqual(async_response['ETag'], sync_response['ETag'])
+            self.assertIn('private', async_response['Cache-Control'])
+
+    async def test_not_modified_with_current_etag(self):
+        response = await self.call_async(views.unread_count_async, self.owner)
+        response = await self.call_async(
+            views.unread_count_async, self.owner, headers={'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_anonymous_user_is_redirected_to_login(self):
+        response = await self.call_async(views.notifications_dropdown_async, AnonymousUser())
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class UnreadCounterTests(TestCase):
+    """Счетчик непрочитанных в кэше следует за изменениями уведомлений"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader')
+
+    def setUp(self):
+        cache.clear()
+
+    def create(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(
+                recipient=self.user, notification_type='system', title='Событие', message='Текст', **kwargs
+            )
+
+    def test_counter_follows_create_read_and_delete(self):
+        self.assertEqual(get_unread_count(self.user.pk), 0)
+        first = self.create()
+        self.create()
+        self.create(is_read=True)
+        self.assertEqual(get_unread_count(self.user.pk), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.get(pk=first.pk).mark_as_read()
+        self.assertEqual(get_unread_count(self.user.pk), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.filter(recipient=self.user).delete()
+        self.assertEqual(get_unread_count(self.user.pk), 0)
+
+    def test_bulk_created_notifications_are_counted(self):
+        self.assertEqual(get_unread_count(self.user.pk), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            views.bulk_create_notifications([self.user, self.user], 'system', 'Событие', 'Текст')
+        self.assertEqual(get_unread_count(self.user.pk), 2)
+
+    def test_counter_is_read_without_queries(self):
+        self.create()
+        get_unread_count(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user.pk), 1)
+
+    def test_reconcile_resets_drifted_counters(self):
+        self.create()
+        self.create()
+        self.assertEqual(get_unread_count(self.user.pk), 2)
+
+        # update() идет в обход сигналов
+        Notification.objects.filter(recipient=self.user).update(is_read=True)
+        self.assertEqual(get_unread_count(self.user.pk), 2)
+
+        self.assertEqual(reconcile_unread_counters(), 1)
+        self.assertEqual(get_unread_count(self.user.pk), 0)
+        self.assertEqual(reconcile_unread_counters(), 0)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class NotificationStatsTests(TestCase):
+    """Статистика уведомлений считается одним запросом и сбрасывается при изменениях"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='stats')
+        for notification_type, is_read in [('system', False), ('system', True), ('newsletter', False)]:
+            Notification.objects.create(
+                recipient=cls.user, notification_type=notification_type, title='Событие', message='Текст', is_read=is_read
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stats_are_computed_in_one_query_and_cached(self):
+        with self.assertNumQueries(1):
+            stats = get_stats(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_stats(self.user.pk), stats)
+
+        self.assertEqual((stats['total'], stats['unread'], stats['read']), (3, 2, 1))
+        self.assertEqual(stats['by_type']['system'], 2)
+        self.assertEqual(stats['by_type']['newsletter'], 1)
+        self.assertEqual(stats['by_type']['new_response'], 0)
+
+    def test_write_invalidates_stats(self):
+        get_stats(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            services.mark_read(Notification.objects.filter(recipient=self.user))
+        self.assertEqual(get_stats(self.user.pk)['unread'], 0)
+
+    def test_list_pagination_uses_stats(self):
+        request = RequestFactory().get('/', {'read': 'unread'})
+        request.user = self.user
+        view = views.NotificationListView()
+        view.setup(request)
+        paginator = view.get_paginator(view.get_queryset(), 20)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DropdownCacheTests(TestCase):
+    """Кэш выпадающего меню правится на месте и не обращается к БД"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='dropdown')
+
+    def setUp(self):
+        cache.clear()
+
+    def create(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(
+                recipient=self.user, notification_type='system', title=title, message='Текст'
+            )
+
+    def items(self):
+        return get_dropdown_items(self.user.pk, get_version(self.user.pk))
+
+    def test_changes_are_applied_without_queries(self):
+        first = self.create('Первое')
+        self.assertEqual([item['title'] for item in self.items()], ['Первое'])
+
+        self.create('Второе')
+        with self.assertNumQueries(0):
+            self.assertEqual([item['title'] for item in self.items()], ['Второе', 'Первое'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.mark_read([first.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual([item['is_read'] for item in self.items()], [False, True])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.get(pk=first.pk).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual([item['title'] for item in self.items()], ['Второе'])
+
+    def test_missed_change_rebuilds_from_database(self):
+        self.create('Первое')
+        self.items()
+
+        # Изменение, правка которого до кэша не дошла
+        Notification.objects.filter(recipient=self.user).update(title='Исправлено')
+        bump_version(self.user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual([item['title'] for item in self.items()], ['Исправлено'])
+
+    def test_list_is_rebuilt_when_deletions_exhaust_buffer(self):
+        for index in range(25):
+            self.create(f'Событие {index}')
+        self.assertEqual(len(self.items()), 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.delete_notifications(Notification.objects.filter(recipient=self.user).order_by('-pk')[:15])
+
+        with self.assertNumQueries(1):
+            items = self.items()
+        self.assertEqual([item['title'] for item in items], [f'Событие {index}' for index in range(9, -1, -1)])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class NotificationServiceTests(TestCase):
+    """Массовые переходы выполняются пачками и обновляют счетчики получателей"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='bulk')
+        cls.other = User.objects.create(username='other')
+
+    def setUp(self):
+        cache.clear()
+
+    def create(self, count, recipient=None, **kwargs):
+        Notification.objects.bulk_create([
+            Notification(
+                recipient=recipient or self.user, notification_type='system',
+                title=f'Событие {index}', message='Текст', **kwargs
+            )
+            for index in range(count)
+        ])
+        return Notification.objects.filter(recipient=recipient or self.user)
+
+    def test_mark_read_in_batches(self):
+        notifications = self.create(5)
+        self.create(2, recipient=self.other)
+        self.assertEqual(get_unread_count(self.user.pk), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(services.mark_read(notifications, batch_size=2), 5)
+
+        self.assertEqual(get_unread_count(self.user.pk), 0)
+        self.assertFalse(notifications.filter(read_at__isnull=True).exists())
+        self.assertEqual(Notification.objects.filter(recipient=self.other, is_read=False).count(), 2)
+        self.assertEqual(services.mark_read(notifications), 0)
+
+    def test_query_count_does_not_grow_with_notifications(self):
+        def count_queries(size):
+            notifications = self.create(size)
+            with CaptureQueriesContext(connection) as queries:
+                services.mark_read(notifications)
+            notifications.delete()
+            return len(queries)
+
+        self.assertEqual(count_queries(3), count_queries(30))
+
+    def test_mark_unread_by_ids(self):
+        notifications = list(self.create(3, is_read=True))
+        self.assertEqual(get_unread_count(self.user.pk), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            count = services.mark_unread([notification.pk for notification in notifications[:2]])
+
+        self.assertEqual(count, 2)
+        self.assertEqual(get_unread_count(self.user.pk), 2)
+        self.assertEqual(Notification.objects.filter(is_read=False, read_at__isnull=True).count(), 2)
+
+    def test_delete_decrements_unread_only(self):
+        self.create(2, is_read=True)
+        self.create(3)
+        self.assertEqual(get_unread_count(self.user.pk), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            count = services.delete_notifications(Notification.objects.filter(recipient=self.user))
+
+        self.assertEqual(count, 5)
+        self.assertEqual(get_unread_count(self.user.pk), 0)
+        self.assertFalse(Notification.objects.filter(recipient=self.user).exists())
+        # Удаление идет в обход ORM-каскадов: ссылки на уведомления потребуют delete()
+        self.assertEqual(list(Notification._meta.related_objects), [])
+
+    def test_send_emails_skips_sent_and_unsubscribed(self):
+        pending_ids = sorted(self.create(2).values_list('pk', flat=True))
+        self.create(1, is_sent=True)
+        self.other.profile.email_notifications = False
+        self.other.profile.save()
+        self.create(1, recipient=self.other)
+
+        count = services.send_emails(Notification.objects.all())
+
+        self.assertEqual(count, 2)
+        self.assertEqual(Notification.objects.filter(is_sent=False).count(), 1)
+        self.assertEqual(sorted(EmailOutbox.objects.values_list('args', flat=True)), [[pk] for pk in pending_ids])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class NotificationPipelineTests(TestCase):
+    """Уведомления об откликах создаются после фиксации транзакции, пачкой"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.post = Post.objects.create(
+            title='Ищу хила', content='<p>В рейд</p>', author=cls.author, category=Category.objects.create(name='healers')
+        )
+        cls.responders = [User.objects.create(username=f'healer{index}') for index in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self._eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+
+    def tearDown(self):
+        current_app.conf.task_always_eager = self._eager
+
+    def test_response_creates_notification_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = Response.objects.create(post=self.post, author=self.responders[0], content='Готов')
+        self.assertFalse(Notification.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.recipient, self.author)
+        self.assertEqual(notification.notification_type, 'new_response')
+        self.assertEqual(notification.content_object, response)
+        self.assertEqual(get_unread_count(self.author.pk), 1)
+
+    def test_status_change_enqueues_decision(self):
+        response = Response.objects.create(post=self.post, author=self.responders[0], content='Готов')
+        response.status = 'accepted'
+        with self.captureOnCommitCallbacks(execute=True):
+            response.save()
+
+        notification = Notification.objects.get(recipient=self.responders[0])
+        self.assertEqual(notification.notification_type, 'response_accepted')
+
+    def test_events_are_processed_in_bulk(self):
+        def process(count):
+            responses = [
+                Response.objects.create(post=self.post, author=responder, content='Готов')
+                for responder in self.responders[:count]
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                create_notifications_for_events([['new_response', response.pk] for response in responses])
+            Response.objects.all().delete()
+            return len(queries)
+
+        self.assertEqual(process(1), process(3))
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 4)
+
+    def test_deleted_response_is_skipped(self):
+        response = Response.objects.create(post=self.post, author=self.responders[0], content='Готов')
+        response_id = response.pk
+        response.delete()
+        self.assertEqual(create_notifications_for_events([['new_response', response_id]]), [])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+)
+class EmailOutboxTests(TestCase):
+    """Письма ставятся в исходящую очередь в транзакции и передаются ретранслятором"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='mailer', email='mailer@example.com')
+
+    def setUp(self):
+        self._eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+
+    def tearDown(self):
+        current_app.conf.task_always_eager = self._eager
+
+    def create(self):
+        return Notification.objects.create(
+            recipient=self.user, notification_type='system', title='Событие', message='Текст'
+        )
+
+    def test_send_email_writes_outbox_in_transaction(self):
+        notification = self.create()
+        try:
+            with transaction.atomic():
+                notification.send_email()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(EmailOutbox.objects.exists())
+
+        notification.refresh_from_db()
+        notification.send_email()
+        entry = EmailOutbox.objects.get()
+        self.assertEqual((entry.status, entry.args), ('pending', [notification.pk]))
+
+    def test_relay_publishes_pending_entries(self):
+        self.create().send_email()
+        self.create().send_email()
+
+        self.assertEqual(relay_email_outbox(), (2, 0))
+        self.assertEqual(EmailOutbox.objects.filter(status='published', attempts=1).count(), 2)
+        self.assertEqual(relay_email_outbox(), (0, 0))
+
+    @override_settings(
+        EMAIL_BACKEND='notifications.tests.FlakyEmailBackend',
+        TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+                'notifications/emails/default.html': '<p>{{ notification.title }}</p>',
+            })]},
+        }],
+    )
+    def test_sent_flag_keeps_concurrent_read(self):
+        notification = self.create()
+        FlakyEmailBackend.disconnect_after = None
+        FlakyEmailBackend.refused = ()
+        # Пользователь читает уведомление, пока письмо отправляется
+        FlakyEmailBackend.on_sent = lambda: Notification.objects.filter(pk=notification.pk).update(is_read=True)
+        try:
+            send_notification_email_task(notification.pk)
+        finally:
+            FlakyEmailBackend.on_sent = None
+
+        notification.refresh_from_db()
+        self.assertTrue(notification.is_sent)
+        self.assertTrue(notification.is_read)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_entries_back_off_and_give_up(self):
+        EmailOutbox.objects.create(task_name='notifications.tasks.missing_task', args=[1])
+
+        self.assertEqual(relay_email_outbox(), (0, 1))
+        entry = EmailOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), ('pending', 1))
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        self.assertIn('missing_task', entry.last_error)
+
+        # Запись ждет своей очереди и не берется раньше срока
+        self.assertEqual(relay_email_outbox(), (0, 0))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(relay_email_outbox(), (0, 1))
+        self.assertEqual(EmailOutbox.objects.get().status, 'failed')
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """Почтовый бэкенд, который обрывает соединение и отклоняет адреса по заданию теста"""
+    opened = 0
+    disconnect_after = None
+    refused = ()
+    # Вызывается после каждого принятого письма
+    on_sent = None
+    # send_mail() отправляет без явного open()
+    sent_on_connection = 0
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        self.sent_on_connection = 0
+        return True
+
+    def send_messages(self, messages):
+        if self.disconnect_after is not None and self.sent_on_connection >= self.disconnect_after:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        recipient = messages[0].to[0]
+        if recipient in self.refused:
+            raise smtplib.SMTPRecipientsRefused({recipient: (550, b'No such user')})
+        self.sent_on_connection += 1
+        sent = super().send_messages(messages)
+        if self.on_sent is not None:
+            FlakyEmailBackend.on_sent()
+        return sent
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    EMAIL_BACKEND='notifications.tests.FlakyEmailBackend',
+    TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+            'notifications/emails/newsletter.html': '<p>{{ newsletter.title }}, {{ user.username }}</p>',
+        })]},
+    }],
+)
+class BulkMailerTests(TestCase):
+    """Письма пачки уходят через одно соединение, обрыв соединения переживается"""
+
+    def setUp(self):
+        FlakyEmailBackend.opened = 0
+        FlakyEmailBackend.disconnect_after = None
+        FlakyEmailBackend.refused = ()
+
+    def message(self, recipient):
+        return EmailMessage('Тема', 'Текст', 'board@example.com', [recipient])
+
+    def test_reconnects_and_reports_per_recipient(self):
+        FlakyEmailBackend.disconnect_after = 2
+        FlakyEmailBackend.refused = ('missing@example.com',)
+        recipients = ['a@example.com', 'b@example.com', 'missing@example.com', 'c@example.com']
+
+        with BulkMailer() as mailer:
+            results = mailer.send_all([self.message(recipient) for recipient in recipients])
+
+        errors = {message.to[0]: error for message, error in results}
+        self.assertIsNone(errors['c@example.com'])
+        self.assertIn('SMTPRecipientsRefused', errors['missing@example.com'])
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['a@example.com', 'b@example.com', 'c@example.com'])
+        # Первое соединение оборвалось после двух писем, остальные ушли через второе
+        self.assertEqual(FlakyEmailBackend.opened, 2)
+
+    def test_gives_up_after_max_retries(self):
+        FlakyEmailBackend.disconnect_after = 0
+
+        with BulkMailer(max_retries=2) as mailer:
+            error = mailer.send(self.message('a@example.com'))
+
+        self.assertIn('SMTPServerDisconnected', error)
+        self.assertEqual(FlakyEmailBackend.opened, 3)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    EMAIL_BACKEND='notifications.tests.FlakyEmailBackend',
+    TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+            'notifications/emails/newsletter.html': '<p>{{ newsletter.title }}, {{ user.username }}</p>',
+        })]},
+    }],
+    NEWSLETTER_CHUNK_SIZE=2,
+    NEWSLETTER_CHECKPOINT_SIZE=2,
+)
+class NewsletterDeliveryTests(TestCase):
+    """Рассылка отправляется частями по диапазонам id и продолжается после сбоя"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username=f'reader{i}', email=f'reader{i}@example.com') for i in range(5)]
+
+    def setUp(self):
+        FlakyEmailBackend.opened = 0
+        FlakyEmailBackend.disconnect_after = None
+        FlakyEmailBackend.refused = ()
+        FlakyEmailBackend.on_sent = None
+        self._eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        self.newsletter = Newsletter.objects.create(title='Обновление', content='Текст')
+        self.newsletter.recipients.set(self.users)
+
+    def tearDown(self):
+        current_app.conf.task_always_eager = self._eager
+
+    def test_newsletter_sent_in_parallel_chunks(self):
+        FlakyEmailBackend.refused = ('reader3@example.com',)
+
+        self.newsletter.send_newsletter()
+        self.newsletter.refresh_from_db()
+        self.assertEqual((self.newsletter.status, self.newsletter.is_sent), ('sending', False))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(relay_email_outbox(), (1, 0))
+
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.status, 'sent')
+        self.assertTrue(self.newsletter.is_sent)
+        self.assertEqual(
+            (self.newsletter.queued_count, self.newsletter.sent_count, self.newsletter.failed_count), (5, 4, 1)
+        )
+        self.assertEqual(
+            list(self.newsletter.chunks.values_list('first_user_id', 'last_user_id', 'status')),
+            [(self.users[0].pk, self.users[1].pk, 'done'), (self.users[2].pk, self.users[3].pk, 'done'),
+             (self.users[4].pk, self.users[4].pk, 'done')],
+        )
+        # Одно SMTP-соединение на часть
+        self.assertEqual(FlakyEmailBackend.opened, 3)
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(Notification.objects.filter(notification_type='newsletter').count(), 4)
+
+    @override_settings(NEWSLETTER_CHUNK_SIZE=5)
+    def test_restart_resumes_from_checkpoint(self):
+        plan_newsletter(self.newsletter.pk)
+        # Воркер упал после первой пачки: курсор сохранен, аренда истекла
+        NewsletterChunk.objects.update(
+            last_processed_id=self.users[1].pk, sent_count=2, lease_expires_at=timezone.now()
+        )
+        Newsletter.objects.filter(pk=self.newsletter.pk).update(sent_count=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(resume_stalled_newsletters(), 1)
+
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['reader2@example.com', 'reader3@example.com', 'reader4@example.com'])
+        self.newsletter.refresh_from_db()
+        self.assertEqual((self.newsletter.status, self.newsletter.sent_count), ('sent', 5))
+        self.assertEqual(resume_stalled_newsletters(), 0)
+
+    @override_settings(NEWSLETTER_CHUNK_SIZE=5)
+    def test_mail_server_outage_keeps_chunk_pending(self):
+        plan_newsletter(self.newsletter.pk)
+        chunk = self.newsletter.chunks.get()
+        # Сервер обрывает каждое соединение до приема письма
+        FlakyEmailBackend.disconnect_after = 0
+
+        with self.assertRaises(MailServerUnavailable):
+            send_newsletter_chunk(chunk.pk)
+
+        chunk.refresh_from_db()
+        self.assertEqual(
+            (chunk.status, chunk.last_processed_id, chunk.failed_count, chunk.lease_expires_at), ('pending', 0, 0, None)
+        )
+        self.assertFalse(finish_newsletter(self.newsletter.pk))
+        self.newsletter.refresh_from_db()
+        self.assertEqual((self.newsletter.status, self.newsletter.failed_count), ('sending', 0))
+
+        # Сервер снова доступен: повторная попытка отправляет всю часть
+        FlakyEmailBackend.disconnect_after = None
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(send_newsletter_chunk(chunk.pk), (5, 0))
+
+    @override_settings(NEWSLETTER_CHUNK_SIZE=5)
+    def test_lost_lease_stops_sending(self):
+        plan_newsletter(self.newsletter.pk)
+        chunk = self.newsletter.chunks.get()
+
+        def take_over():
+            # Аренда истекла, и часть захватил другой воркер
+            NewsletterChunk.objects.filter(pk=chunk.pk).update(claim_token=uuid.uuid4())
+        FlakyEmailBackend.on_sent = take_over
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(ChunkLeaseLost):
+            send_newsletter_chunk(chunk.pk)
+
+        # Первая пачка отправлена, но ее прогресс не записан, дальше воркер не отправляет
+        self.assertEqual(len(mail.outbox), 2)
+        chunk.refresh_from_db()
+        self.assertEqual((chunk.status, chunk.last_processed_id, chunk.sent_count), ('pending', 0, 0))
+
+    def test_leased_chunk_is_not_sent_twice(self):
+        plan_newsletter(self.newsletter.pk)
+        chunk = self.newsletter.chunks.first()
+        NewsletterChunk.objects.filter(pk=chunk.pk).update(lease_expires_at=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual(send_newsletter_chunk(chunk.pk), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PollingRouterTests(TransactionTestCase):
+    """Быстрый путь ASGI: опрос обслуживается без приложения Django, остальное передается ему"""
+
+    def setUp(self):
+        self.fallback_paths = []
+
+        async def fallback(scope, receive, send):
+            self.fallback_paths.append(scope['path'])
+            await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        self.router = PollingRouter(fallback)
+        self.user = User.objects.create(username='reader')
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user, notification_type='system', title='Новость', message='Текст')
+            for _ in range(3)
+        ])
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(self.user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = self.user.get_session_auth_hash()
+        session.save()
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'.encode()
+
+    def scope(self, path, method='GET', headers=()):
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver')] + list(headers),
+        }
+
+    def request(self, path, method='GET', headers=()):
+        scope = self.scope(path, method, headers)
+        messages = []
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if requested:
+                # Как у настоящего сервера: после тела запроса ждем отключения клиента
+                await asyncio.Event().wait()
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.router(scope, receive, send))
+        headers = {name.decode().lower(): value.decode() for name, value in messages[0]['headers']}
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        return messages[0]['status'], headers, body
+
+    def test_unread_count_is_served_by_fast_path(self):
+        status, headers, body = self.request(reverse('notifications:unread_count'), headers=[(b'cookie', self.cookie)])
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {'count': 3, 'has_unread': True})
+        self.assertEqual(self.fallback_paths, [])
+
+        status, _, _ = self.request(
+            reverse('notifications:unread_count'),
+            headers=[(b'cookie', self.cookie), (b'if-none-match', headers['etag'].encode())],
+        )
+        self.assertEqual(status, 304)
+
+    def test_anonymous_request_is_redirected_to_login(self):
+        status, headers, _ = self.request(reverse('notifications:notifications_dropdown'))
+        self.assertEqual(status, 302)
+        self.assertIn(settings.LOGIN_URL, headers['location'])
+
+    def test_other_requests_go_to_django_application(self):
+        self.request(reverse('notifications:notification_list'))
+        self.request(reverse('notifications:unread_count'), method='POST')
+        self.assertEqual(self.fallback_paths, [
+            reverse('notifications:notification_list'),
+            reverse('notifications:unread_count'),
+        ])
+
+    def test_stream_is_refused_to_anonymous_users(self):
+        status, _, _ = self.request(reverse('notifications:notification_stream'))
+        self.assertEqual(status, 403)
+
+    def test_stream_is_unavailable_under_wsgi(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notifications:notification_stream'))
+        self.assertEqual(response.status_code, 204)
+
+    def test_stream_delivers_new_notifications(self):
+        try:
+            get_redis().ping()
+        except redis.RedisError:
+            self.skipTest('Redis недоступен')
+
+        scope = self.scope(reverse('notifications:notification_stream'), headers=[(b'cookie', self.cookie)])
+        chunks = []
+
+        async def scenario():
+            disconnected = asyncio.Event()
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                chunk = message.get('body', b'').decode()
+                chunks.append(chunk)
+                if 'event: ready' in chunk:
+                    # Уведомление создается вне транзакции: событие публикуется сразу
+                    await sync_to_async(Notification.objects.create)(
+                        recipient=self.user, notification_type='system', title='Срочно', message='Текст'
+                    )
+                elif 'event: notification' in chunk:
+                    disconnected.set()
+
+            await asyncio.wait_for(self.router(scope, receive, send), timeout=10)
+
+        asyncio.run(scenario())
+
+        events = [chunk for chunk in chunks if chunk.startswith('event: notification')]
+        self.assertEqual(len(events), 1)
+        payload = json.loads(events[0].split('data: ', 1)[1])
+        self.assertEqual(payload['type'], 'created')
+        self.assertEqual(payload['title'], 'Срочно')
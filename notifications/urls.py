@@ -17,6 +17,9 @@ urlpatterns = [
     
     # API endpoints для AJAX
     path('api/count/', views.unread_count, name='unread_count'),
+    path('api/dropdown/', views.notifications_dropdown, name='notifications_dropdown'),
+    # Поток событий (SSE) обслуживает быстрый путь ASGI, см. notifications/asgi.py
+    path('api/stream/', views.notification_stream_unavailable, name='notification_stream'),
     path('api/<int:pk>/mark-read/', views.mark_read_ajax, name='mark_read_ajax'),
     path('api/mark-all-read/', views.mark_all_read_ajax, name='mark_all_read_ajax'),
 ] 
\ No newline at end of file
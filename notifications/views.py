@@ -1,15 +1,29 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, DeleteView, View
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject, cached_property
+from django.utils.http import quote_etag
+from django.db import connections
 from django.db.models import Q
+from . import services
 from .models import Notification
+from .cache import (
+    aget_dropdown_items, aget_unread_count, aget_version, get_dropdown_items, get_stats, get_unread_count, get_version,
+)
+from .events import stream_events
 
 # Create your views here.
 
@@ -21,7 +35,8 @@ class NotificationListView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        queryset = Notification.objects.filter(recipient=self.request.user)
+        # Получатель и отправитель загружаются вместе со списком: число запросов не растет с числом строк
+        queryset = Notification.objects.filter(recipient=self.request.user).select_related('recipient', 'sender')
         
         # Фильтрация по типу уведомления
         notification_type = self.request.GET.get('type')
@@ -37,17 +52,47 @@ class NotificationListView(LoginRequiredMixin, ListView):
         
         return queryset.order_by('-created_at')
     
+    @cached_property
+    def stats(self):
+        """Статистика уведомлений (один запрос, кэшируется до следующего изменения)"""
+        return get_stats(self.request.user.pk)
+    
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        count = self.get_filtered_count()
+        if count is not None:
+            # Число уведомлений известно из статистики: отдельный COUNT не нужен
+            paginator.count = count
+        return paginator
+    
+    def get_filtered_count(self):
+        """Количество уведомлений под текущими фильтрами, если его дает статистика"""
+        notification_type = self.request.GET.get('type')
+        read_status = self.request.GET.get('read')
+        if read_status not in ('unread', 'read'):
+            read_status = None
+        if notification_type and read_status:
+            return None
+        if notification_type:
+            return self.stats['by_type'].get(notification_type)
+        if read_status:
+            return self.stats[read_status]
+        return self.stats['total']
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Статистика уведомлений
-        all_notifications = Notification.objects.filter(recipient=self.request.user)
-        context['total_count'] = all_notifications.count()
-        context['unread_count'] = all_notifications.filter(is_read=False).count()
-        context['read_count'] = all_notifications.filter(is_read=True).count()
+        stats = self.stats
+        context['total_count'] = stats['total']
+        context['unread_count'] = stats['unread']
+        context['read_count'] = stats['read']
         
-        # Типы уведомлений
+        # Типы уведомлений и количество уведомлений каждого типа
         context['notification_types'] = Notification.NOTIFICATION_TYPES
+        context['notification_type_counts'] = [
+            (notification_type, label, stats['by_type'][notification_type])
+            for notification_type, label in Notification.NOTIFICATION_TYPES
+        ]
         
         # Текущие фильтры
         context['current_type'] = self.request.GET.get('type')
@@ -87,14 +132,7 @@ class MarkAllReadView(LoginRequiredMixin, View):
     """Пометить все уведомления как прочитанные"""
     
     def post(self, request):
-        unread_notifications = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        )
-        count = unread_notifications.count()
-        
-        for notification in unread_notifications:
-            notification.mark_as_read()
+        count = services.mark_read(Notification.objects.filter(recipient=request.user))
         
         messages.success(request, f'Помечено как прочитанные: {count} уведомлений')
         return redirect('notifications:notification_list')
@@ -116,13 +154,44 @@ class NotificationDeleteView(LoginRequiredMixin, DeleteView):
 
 # API Views для AJAX запросов
 
+def notifications_etag(request, *args, **kwargs):
+    """ETag по версии уведомлений пользователя: без запросов к БД"""
+    if not request.user.is_authenticated:
+        return None
+    return f'{request.user.pk}-{get_version(request.user.pk)}'
+
+
+def async_polling_view(view_func):
+    """Асинхронный аналог @login_required, @cache_control и @condition для эндпоинтов опроса
+
+    В Django 4.2 эти декораторы синхронные. Быстрый путь ASGI загружает
+    пользователя заранее, а ленивый пользователь из AuthenticationMiddleware
+    загружается здесь, в потоке.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if isinstance(request.user, SimpleLazyObject):
+            await sync_to_async(lambda: request.user.is_authenticated)()
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        etag = quote_etag(f'{request.user.pk}-{await aget_version(request.user.pk)}')
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await view_func(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and not response.has_header('ETag'):
+                response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=notifications_etag)
 def unread_count(request):
     """Получить количество непрочитанных уведомлений"""
-    count = Notification.objects.filter(
-        recipient=request.user,
-        is_read=False
-    ).count()
+    count = get_unread_count(request.user.pk)
     
     return JsonResponse({
         'count': count,
@@ -130,6 +199,17 @@ def unread_count(request):
     })
 
 
+@async_polling_view
+async def unread_count_async(request):
+    """Количество непрочитанных уведомлений (ASGI)"""
+    count = await aget_unread_count(request.user.pk)
+
+    return JsonResponse({
+        'count': count,
+        'has_unread': count > 0
+    })
+
+
 @login_required
 @require_POST
 @csrf_exempt
@@ -140,10 +220,7 @@ def mark_read_ajax(request, pk):
         notification.mark_as_read()
         
         # Обновленное количество непрочитанных
-        unread_count = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).count()
+        unread_count = get_unread_count(request.user.pk)
         
         return JsonResponse({
             'success': True,
@@ -163,14 +240,7 @@ def mark_read_ajax(request, pk):
 def mark_all_read_ajax(request):
     """Пометить все уведомления как прочитанные через AJAX"""
     try:
-        unread_notifications = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        )
-        count = unread_notifications.count()
-        
-        for notification in unread_notifications:
-            notification.mark_as_read()
+        count = services.mark_read(Notification.objects.filter(recipient=request.user))
         
         return JsonResponse({
             'success': True,
@@ -186,34 +256,55 @@ def mark_all_read_ajax(request):
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=notifications_etag)
 def notifications_dropdown(request):
     """Получить последние уведомления для выпадающего меню"""
-    notifications = Notification.objects.filter(
-        recipient=request.user
-    ).order_by('-created_at')[:10]
-    
-    unread_count = Notification.objects.filter(
-        recipient=request.user,
-        is_read=False
-    ).count()
+    user_id = request.user.pk
+    notifications = get_dropdown_items(user_id, get_version(user_id))
+    unread_count = get_unread_count(user_id)
     
-    notifications_data = []
-    for notification in notifications:
-        notifications_data.append({
-            'id': notification.id,
-            'title': notification.title,
-            'message': notification.message[:100],
-            'type': notification.notification_type,
-            'is_read': notification.is_read,
-            'created_at': notification.created_at.strftime('%d.%m.%Y %H:%M'),
-            'url': f'/notifications/{notification.id}/'
-        })
-    
-    return JsonResponse({
-        'notifications': notifications_data,
+    return JsonResponse(_dropdown_payload(notifications, unread_count))
+
+
+@async_polling_view
+async def notifications_dropdown_async(request):
+    """Последние уведомления для выпадающего меню (ASGI)"""
+    user_id = request.user.pk
+    notifications = await aget_dropdown_items(user_id, await aget_version(user_id))
+    unread_count = await aget_unread_count(user_id)
+
+    return JsonResponse(_dropdown_payload(notifications, unread_count))
+
+
+async def notification_stream(request):
+    """Поток событий уведомлений (Server-Sent Events), обслуживается быстрым путем ASGI"""
+    if not request.user.is_authenticated:
+        return HttpResponseForbidden()
+
+    # Поток открыт минутами: соединение с БД, взятое для загрузки
+    # пользователя, возвращается в пул сразу
+    await sync_to_async(connections.close_all)()
+
+    response = StreamingHttpResponse(stream_events(request.user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Отключить буферизацию ответа в nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def notification_stream_unavailable(request):
+    """Поток событий под WSGI недоступен: 204 закрывает EventSource, и браузер переходит на опрос"""
+    return HttpResponse(status=204)
+
+
+def _dropdown_payload(notifications, unread_count):
+    """Данные выпадающего меню уведомлений"""
+    return {
+        'notifications': notifications,
         'unread_count': unread_count,
-        'total_count': notifications.count()
-    })
+        'total_count': len(notifications)
+    }
 
 
 # Вспомогательные функции и классы
@@ -224,10 +315,7 @@ class NotificationMixin:
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated:
-            context['unread_notifications_count'] = Notification.objects.filter(
-                recipient=self.request.user,
-                is_read=False
-            ).count()
+            context['unread_notifications_count'] = get_unread_count(self.request.user.pk)
         return context
 
 
@@ -271,10 +359,4 @@ def bulk_create_notifications(recipients, notification_type, title, message, sen
         )
         notifications.append(notification)
     
-    created_notifications = Notification.objects.bulk_create(notifications)
-    
-    # Отправляем email уведомления
-    for notification in created_notifications:
-        notification.send_email()
-    
-    return created_notifications
+    return services.create_notifications(notifications)
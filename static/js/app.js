@@ -64,9 +64,9 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Notification updates
+    // Notification updates: push via Server-Sent Events, polling as a fallback
     updateNotificationCount();
-    setInterval(updateNotificationCount, 30000); // Update every 30 seconds
+    connectNotificationStream();
 });
 
 // AJAX form submission
@@ -170,6 +170,48 @@ function updateNotificationCount() {
     });
 }
 
+// Notification push channel
+var notificationPollTimer = null;
+
+function startNotificationPolling() {
+    if (notificationPollTimer) return;
+    notificationPollTimer = setInterval(updateNotificationCount, 30000); // Update every 30 seconds
+}
+
+function connectNotificationStream() {
+    if (!document.querySelector('.notification-badge')) return;
+    if (!window.EventSource) {
+        startNotificationPolling();
+        return;
+    }
+
+    var source = new EventSource('/notifications/api/stream/');
+    var failures = 0;
+
+    // The stream is ready: catch up on anything missed while disconnected
+    source.addEventListener('ready', function() {
+        failures = 0;
+        updateNotificationCount();
+    });
+
+    source.addEventListener('notification', function(e) {
+        var data = JSON.parse(e.data);
+        updateNotificationCount();
+        if (data.type === 'created') {
+            showAlert('info', `<a href="${escapeHtml(data.url)}" class="alert-link">${escapeHtml(data.title)}</a>`);
+        }
+    });
+
+    source.onerror = function() {
+        failures++;
+        // The server refused the stream (204 without ASGI) or it keeps failing: poll instead
+        if (source.readyState === EventSource.CLOSED || failures >= 3) {
+            source.close();
+            startNotificationPolling();
+        }
+    };
+}
+
 // Mark notification as read
 function markNotificationRead(notificationId) {
     fetch(`/notifications/api/${notificationId}/mark-read/`, {
@@ -227,17 +269,17 @@ function getCookie(name) {
     return cookieValue;
 }
 
-// Perform search
+// Perform search (typeahead JSON API)
 function performSearch(query) {
     if (query.length < 2) return;
     
-    fetch(`/search/?q=${encodeURIComponent(query)}`)
-    .then(response => response.text())
-    .then(html => {
+    fetch(`/api/search/typeahead/?q=${encodeURIComponent(query)}`)
+    .then(response => response.json())
+    .then(data => {
         // Update search results container
         var resultsContainer = document.querySelector('#search-results');
         if (resultsContainer) {
-            resultsContainer.innerHTML = html;
+            resultsContainer.innerHTML = renderSearchResults(data.results);
         }
     })
     .catch(error => {
@@ -245,6 +287,32 @@ function performSearch(query) {
     });
 }
 
+// Render typeahead results
+function renderSearchResults(results) {
+    if (!results.length) {
+        return '<div class="list-group-item text-muted">Ничего не найдено</div>';
+    }
+    
+    return '<div class="list-group">' + results.map(function(result) {
+        return `
+            <a href="${escapeHtml(result.url)}" class="list-group-item list-group-item-action">
+                <div class="d-flex justify-content-between">
+                    <strong>${escapeHtml(result.title)}</strong>
+                    <span class="badge bg-secondary">${escapeHtml(result.category)}</span>
+                </div>
+                <small class="text-muted">${escapeHtml(result.snippet)}</small>
+            </a>
+        `;
+    }).join('') + '</div>';
+}
+
+// Escape HTML
+function escapeHtml(text) {
+    var div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
 // Toggle post status
 function togglePostStatus(postId) {
     fetch(`/api/post/${postId}/toggle-status/`, {